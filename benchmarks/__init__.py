@@ -0,0 +1,6 @@
+"""
+Benchmarks for pyPdf.  They are run on a synthetic corpus of PDF files built
+by {@link #benchmarks.corpus benchmarks.corpus}, so that the results of
+different revisions can be compared; see {@link #benchmarks.bench
+benchmarks.bench}.
+"""
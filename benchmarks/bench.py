@@ -0,0 +1,381 @@
+"""
+Times pyPdf operations on the synthetic corpus of {@link #benchmarks.corpus
+benchmarks.corpus}, and reports operations per second, input megabytes per
+second, peak memory use and its growth during the benchmark, optionally as
+JSON to compare revisions:
+
+    python -m benchmarks.bench --json before.json
+    (change pyPdf)
+    python -m benchmarks.bench --json after.json --compare before.json
+"""
+
+import os
+import sys
+import time
+import optparse
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyPdf import PdfFileReader, PdfFileWriter
+from pyPdf import utils
+from pyPdf.generic import IndirectObject
+from benchmarks import corpus
+
+
+##
+# Keyword arguments given to every PdfFileReader, to measure its options.
+READER_OPTIONS = {}
+
+def _open(data):
+    reader = PdfFileReader(StringIO(data), **READER_OPTIONS)
+    if reader.isEncrypted:
+        reader.decrypt("user")
+    return reader
+
+
+# Every benchmark takes the file's data, and returns the number of operations
+# it did.
+
+def benchOpen(data):
+    PdfFileReader(StringIO(data), **READER_OPTIONS)
+    return 1
+
+def benchGetPage(data):
+    reader = _open(data)
+    n = reader.getNumPages()
+    for i in range(n):
+        reader.getPage(i)
+    return n
+
+def benchExtractText(data):
+    reader = _open(data)
+    n = reader.getNumPages()
+    for i in range(n):
+        reader.getPage(i).extractText()
+    return n
+
+def benchMergePage(data):
+    reader = _open(data)
+    stamp = _open(data).getPage(0)
+    n = min(reader.getNumPages(), 200)
+    for i in range(n):
+        reader.getPage(i).mergePage(stamp)
+    return n
+
+def benchDecrypt(data):
+    reader = PdfFileReader(StringIO(data), **READER_OPTIONS)
+    reader.decrypt("user")
+    n = reader.getNumPages()
+    for i in range(n):
+        reader.getPage(i).getContents().getData()
+    return n
+
+def benchWalkPageTree(data):
+    # walks the page tree several times, looking up the inheritable
+    # attributes of every page through its ancestors, as a viewer does.
+    reader = _open(data)
+    n = 0
+    for i in range(5):
+        stack = [reader.trailer["/Root"]["/Pages"]]
+        while stack:
+            node = stack.pop()
+            if node["/Type"] == "/Pages":
+                stack.extend([kid.getObject() for kid in node["/Kids"]])
+                continue
+            for attr in ("/Resources", "/MediaBox", "/CropBox", "/Rotate"):
+                parent = node
+                while not parent.has_key(attr) and parent.has_key("/Parent"):
+                    parent = parent["/Parent"]
+                if parent.has_key(attr):
+                    parent[attr]
+            node["/Contents"]
+            n += 1
+    return n
+
+def benchOutlines(data):
+    # reads the outline, and the page number of every entry.
+    reader = _open(data)
+    n = 0
+    stack = [reader.getOutlines()]
+    while stack:
+        for item in stack.pop():
+            if isinstance(item, list):
+                stack.append(item)
+            else:
+                item.pageNumber
+                n += 1
+    return n
+
+def benchTopOutlines(data):
+    # lists the top level entries of the outline, as a table of contents
+    # does.
+    reader = _open(data)
+    n = 0
+    for depth, parent, outline in reader.iterOutlines(0):
+        n += 1
+    return n
+
+def benchNamedDestination(data):
+    # follows a few named links.
+    reader = _open(data)
+    n = 0
+    for i in range(1, 200, 10):
+        reader.getNamedDestination("sec.%06d" % i)
+        n += 1
+    return n
+
+def benchLoadObjects(data):
+    # parses every object of the file, and keeps them all in memory.
+    reader = _open(data)
+    n = 0
+    for generation, objects in reader.xref.items():
+        for idnum in objects.keys():
+            if idnum == 0:
+                continue
+            reader.getObject(IndirectObject(idnum, generation, reader))
+            n += 1
+    for idnum in reader.xref_objStm.keys():
+        reader.getObject(IndirectObject(idnum, 0, reader))
+        n += 1
+    return n
+
+def benchRC4(data):
+    # encrypts the whole file, with the fastest RC4 available.
+    utils.RC4_encrypt("0123456789abcdef", data)
+    return 1
+
+def benchRC4Python(data):
+    # the same, in pure Python even if PyCrypto is installed.
+    utils._RC4_encrypt("0123456789abcdef", data)
+    return 1
+
+def benchWrite(data):
+    reader = _open(data)
+    writer = PdfFileWriter()
+    n = reader.getNumPages()
+    for i in range(n):
+        writer.addPage(reader.getPage(i))
+    writer.write(StringIO())
+    return n
+
+##
+# The benchmarks, as (name, function, corpus names) tuples.
+BENCHMARKS = [
+    ("open", benchOpen, ["many-objects", "deep-page-tree", "huge-xref",
+        "object-streams", "encrypted", "large-content", "inline-images",
+        "outlines"]),
+    ("getPage", benchGetPage, ["many-objects", "deep-page-tree", "object-streams"]),
+    ("extractText", benchExtractText, ["many-objects", "large-content",
+        "inline-images", "object-streams"]),
+    ("walkPageTree", benchWalkPageTree, ["many-objects", "deep-page-tree"]),
+    ("outlines", benchOutlines, ["outlines"]),
+    ("topOutlines", benchTopOutlines, ["outlines"]),
+    ("namedDest", benchNamedDestination, ["outlines"]),
+    ("mergePage", benchMergePage, ["many-objects", "large-content"]),
+    ("decrypt", benchDecrypt, ["encrypted"]),
+    ("rc4", benchRC4, ["large-content"]),
+    ("rc4Python", benchRC4Python, ["large-content"]),
+    ("loadObjects", benchLoadObjects, ["many-objects", "huge-xref",
+        "object-streams"]),
+    ("write", benchWrite, ["many-objects", "object-streams", "large-content",
+        "encrypted"]),
+    ]
+
+
+def _peakMemory():
+    # in kilobytes; Linux reports kilobytes, and Mac OS X bytes.
+    if resource == None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return peak
+
+
+# Times a benchmark, taking the best of several runs.
+def _measure(fn, data, repeat):
+    before = _peakMemory()
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        ops = fn(data)
+        elapsed = time.time() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    best = max(best, 1e-9)
+    retval = {
+        "seconds": best,
+        "ops": ops,
+        "opsPerSecond": ops / best,
+        "mbPerSecond": len(data) / best / (1024 * 1024),
+        "peakMemoryKB": _peakMemory(),
+        "memoryKB": None,
+        }
+    # the growth of the peak memory use is only meaningful in a process of
+    # its own.
+    if before != None and hasattr(os, "fork"):
+        retval["memoryKB"] = retval["peakMemoryKB"] - before
+    return retval
+
+
+# Runs a benchmark in a child process when possible, so that the peak memory
+# of one benchmark doesn't hide that of the next.
+def _run(fn, data, repeat):
+    if not hasattr(os, "fork"):
+        return _measure(fn, data, repeat)
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        try:
+            try:
+                result = _measure(fn, data, repeat)
+            except Exception, e:
+                result = {"error": "%s: %s" % (e.__class__.__name__, e)}
+            os.write(w, json.dumps(result))
+        finally:
+            os._exit(0)
+    os.close(w)
+    chunks = []
+    while True:
+        chunk = os.read(r, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(r)
+    os.waitpid(pid, 0)
+    if not chunks:
+        return {"error": "benchmark process died"}
+    return json.loads("".join(chunks))
+
+
+##
+# Runs the benchmarks.
+# @param names The names of the benchmarks to run, or None for all of them.
+# @param corpusNames The names of the corpus files to use, or None for all of
+# them.
+# @param scale The corpus size multiplier, a positive integer.
+# @param repeat The number of runs of each benchmark; the fastest is kept.
+# @param log A function called with a line of progress, or None.
+# @return A list of result dictionaries.
+def run(names=None, corpusNames=None, scale=1, repeat=3, log=None):
+    files = {}
+    results = []
+    for name, fn, corpusList in BENCHMARKS:
+        if names and name not in names:
+            continue
+        for corpusName in corpusList:
+            if corpusNames and corpusName not in corpusNames:
+                continue
+            if not files.has_key(corpusName):
+                files[corpusName] = corpus.generate(corpusName, scale)
+            result = _run(fn, files[corpusName], repeat)
+            result["benchmark"] = name
+            result["corpus"] = corpusName
+            result["bytes"] = len(files[corpusName])
+            results.append(result)
+            if log != None:
+                log(_format(result))
+    return results
+
+
+def _format(result, baseline=None):
+    line = "%-12s %-15s" % (result["benchmark"], result["corpus"])
+    if result.has_key("error"):
+        return line + " error: " + result["error"]
+    line += " %9.4fs %10.1f ops/s %8.2f MB/s" % (result["seconds"],
+            result["opsPerSecond"], result["mbPerSecond"])
+    if result["peakMemoryKB"] != None:
+        line += " %8d KB" % result["peakMemoryKB"]
+    if result.get("memoryKB") != None:
+        line += " (+%d KB)" % result["memoryKB"]
+    if baseline != None and baseline.has_key("seconds"):
+        line += "  %+6.1f%%" % ((baseline["seconds"] / result["seconds"] - 1) * 100)
+    return line
+
+
+def main(args=None):
+    parser = optparse.OptionParser(usage="%prog [options] [benchmark ...]")
+    parser.add_option("--corpus", action="append", dest="corpus",
+            help="only use this corpus file (may be repeated): %s" %
+            ", ".join(sorted(corpus.CORPUS.keys())))
+    parser.add_option("--scale", type="int", default=1,
+            help="corpus size multiplier")
+    parser.add_option("--repeat", type="int", default=3,
+            help="runs of each benchmark; the fastest is reported")
+    parser.add_option("--json", dest="json",
+            help="write the results to this JSON file")
+    parser.add_option("--compare", dest="compare",
+            help="compare with the results in this JSON file; the speedup "
+            "is shown as a percentage")
+    parser.add_option("--resolution-cache", action="store_true",
+            dest="resolutionCache", help="open the files with "
+            "PdfFileReader's resolutionCache option")
+    parser.add_option("--write-corpus", dest="corpusDir",
+            help="write the corpus files to this directory and exit")
+    options, names = parser.parse_args(args)
+    if options.resolutionCache:
+        READER_OPTIONS["resolutionCache"] = True
+
+    if options.corpusDir:
+        for name in sorted(corpus.CORPUS.keys()):
+            if options.corpus and name not in options.corpus:
+                continue
+            f = file(os.path.join(options.corpusDir, name + ".pdf"), "wb")
+            try:
+                f.write(corpus.generate(name, options.scale))
+            finally:
+                f.close()
+        return 0
+
+    baseline = {}
+    if options.compare:
+        f = file(options.compare)
+        try:
+            for result in json.load(f)["results"]:
+                baseline[(result["benchmark"], result["corpus"])] = result
+        finally:
+            f.close()
+
+    def log(line):
+        print line
+        sys.stdout.flush()
+    if baseline:
+        log = None
+    results = run(names, options.corpus, options.scale, options.repeat, log)
+    if baseline:
+        for result in results:
+            print _format(result, baseline.get((result["benchmark"], result["corpus"])))
+
+    if options.json:
+        f = file(options.json, "w")
+        try:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": sys.platform,
+                "scale": options.scale,
+                "repeat": options.repeat,
+                "results": results,
+                }, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""
+A generator of synthetic PDF files exercising the expensive parts of pyPdf.
+The files are built byte by byte, encryption included, without using pyPdf,
+so that they don't depend on the revision being measured, and they are
+deterministic: the same name and scale always give the same file.
+"""
+
+import zlib
+import struct
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+# the padding string of the standard security handler, section 3.5.2 of the
+# PDF 1.6 reference.
+_PADDING = (
+    "\x28\xbf\x4e\x5e\x4e\x75\x8a\x41\x64\x00\x4e\x56\xff\xfa\x01\x08"
+    "\x2e\x2e\x00\xb6\xd0\x68\x3e\x80\x2f\x0c\xa9\xfe\x64\x53\x69\x7a")
+
+def _rc4(key, data):
+    S = range(256)
+    j = 0
+    for i in range(256):
+        j = (j + S[i] + ord(key[i % len(key)])) % 256
+        S[i], S[j] = S[j], S[i]
+    out = []
+    i = j = 0
+    for c in data:
+        i = (i + 1) % 256
+        j = (j + S[i]) % 256
+        S[i], S[j] = S[j], S[i]
+        out.append(chr(ord(c) ^ S[(S[i] + S[j]) % 256]))
+    return "".join(out)
+
+def _rc4Rounds(key, data):
+    # steps 7 of algorithm 3.3 and 4 of algorithm 3.5: 19 more rounds, with
+    # the key xored with the round number.
+    for i in range(1, 20):
+        data = _rc4("".join([chr(ord(c) ^ i) for c in key]), data)
+    return data
+
+# The /O and /U entries and the file key of the standard security handler,
+# revision 3 with 128 bits keys (algorithms 3.2, 3.3 and 3.5 of the PDF 1.6
+# reference).
+def _standardSecurity(owner, user, P, ID):
+    digest = md5((owner + _PADDING)[:32]).digest()
+    for i in range(50):
+        digest = md5(digest).digest()
+    O = _rc4Rounds(digest[:16], _rc4(digest[:16], (user + _PADDING)[:32]))
+
+    digest = md5((user + _PADDING)[:32] + O + struct.pack("<I", P & 0xFFFFFFFF)
+            + ID).digest()
+    for i in range(50):
+        digest = md5(digest[:16]).digest()
+    key = digest[:16]
+    U = _rc4Rounds(key, _rc4(key, md5(_PADDING + ID).digest()))
+    return O, U + "\x00" * 16, key
+
+# The key of an object (algorithm 3.1).
+def _objectKey(key, idnum, generation):
+    digest = md5(key + struct.pack("<i", idnum)[:3] +
+            struct.pack("<i", generation)[:2]).digest()
+    return digest[:min(16, len(key) + 5)]
+
+##
+# Builds a PDF file from object bodies given as strings.
+class Builder(object):
+    def __init__(self, version="1.4"):
+        self.version = version
+        # object number -> (body, stream data or None)
+        self.objects = {}
+        self.count = 0
+
+    ##
+    # Reserves an object number, for objects referring to each other.
+    def reserve(self):
+        self.count += 1
+        return self.count
+
+    ##
+    # Adds an object.
+    # @param body The object, as PDF source.  For streams, the entries of the
+    # stream dictionary, without /Length.
+    # @param stream The stream data, or None.
+    # @param num A reserved object number.
+    # @return The object number.
+    def add(self, body, stream=None, num=None):
+        if num == None:
+            num = self.reserve()
+        self.objects[num] = (body, stream)
+        return num
+
+    ##
+    # Adds a stream, flate compressed.
+    def addCompressed(self, body, data, num=None):
+        return self.add(body + " /Filter /FlateDecode", zlib.compress(data), num)
+
+    ##
+    # Builds the file.
+    # @param root The object number of the catalog.
+    # @param xrefStream If true, a cross-reference stream with the PNG Up
+    # predictor is written instead of a cross-reference table.
+    # @param objectStreamSize If not 0, non-stream objects are put in object
+    # streams of this many objects.  Implies xrefStream.
+    # @param password If given, streams are encrypted with RC4 128 bits, with
+    # this user password.
+    def build(self, root, xrefStream=False, objectStreamSize=0, password=None):
+        trailer = "/Root %d 0 R" % root
+        key = None
+        if password != None:
+            ID = "\x01\x23\x45\x67\x89\xab\xcd\xef" * 2
+            P = -1
+            O, U, key = _standardSecurity("owner", password, P, ID)
+            encrypt = self.add("<< /Filter /Standard /V 2 /Length 128 /R 3 "
+                    "/O <%s> /U <%s> /P %d >>" % (O.encode("hex"), U.encode("hex"), P))
+            trailer += " /Encrypt %d 0 R /ID [<%s> <%s>]" % (
+                    encrypt, ID.encode("hex"), ID.encode("hex"))
+
+        if objectStreamSize:
+            xrefStream = True
+            self._packObjectStreams(objectStreamSize)
+
+        out = ["%%PDF-%s\n%%\xe2\xe3\xcf\xd3\n" % self.version]
+        pos = len(out[0])
+        # object number -> (type, field 2, field 3)
+        entries = {}
+        for num in range(1, self.count + 1):
+            if not self.objects.has_key(num):
+                continue
+            body, stream = self.objects[num]
+            if isinstance(body, tuple):
+                # in an object stream
+                entries[num] = (2, body[0], body[1])
+                continue
+            if stream != None:
+                if key != None:
+                    stream = _rc4(_objectKey(key, num, 0), stream)
+                data = "%d 0 obj\n<< %s /Length %d >>\nstream\n%s\nendstream\nendobj\n" % (
+                        num, body, len(stream), stream)
+            else:
+                data = "%d 0 obj\n%s\nendobj\n" % (num, body)
+            entries[num] = (1, pos, 0)
+            out.append(data)
+            pos += len(data)
+
+        if xrefStream:
+            num = self.count + 1
+            entries[num] = (1, pos, 0)
+            rows = [(0, 0, 65535)]
+            for i in range(1, num + 1):
+                rows.append(entries.get(i, (0, 0, 0)))
+            data = _pngUp([struct.pack(">BIH", *row) for row in rows], 7)
+            out.append("%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] %s "
+                    "/Filter /FlateDecode /DecodeParms << /Predictor 12 /Columns 7 >> "
+                    "/Length %d >>\nstream\n%s\nendstream\nendobj\n" % (
+                    num, num + 1, trailer, len(data), data))
+        else:
+            xref = ["xref\n0 %d\n0000000000 65535 f \n" % (self.count + 1)]
+            for i in range(1, self.count + 1):
+                if entries.has_key(i):
+                    xref.append("%010d 00000 n \n" % entries[i][1])
+                else:
+                    xref.append("0000000000 00000 f \n")
+            xref.append("trailer\n<< /Size %d %s >>\n" % (self.count + 1, trailer))
+            out.append("".join(xref))
+        out.append("startxref\n%d\n%%%%EOF\n" % pos)
+        return "".join(out)
+
+    def _packObjectStreams(self, size):
+        candidates = [num for num in range(1, self.count + 1)
+                if self.objects.has_key(num) and self.objects[num][1] == None]
+        for i in range(0, len(candidates), size):
+            chunk = candidates[i:i+size]
+            stmnum = self.reserve()
+            offsets = []
+            bodies = []
+            pos = 0
+            for index in range(len(chunk)):
+                num = chunk[index]
+                body = self.objects[num][0] + "\n"
+                offsets.append("%d %d" % (num, pos))
+                bodies.append(body)
+                pos += len(body)
+                self.objects[num] = ((stmnum, index), None)
+            header = " ".join(offsets) + "\n"
+            self.addCompressed("/Type /ObjStm /N %d /First %d" % (
+                len(chunk), len(header)), header + "".join(bodies), stmnum)
+
+
+# Applies the PNG "Up" predictor to rows of equal length, and compresses them.
+def _pngUp(rows, columns):
+    out = []
+    prev = "\x00" * columns
+    for row in rows:
+        out.append("\x02")
+        out.append("".join([chr((ord(a) - ord(b)) % 256) for a, b in zip(row, prev)]))
+        prev = row
+    return zlib.compress("".join(out))
+
+
+_words = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do "
+          "eiusmod tempor incididunt ut labore et dolore magna aliqua").split()
+
+def _textContent(lines, seed):
+    out = []
+    for i in range(lines):
+        words = [_words[(seed + i * 7 + j * 3) % len(_words)] for j in range(10)]
+        out.append("BT /F1 10 Tf 72 %d Td (%s) Tj ET\n" % (760 - (i % 70) * 10,
+            " ".join(words)))
+    return "".join(out)
+
+
+# Adds pages with the given content stream bodies under a flat page tree.
+def _simpleDocument(b, contents, compress=True):
+    font = b.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages = b.reserve()
+    kids = []
+    for content in contents:
+        if compress:
+            c = b.addCompressed("", content)
+        else:
+            c = b.add("", content)
+        kids.append(b.add("<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            "/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages, font, c)))
+    b.add("<< /Type /Pages /Count %d /Kids [%s] >>" % (
+        len(kids), " ".join(["%d 0 R" % k for k in kids])), num=pages)
+    return b.add("<< /Type /Catalog /Pages %d 0 R >>" % pages)
+
+
+##
+# Many pages with their own small objects.
+def manyObjects(scale=1):
+    b = Builder()
+    pages = b.reserve()
+    kids = []
+    for i in range(1000 * scale):
+        font = b.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Name /F%d >>" % i)
+        gs = b.add("<< /Type /ExtGState /CA 1.0 /ca 0.5 >>")
+        c = b.add("", _textContent(3, i))
+        kids.append(b.add("<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            "/Resources << /Font << /F1 %d 0 R >> /ExtGState << /G %d 0 R >> >> "
+            "/Contents %d 0 R >>" % (pages, font, gs, c)))
+    b.add("<< /Type /Pages /Count %d /Kids [%s] >>" % (
+        len(kids), " ".join(["%d 0 R" % k for k in kids])), num=pages)
+    return b.build(b.add("<< /Type /Catalog /Pages %d 0 R >>" % pages))
+
+
+##
+# A binary page tree, 10 levels deep, with inherited attributes.
+def deepPageTree(scale=1):
+    b = Builder()
+    font = b.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    content = b.add("", _textContent(5, 0))
+    depth = 10
+    while scale > 1:
+        depth += 1
+        scale /= 2
+    def node(level, parent):
+        num = b.reserve()
+        if level == depth:
+            b.add("<< /Type /Page /Parent %d 0 R /Contents %d 0 R >>" % (parent, content), num=num)
+            return num, 1
+        kids = [node(level + 1, num) for i in range(2)]
+        extra = ""
+        if level == 0:
+            extra = "/MediaBox [0 0 612 792] /Resources << /Font << /F1 %d 0 R >> >>" % font
+        else:
+            extra = "/Parent %d 0 R" % parent
+        count = sum([k[1] for k in kids])
+        b.add("<< /Type /Pages %s /Count %d /Kids [%s] >>" % (extra, count,
+            " ".join(["%d 0 R" % k[0] for k in kids])), num=num)
+        return num, count
+    root, count = node(0, None)
+    return b.build(b.add("<< /Type /Catalog /Pages %d 0 R >>" % root))
+
+
+##
+# A one-page file with a very large cross-reference table.
+def hugeXref(scale=1):
+    b = Builder()
+    for i in range(100000 * scale):
+        b.add("<< /Index %d >>" % i)
+    return b.build(_simpleDocument(b, [_textContent(10, 0)]))
+
+
+##
+# Pages stored in object streams, with a predictor-encoded cross-reference
+# stream.
+def objectStreams(scale=1):
+    b = Builder("1.5")
+    root = _simpleDocument(b, [_textContent(20, i) for i in range(300 * scale)])
+    return b.build(root, objectStreamSize=100)
+
+
+##
+# An RC4 128 bits encrypted file, with user password "user".
+def encrypted(scale=1):
+    b = Builder()
+    root = _simpleDocument(b, [_textContent(400, i) for i in range(30 * scale)])
+    return b.build(root, password="user")
+
+
+##
+# A few pages with very large content streams.
+def largeContent(scale=1):
+    b = Builder()
+    return b.build(_simpleDocument(b, [_textContent(20000, i) for i in range(3 * scale)]))
+
+
+##
+# Pages covered with small inline images, whose data contains "EI".
+def inlineImages(scale=1):
+    b = Builder()
+    data = "".join([chr(0x80 + (i * 37) % 128) for i in range(256)])
+    data = data[:100] + "EI" + data[102:]
+    contents = []
+    for page in range(20 * scale):
+        ops = []
+        for i in range(400):
+            ops.append("q 16 0 0 16 %d %d cm BI /W 16 /H 16 /BPC 8 /CS /G ID %s EI Q\n" % (
+                (i % 20) * 30, (i / 20) * 30, data))
+        contents.append("".join(ops) + _textContent(5, page))
+    return b.build(_simpleDocument(b, contents))
+
+
+##
+# A manual with 5000 bookmarks, 50 chapters of 99 sections, half of them
+# pointing to their page directly and half through named destinations kept in
+# a two level name tree.
+def outlines(scale=1):
+    b = Builder()
+    font = b.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pagesNum = b.reserve()
+    pages = []
+    for i in range(500 * scale):
+        c = b.add("", _textContent(2, i))
+        pages.append(b.add("<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            "/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (
+            pagesNum, font, c)))
+    b.add("<< /Type /Pages /Count %d /Kids [%s] >>" % (
+        len(pages), " ".join(["%d 0 R" % p for p in pages])), num=pagesNum)
+
+    chapters = 50 * scale
+    sections = 99
+    names = []
+    outlineRoot = b.reserve()
+    def entry(index, parent, title, prev, next, first=None, last=None, count=0):
+        page = pages[index % len(pages)]
+        if index % 2:
+            name = "sec.%06d" % index
+            names.append((name, page))
+            dest = "(%s)" % name
+        else:
+            dest = "[%d 0 R /XYZ 0 792 0]" % page
+        body = "<< /Title (%s) /Parent %d 0 R /Dest %s" % (title, parent, dest)
+        for key, value in (("/Prev", prev), ("/Next", next), ("/First", first),
+                ("/Last", last)):
+            if value != None:
+                body += " %s %d 0 R" % (key, value)
+        if count:
+            body += " /Count %d" % count
+        return body + " >>"
+    chapterNums = [b.reserve() for i in range(chapters)]
+    index = 0
+    for c in range(chapters):
+        sectionNums = [b.reserve() for i in range(sections)]
+        chapterIndex = index
+        index += 1
+        for i in range(sections):
+            prev = next = None
+            if i > 0:
+                prev = sectionNums[i - 1]
+            if i < sections - 1:
+                next = sectionNums[i + 1]
+            b.add(entry(index, chapterNums[c], "Section %d.%d" % (c + 1, i + 1),
+                prev, next), num=sectionNums[i])
+            index += 1
+        prev = next = None
+        if c > 0:
+            prev = chapterNums[c - 1]
+        if c < chapters - 1:
+            next = chapterNums[c + 1]
+        b.add(entry(chapterIndex, outlineRoot, "Chapter %d" % (c + 1), prev, next,
+            sectionNums[0], sectionNums[-1], -sections), num=chapterNums[c])
+    b.add("<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>" % (
+        chapterNums[0], chapterNums[-1], chapters), num=outlineRoot)
+
+    names.sort()
+    leaves = []
+    for i in range(0, len(names), 64):
+        chunk = names[i:i+64]
+        leaves.append(b.add("<< /Limits [(%s) (%s)] /Names [%s] >>" % (
+            chunk[0][0], chunk[-1][0], " ".join(["(%s) [%d 0 R /Fit]" % n for n in chunk]))))
+    dests = b.add("<< /Kids [%s] >>" % " ".join(["%d 0 R" % l for l in leaves]))
+    return b.build(b.add("<< /Type /Catalog /Pages %d 0 R /Outlines %d 0 R "
+        "/Names << /Dests %d 0 R >> /PageMode /UseOutlines >>" % (
+        pagesNum, outlineRoot, dests)))
+
+
+##
+# The corpus files by name, as functions taking an integer scale factor and
+# returning the file's data.
+CORPUS = {
+    "many-objects": manyObjects,
+    "deep-page-tree": deepPageTree,
+    "huge-xref": hugeXref,
+    "object-streams": objectStreams,
+    "encrypted": encrypted,
+    "large-content": largeContent,
+    "inline-images": inlineImages,
+    "outlines": outlines,
+    }
+
+##
+# Generates a corpus file.
+# @param name One of the names in {@link #CORPUS CORPUS}.
+# @param scale A size multiplier, which must be a positive integer: the
+# numbers of pages, objects and so on are multiplied by it.
+# @return The file's data, as a string.
+def generate(name, scale=1):
+    if not isinstance(scale, (int, long)) or scale < 1:
+        raise ValueError("scale must be a positive integer, not %r" % (scale,))
+    return CORPUS[name](scale)
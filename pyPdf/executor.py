@@ -0,0 +1,434 @@
+"""
+Front-ends to PdfFileReader and PdfFileWriter that run their work in
+background threads, for programs built around an event loop.  Every call
+returns a {@link #PdfFuture PdfFuture} immediately; the loop is notified
+through the future's callbacks.
+"""
+
+import logging
+import threading
+import Queue
+from pdf import PdfFileReader, PdfFileWriter
+
+##
+# Raised by {@link #PdfFuture.result PdfFuture.result} when the future's work
+# was cancelled.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class CancelledError(Exception):
+    pass
+
+
+##
+# The result of some work submitted to a {@link #PdfExecutor PdfExecutor}.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class PdfFuture(object):
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._done = False
+        self._cancelled = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    ##
+    # Asks for the work to be cancelled.  Work that hasn't started yet won't
+    # run; work that is running is stopped the next time it reads or writes a
+    # PDF object.  Either way the future finishes with a {@link
+    # #CancelledError CancelledError}, even if the running work completes.
+    # @return False if the work was already done, True otherwise.
+    def cancel(self):
+        self._condition.acquire()
+        try:
+            if self._done:
+                return False
+            self._cancelled = True
+            return True
+        finally:
+            self._condition.release()
+
+    ##
+    # Returns True if the work was cancelled.
+    def cancelled(self):
+        return self._cancelled and self._done
+
+    ##
+    # Returns True if the work is finished, was cancelled or failed.
+    def done(self):
+        return self._done
+
+    ##
+    # Waits for the work to finish and returns its result.  If the work
+    # failed, its exception is raised again here.
+    # @param timeout The time to wait, in seconds, or None to wait for as long
+    # as it takes.
+    def result(self, timeout=None):
+        self._condition.acquire()
+        try:
+            if not self._done:
+                self._condition.wait(timeout)
+            if not self._done:
+                raise RuntimeError, "timed out"
+            if self._exception != None:
+                raise self._exception
+            return self._result
+        finally:
+            self._condition.release()
+
+    ##
+    # Adds a function called with the future once the work is done.  It runs
+    # in the worker thread, or right away if the work is already done, so an
+    # event loop will usually hand it over to its own thread (for example with
+    # a thread-safe "call soon").
+    def addDoneCallback(self, callback):
+        self._condition.acquire()
+        try:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        finally:
+            self._condition.release()
+        self._runCallback(callback)
+
+    # Runs a done callback.  Its errors are logged rather than raised, so that
+    # they don't stop the worker thread that finished the work.
+    def _runCallback(self, callback):
+        try:
+            callback(self)
+        except Exception:
+            logging.getLogger("pyPdf").exception(
+                    "exception in PdfFuture done callback %r" % (callback,))
+
+    def _checkCancelled(self):
+        if self._cancelled:
+            raise CancelledError
+
+    def _finish(self, result=None, exception=None):
+        self._condition.acquire()
+        try:
+            if self._cancelled:
+                # cancel() already returned True: the work's outcome is
+                # dropped, so that cancelled() and result() agree.
+                result = None
+                if not isinstance(exception, CancelledError):
+                    exception = CancelledError()
+            self._result = result
+            self._exception = exception
+            self._done = True
+            self._condition.notifyAll()
+            callbacks = self._callbacks
+            self._callbacks = []
+        finally:
+            self._condition.release()
+        for callback in callbacks:
+            self._runCallback(callback)
+
+
+##
+# A pool of worker threads.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param workers The number of worker threads.
+class PdfExecutor(object):
+    def __init__(self, workers=4):
+        self._queue = Queue.Queue()
+        self._threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._work)
+            t.setDaemon(True)
+            t.start()
+            self._threads.append(t)
+
+    ##
+    # Runs a function in a worker thread.
+    # @return A {@link #PdfFuture PdfFuture} for the function's result.
+    def submit(self, fn, *args):
+        future = PdfFuture()
+        self._put(future, fn, args)
+        return future
+
+    def _put(self, future, fn, args):
+        self._queue.put((future, fn, args))
+
+    ##
+    # Stops the worker threads once the work submitted so far is done.
+    def shutdown(self):
+        # work on a document hands its next function to the executor when it
+        # is done, so wait for that before stopping the workers.
+        self._queue.join()
+        for t in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item == None:
+                return
+            future, fn, args = item
+            _run(future, fn, args)
+            self._queue.task_done()
+
+
+# Runs fn(*args) and finishes the future with its outcome, unless the future
+# was cancelled before it started.
+def _run(future, fn, args):
+    if future._cancelled:
+        future._finish(exception=CancelledError())
+        return
+    try:
+        result = fn(*args)
+    except Exception, e:
+        future._finish(exception=e)
+    else:
+        future._finish(result)
+
+
+_defaultExecutor = None
+_defaultExecutorLock = threading.Lock()
+
+def _getDefaultExecutor():
+    global _defaultExecutor
+    _defaultExecutorLock.acquire()
+    try:
+        if _defaultExecutor == None:
+            _defaultExecutor = PdfExecutor()
+        return _defaultExecutor
+    finally:
+        _defaultExecutorLock.release()
+
+
+# Wraps the stream of a reader or writer to stop the running work as soon as
+# its future is cancelled.  pyPdf reads and writes its stream object by
+# object, so this cancels the work between objects.
+class _CancellableStream(object):
+    def __init__(self, stream):
+        self.stream = stream
+        self.future = None
+
+    def read(self, *args):
+        if self.future != None:
+            self.future._checkCancelled()
+        return self.stream.read(*args)
+
+    def write(self, data):
+        if self.future != None:
+            self.future._checkCancelled()
+        return self.stream.write(data)
+
+    def seek(self, *args):
+        return self.stream.seek(*args)
+
+    def tell(self):
+        return self.stream.tell()
+
+
+# The work pending on one document, run one function at a time in the order
+# it was submitted.  Only the first function is handed to the executor; when
+# it is done, it hands over the next one.  This keeps the document's pending
+# work from holding up worker threads that could serve other documents.
+class _DocumentQueue(object):
+    def __init__(self, executor):
+        self.executor = executor
+        self.stream = _CancellableStream(None)
+        # held while a function runs, for the callers that must not change the
+        # document in the meantime.
+        self.lock = threading.Lock()
+        # list of (future, fn, args), the first of which is running.
+        self._pending = []
+        self._pendingLock = threading.Lock()
+
+    # Runs fn(*args) in the executor, after the work already submitted, with
+    # the stream's future set.
+    def submit(self, fn, *args):
+        future = PdfFuture()
+        self._pendingLock.acquire()
+        try:
+            self._pending.append((future, fn, args))
+            first = len(self._pending) == 1
+        finally:
+            self._pendingLock.release()
+        if first:
+            self._putFirst()
+        return future
+
+    def _putFirst(self):
+        # the executor's own future for this step is never cancelled, so
+        # _runFirst always runs and hands over the next function.
+        self.executor._put(PdfFuture(), self._runFirst, ())
+
+    def _runFirst(self):
+        future, fn, args = self._pending[0]
+        self.lock.acquire()
+        try:
+            self.stream.future = future
+            try:
+                _run(future, fn, args)
+            finally:
+                self.stream.future = None
+        finally:
+            self.lock.release()
+        self._pendingLock.acquire()
+        try:
+            del self._pending[0]
+            more = len(self._pending) > 0
+        finally:
+            self._pendingLock.release()
+        if more:
+            self._putFirst()
+
+
+##
+# Opens a PDF file for reading in a worker thread.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param source A filename, or a file-like object providing read, seek and
+# tell.  A file is opened in the worker thread, and closed by {@link
+# #AsyncPdfFileReader.close AsyncPdfFileReader.close}; a file-like object is
+# left to the caller to close.
+# @param executor The {@link #PdfExecutor PdfExecutor} to use.  A shared
+# executor is used by default.
+# @return A {@link #PdfFuture PdfFuture} for an {@link #AsyncPdfFileReader
+# AsyncPdfFileReader}.
+def openReader(source, executor=None):
+    if executor == None:
+        executor = _getDefaultExecutor()
+    reader = AsyncPdfFileReader(executor)
+    def _open():
+        stream = source
+        if not hasattr(stream, "read"):
+            stream = file(stream, "rb")
+            reader._ownedStream = stream
+        reader._queue.stream.stream = stream
+        try:
+            reader.reader = PdfFileReader(reader._queue.stream)
+        except:
+            reader._closeStream()
+            raise
+        return reader
+    return reader._queue.submit(_open)
+
+
+##
+# A PdfFileReader whose methods run in worker threads, as returned by {@link
+# #openReader openReader}.  Work on one document is run in the order it was
+# submitted.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class AsyncPdfFileReader(object):
+    def __init__(self, executor):
+        self.executor = executor
+        ##
+        # The underlying PdfFileReader.  It must not be used while work is
+        # pending on this reader.
+        self.reader = None
+        self._queue = _DocumentQueue(executor)
+        # the file opened by openReader, if it was given a filename.
+        self._ownedStream = None
+
+    ##
+    # Closes the file opened by {@link #openReader openReader} when it was
+    # given a filename, once the work submitted so far is done.  The reader
+    # can't be used afterwards.
+    # @return A {@link #PdfFuture PdfFuture} for None.
+    def close(self):
+        return self._queue.submit(self._closeStream)
+
+    def _closeStream(self):
+        if self._ownedStream != None:
+            self._ownedStream.close()
+            self._ownedStream = None
+
+    ##
+    # Runs a function with the PdfFileReader in a worker thread.
+    # @param fn A function, called as fn(reader, *args).
+    # @return A {@link #PdfFuture PdfFuture} for the function's result.
+    def call(self, fn, *args):
+        return self._queue.submit(lambda: fn(self.reader, *args))
+
+    ##
+    # @return A {@link #PdfFuture PdfFuture} for the result of {@link
+    # #PdfFileReader.decrypt PdfFileReader.decrypt}.
+    def decrypt(self, password):
+        return self.call(PdfFileReader.decrypt, password)
+
+    ##
+    # @return A {@link #PdfFuture PdfFuture} for the number of pages.
+    def getNumPages(self):
+        return self.call(PdfFileReader.getNumPages)
+
+    ##
+    # @return A {@link #PdfFuture PdfFuture} for a {@link #PageObject
+    # PageObject}.  The page's objects are read in the worker thread.
+    def getPage(self, pageNumber):
+        return self.call(PdfFileReader.getPage, pageNumber)
+
+    ##
+    # @return A {@link #PdfFuture PdfFuture} for the text of a page, as {@link
+    # #PageObject.extractText PageObject.extractText} returns it.
+    def extractText(self, pageNumber):
+        return self.call(lambda reader: reader.getPage(pageNumber).extractText())
+
+    ##
+    # @return A {@link #PdfFuture PdfFuture} for the document information, as
+    # {@link #PdfFileReader.getDocumentInfo PdfFileReader.getDocumentInfo}
+    # returns it.
+    def getDocumentInfo(self):
+        return self.call(PdfFileReader.getDocumentInfo)
+
+
+##
+# A PdfFileWriter that writes its output in a worker thread.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param writer The PdfFileWriter to write.  A new one is created by default.
+# @param executor The {@link #PdfExecutor PdfExecutor} to use.  A shared
+# executor is used by default.
+class AsyncPdfFileWriter(object):
+    def __init__(self, writer=None, executor=None):
+        if writer == None:
+            writer = PdfFileWriter()
+        if executor == None:
+            executor = _getDefaultExecutor()
+        ##
+        # The underlying PdfFileWriter.  It must not be used while a write is
+        # pending.
+        self.writer = writer
+        self.executor = executor
+        self._queue = _DocumentQueue(executor)
+
+    ##
+    # Adds a page to the document; see {@link #PdfFileWriter.addPage
+    # PdfFileWriter.addPage}.  Pages can be added from documents opened with
+    # {@link #openReader openReader} once their futures are done.
+    def addPage(self, page):
+        self._queue.lock.acquire()
+        try:
+            self.writer.addPage(page)
+        finally:
+            self._queue.lock.release()
+
+    ##
+    # Writes the document in a worker thread.  Compression, encryption and the
+    # reading of the source documents' objects all happen in the worker, so
+    # the source documents must not have work pending until the write is
+    # done.
+    # @param stream A filename, or a file-like object providing write and
+    # tell.  A file is opened, and closed, in the worker thread.
+    # @return A {@link #PdfFuture PdfFuture} for None.
+    def write(self, stream):
+        def _write():
+            out = stream
+            if not hasattr(out, "write"):
+                out = file(out, "wb")
+            self._queue.stream.stream = out
+            try:
+                self.writer.write(self._queue.stream)
+            finally:
+                self._queue.stream.stream = None
+                if out is not stream:
+                    out.close()
+        return self._queue.submit(_write)
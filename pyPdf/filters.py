@@ -34,6 +34,7 @@ Implementation of stream filters for PDF.
 __author__ = "Mathieu Fenniak"
 __author_email__ = "biziqe@mathieu.fenniak.net"
 
+import time
 from utils import PdfReadError
 try:
     from cStringIO import StringIO
@@ -46,6 +47,11 @@ try:
         return zlib.decompress(data)
     def compress(data):
         return zlib.compress(data)
+    def decompressChunks(chunks):
+        d = zlib.decompressobj()
+        retval = [d.decompress(chunk) for chunk in chunks]
+        retval.append(d.flush())
+        return "".join(retval)
 except ImportError:
     # Unable to import zlib.  Attempt to use the System.IO.Compression
     # library from the .NET framework. (IronPython only)
@@ -94,11 +100,19 @@ except ImportError:
         retval = _bytearr_to_string(bytes)
         ms.Close()
         return retval
+    def decompressChunks(chunks):
+        return decompress("".join(chunks))
 
 
 class FlateDecode(object):
+    ##
+    # @param data The compressed data, either as a string or as an iterable of
+    # string chunks.
     def decode(data, decodeParms):
-        data = decompress(data)
+        if isinstance(data, str):
+            data = decompress(data)
+        else:
+            data = decompressChunks(data)
         predictor = 1
         if decodeParms:
             predictor = decodeParms.get("/Predictor", 1)
@@ -212,14 +226,33 @@ class ASCII85Decode(object):
         return retval
     decode = staticmethod(decode)
 
-def decodeStreamData(stream):
+##
+# Returns the filter chain of a stream object, as a sequence of filter names.
+def getFilters(stream):
     from generic import NameObject
     filters = stream.get("/Filter", ())
     if len(filters) and not isinstance(filters[0], NameObject):
         # we have a single filter instance
         filters = (filters,)
-    data = stream._data
+    return filters
+
+##
+# Decodes the data of a stream object.
+# @param stream The stream object.
+# @param filters The filters to apply, defaulting to the stream's /Filter.
+# Used to apply only the leading filters of a chain.
+def decodeStreamData(stream, filters=None):
+    if filters == None:
+        filters = getFilters(stream)
+    if len(filters) and filters[0] == "/FlateDecode":
+        # inflate the stream data as it is decrypted, if it is encrypted.
+        data = stream._iterRawData()
+    else:
+        data = stream._data
+    stats = stream._stats
     for filterType in filters:
+        if stats != None:
+            start = time.time()
         if filterType == "/FlateDecode":
             data = FlateDecode.decode(data, stream.get("/DecodeParms"))
         elif filterType == "/ASCIIHexDecode":
@@ -227,14 +260,14 @@ def decodeStreamData(stream):
         elif filterType == "/ASCII85Decode":
             data = ASCII85Decode.decode(data)
         elif filterType == "/Crypt":
-            decodeParams = stream.get("/DecodeParams", {})
-            if "/Name" not in decodeParams and "/Type" not in decodeParams:
-                pass
-            else:
-                raise NotImplementedError("/Crypt filter with /Name or /Type not supported yet")
+            # Crypt filters are applied by the PdfFileReader when the stream
+            # is read from an encrypted document.
+            continue
         else:
             # unsupported filter
             raise NotImplementedError("unsupported filter %s" % filterType)
+        if stats != None:
+            stats.add("decode" + filterType, len(data), time.time() - start)
     return data
 
 if __name__ == "__main__":
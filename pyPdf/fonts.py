@@ -0,0 +1,337 @@
+"""
+Decoding of the text strings shown with PDF fonts, through the font's
+/ToUnicode CMap or its /Encoding.
+"""
+
+import re
+import unicodedata
+from generic import NameObject, NumberObject, ArrayObject, _pdfDocEncoding
+
+##
+# Returns the {@link #Font Font} for a font dictionary.  The Font is created
+# the first time it is requested, and is then kept with the font dictionary,
+# so that a font used on many pages only has its CMap parsed once.
+# @param font A font dictionary, or an indirect reference to one.
+def getFont(font):
+    font = font.getObject()
+    retval = getattr(font, "_decodedFont", None)
+    if retval == None:
+        retval = Font(font)
+        font._decodedFont = retval
+    return retval
+
+
+##
+# Converts the byte strings shown with a font into unicode text.
+# <p>
+# A /ToUnicode CMap is used if the font has one.  Otherwise, simple fonts are
+# decoded through their /Encoding, including /Differences.  Composite (Type0)
+# fonts without a /ToUnicode CMap can't be decoded.
+class Font(object):
+    def __init__(self, font):
+        self.font = font
+        self.composite = font.get("/Subtype") == "/Type0"
+        self.cmap = None
+        self.codeLengths = [1]
+        if self.composite:
+            self.codeLengths = [2]
+        if font.has_key("/ToUnicode"):
+            cmap = font["/ToUnicode"]
+            if hasattr(cmap, "getData"):
+                self.cmap, codeLengths = parseCMap(cmap.getData())
+                if codeLengths:
+                    self.codeLengths = codeLengths
+        self.encoding = None
+        if not self.composite:
+            self.encoding = _getEncoding(font.get("/Encoding"))
+        self._loadWidths()
+
+    def _loadWidths(self):
+        # glyph widths, in thousandths of text space units
+        font = self.font
+        self.widths = {}
+        if self.composite:
+            if not font.has_key("/DescendantFonts"):
+                self.defaultWidth = 1000.0
+                return
+            descendant = font["/DescendantFonts"][0].getObject()
+            self.defaultWidth = float(descendant.get("/DW", NumberObject(1000)).getObject())
+            if descendant.has_key("/W"):
+                # [c [w1 w2 ...]] or [cfirst clast w] entries
+                w = [x.getObject() for x in descendant["/W"]]
+                i = 0
+                while i + 1 < len(w):
+                    if isinstance(w[i + 1], ArrayObject):
+                        for j in range(len(w[i + 1])):
+                            self.widths[w[i] + j] = float(w[i + 1][j].getObject())
+                        i += 2
+                    else:
+                        for cid in range(w[i], w[i + 1] + 1):
+                            self.widths[cid] = float(w[i + 2])
+                        i += 3
+        else:
+            if not font.has_key("/Widths"):
+                # the standard 14 fonts don't need to have /Widths; use an
+                # average width instead.
+                self.defaultWidth = 500.0
+                return
+            self.defaultWidth = 0.0
+            if font.has_key("/FontDescriptor"):
+                self.defaultWidth = float(font["/FontDescriptor"].get(
+                    "/MissingWidth", NumberObject(0)).getObject())
+            first = font.get("/FirstChar", NumberObject(0)).getObject()
+            widths = font["/Widths"]
+            for i in range(len(widths)):
+                self.widths[first + i] = float(widths[i].getObject())
+
+    ##
+    # Measures a string shown with this font.
+    # @param data The string's bytes.
+    # @return A (width, codes, spaces) tuple: the sum of the glyph widths in
+    # thousandths of text space units, the number of character codes, and the
+    # number of single-byte codes 32, to which word spacing applies.
+    def measure(self, data):
+        widths = self.widths
+        default = self.defaultWidth
+        if not self.composite:
+            width = 0.0
+            for c in data:
+                width += widths.get(ord(c), default)
+            return width, len(data), data.count(" ")
+        length = self.codeLengths[0]
+        width = 0.0
+        codes = 0
+        for i in range(0, len(data), length):
+            code = 0
+            for c in data[i:i+length]:
+                code = (code << 8) | ord(c)
+            width += widths.get(code, default)
+            codes += 1
+        return width, codes, 0
+
+    ##
+    # Decodes a string shown with this font.
+    # @param data The string's bytes.
+    # @return A unicode string.
+    def decode(self, data):
+        cmap = self.cmap
+        encoding = self.encoding
+        if cmap == None:
+            if encoding == None:
+                return u""
+            return u"".join([encoding[ord(c)] for c in data])
+        retval = []
+        i = 0
+        while i < len(data):
+            for length in self.codeLengths:
+                code = data[i:i+length]
+                if cmap.has_key(code):
+                    retval.append(cmap[code])
+                    i += length
+                    break
+            else:
+                # unmapped code
+                length = self.codeLengths[0]
+                if encoding != None:
+                    retval.append(encoding[ord(data[i])])
+                    length = 1
+                i += length
+        return u"".join(retval)
+
+
+def _getEncoding(encoding):
+    if encoding != None:
+        encoding = encoding.getObject()
+    differences = ()
+    base = None
+    if isinstance(encoding, NameObject):
+        base = encoding
+    elif encoding != None:
+        base = encoding.get("/BaseEncoding")
+        differences = encoding.get("/Differences", ArrayObject()).getObject()
+    if base == "/WinAnsiEncoding":
+        retval = [unicode(chr(i), "cp1252", "replace") for i in range(256)]
+    elif base == "/MacRomanEncoding":
+        retval = [unicode(chr(i), "mac_roman", "replace") for i in range(256)]
+    else:
+        # StandardEncoding.  PDFDocEncoding is used to approximate it, as
+        # both agree on the ASCII characters.
+        retval = list(_standardEncoding)
+    code = 0
+    for item in differences:
+        item = item.getObject()
+        if isinstance(item, NumberObject):
+            code = item
+        elif code < 256:
+            char = glyphNameToUnicode(item)
+            if char != None:
+                retval[code] = char
+            code += 1
+    return retval
+
+_standardEncoding = list(_pdfDocEncoding)
+_standardEncoding[0x27] = u"\u2019"
+_standardEncoding[0x60] = u"\u2018"
+for _i in range(256):
+    if _standardEncoding[_i] == u"\u0000":
+        _standardEncoding[_i] = u""
+    elif _i < 32:
+        _standardEncoding[_i] = u""
+del _i
+
+
+_hexString = r"<([0-9A-Fa-f\s]*)>"
+_codespaceRange = re.compile(_hexString + r"\s*" + _hexString)
+_bfChar = re.compile(_hexString + r"\s*" + _hexString)
+_bfRange = re.compile(_hexString + r"\s*" + _hexString + r"\s*(?:" +
+        _hexString + r"|\[([^\]]*)\])")
+_hexStrings = re.compile(_hexString)
+
+def _hex(s):
+    s = "".join(s.split())
+    if len(s) % 2:
+        s += "0"
+    return s.decode("hex")
+
+def _utf16(s):
+    return unicode(_hex(s), "utf-16-be", "replace")
+
+##
+# Parses the code to unicode mappings of a /ToUnicode CMap.
+# @return A (mapping, codeLengths) tuple.  The mapping is a dict from codes
+# (byte strings) to unicode strings.  codeLengths lists the lengths of codes,
+# in bytes, defined by the CMap's code space ranges, shortest first.
+def parseCMap(data):
+    cmap = {}
+    codeLengths = {}
+    for block in _blocks(data, "codespacerange"):
+        for lo, hi in _codespaceRange.findall(block):
+            codeLengths[len(_hex(lo))] = True
+    for block in _blocks(data, "bfchar"):
+        for src, dst in _bfChar.findall(block):
+            cmap[_hex(src)] = _utf16(dst)
+    for block in _blocks(data, "bfrange"):
+        for lo, hi, dst, dstArray in _bfRange.findall(block):
+            lo, hi = _hex(lo), _hex(hi)
+            length = len(lo)
+            lo, hi = _toInt(lo), _toInt(hi)
+            if dstArray:
+                dsts = [_utf16(d) for d in _hexStrings.findall(dstArray)]
+                for i in range(min(hi - lo + 1, len(dsts))):
+                    cmap[_fromInt(lo + i, length)] = dsts[i]
+            else:
+                dst = _utf16(dst)
+                if not dst:
+                    continue
+                prefix, last = dst[:-1], ord(dst[-1])
+                for i in range(hi - lo + 1):
+                    cmap[_fromInt(lo + i, length)] = prefix + unichr((last + i) & 0xFFFF)
+    if not codeLengths:
+        for code in cmap.keys():
+            codeLengths[len(code)] = True
+    codeLengths = codeLengths.keys()
+    codeLengths.sort()
+    return cmap, codeLengths
+
+def _blocks(data, name):
+    return re.findall(r"begin%s(.*?)end%s" % (name, name), data, re.S)
+
+def _toInt(s):
+    retval = 0
+    for c in s:
+        retval = (retval << 8) | ord(c)
+    return retval
+
+def _fromInt(i, length):
+    retval = ""
+    for x in range(length):
+        retval = chr(i & 0xFF) + retval
+        i >>= 8
+    return retval
+
+
+##
+# Converts a glyph name, as used in /Differences arrays, to unicode.  This
+# handles the "uniXXXX" and "uXXXX" conventions, the names of the Latin-1
+# characters and common punctuation, and accented Latin letters.
+# @return A unicode string, or None if the glyph name is unknown.
+def glyphNameToUnicode(name):
+    if name.startswith("/"):
+        name = name[1:]
+    # variants such as "a.sc" or "one.oldstyle"
+    name = name.split(".")[0].split("_")[0]
+    if _glyphNames.has_key(name):
+        return _glyphNames[name]
+    if len(name) == 1:
+        return unicode(name)
+    try:
+        if name.startswith("uni") and len(name) >= 7 and (len(name) - 3) % 4 == 0:
+            return u"".join([unichr(int(name[i:i+4], 16))
+                             for i in range(3, len(name), 4)])
+        if name.startswith("u") and 5 <= len(name) <= 7:
+            return unichr(int(name[1:], 16))
+    except ValueError:
+        pass
+    for accent, description in _accents:
+        if name.endswith(accent) and len(name) == len(accent) + 1:
+            base = name[0]
+            if base.isupper():
+                case = "CAPITAL"
+            else:
+                case = "SMALL"
+            try:
+                return unicodedata.lookup("LATIN %s LETTER %s WITH %s" %
+                        (case, base.upper(), description))
+            except KeyError:
+                return None
+    return None
+
+_accents = (
+    ("acute", "ACUTE"), ("grave", "GRAVE"), ("circumflex", "CIRCUMFLEX"),
+    ("dieresis", "DIAERESIS"), ("tilde", "TILDE"), ("ring", "RING ABOVE"),
+    ("cedilla", "CEDILLA"), ("caron", "CARON"), ("macron", "MACRON"),
+    ("breve", "BREVE"), ("ogonek", "OGONEK"), ("dotaccent", "DOT ABOVE"),
+    ("hungarumlaut", "DOUBLE ACUTE"), ("commaaccent", "COMMA BELOW"),
+    )
+
+_glyphNames = {
+    "space": u" ", "exclam": u"!", "quotedbl": u'"', "numbersign": u"#",
+    "dollar": u"$", "percent": u"%", "ampersand": u"&", "quotesingle": u"'",
+    "parenleft": u"(", "parenright": u")", "asterisk": u"*", "plus": u"+",
+    "comma": u",", "hyphen": u"-", "period": u".", "slash": u"/",
+    "zero": u"0", "one": u"1", "two": u"2", "three": u"3", "four": u"4",
+    "five": u"5", "six": u"6", "seven": u"7", "eight": u"8", "nine": u"9",
+    "colon": u":", "semicolon": u";", "less": u"<", "equal": u"=",
+    "greater": u">", "question": u"?", "at": u"@", "bracketleft": u"[",
+    "backslash": u"\\", "bracketright": u"]", "asciicircum": u"^",
+    "underscore": u"_", "grave": u"`", "braceleft": u"{", "bar": u"|",
+    "braceright": u"}", "asciitilde": u"~",
+    "quoteleft": u"\u2018", "quoteright": u"\u2019",
+    "quotedblleft": u"\u201c", "quotedblright": u"\u201d",
+    "quotesinglbase": u"\u201a", "quotedblbase": u"\u201e",
+    "guilsinglleft": u"\u2039", "guilsinglright": u"\u203a",
+    "bullet": u"\u2022", "dagger": u"\u2020", "daggerdbl": u"\u2021",
+    "ellipsis": u"\u2026", "emdash": u"\u2014", "endash": u"\u2013",
+    "florin": u"\u0192", "fraction": u"\u2044", "minus": u"\u2212",
+    "perthousand": u"\u2030", "trademark": u"\u2122",
+    "fi": u"fi", "fl": u"fl", "ff": u"ff", "ffi": u"ffi", "ffl": u"ffl",
+    "Lslash": u"\u0141", "lslash": u"\u0142", "OE": u"\u0152", "oe": u"\u0153",
+    "dotlessi": u"\u0131", "Euro": u"\u20ac", "exclamdown": u"\u00a1",
+    "cent": u"\u00a2", "sterling": u"\u00a3", "currency": u"\u00a4",
+    "yen": u"\u00a5", "brokenbar": u"\u00a6", "section": u"\u00a7",
+    "dieresis": u"\u00a8", "copyright": u"\u00a9", "ordfeminine": u"\u00aa",
+    "guillemotleft": u"\u00ab", "logicalnot": u"\u00ac", "registered": u"\u00ae",
+    "macron": u"\u00af", "degree": u"\u00b0", "plusminus": u"\u00b1",
+    "twosuperior": u"\u00b2", "threesuperior": u"\u00b3", "acute": u"\u00b4",
+    "mu": u"\u00b5", "paragraph": u"\u00b6", "periodcentered": u"\u00b7",
+    "cedilla": u"\u00b8", "onesuperior": u"\u00b9", "ordmasculine": u"\u00ba",
+    "guillemotright": u"\u00bb", "onequarter": u"\u00bc", "onehalf": u"\u00bd",
+    "threequarters": u"\u00be", "questiondown": u"\u00bf", "AE": u"\u00c6",
+    "ae": u"\u00e6", "Eth": u"\u00d0", "eth": u"\u00f0", "Oslash": u"\u00d8",
+    "oslash": u"\u00f8", "Thorn": u"\u00de", "thorn": u"\u00fe",
+    "germandbls": u"\u00df", "multiply": u"\u00d7", "divide": u"\u00f7",
+    "circumflex": u"\u02c6", "tilde": u"\u02dc", "breve": u"\u02d8",
+    "caron": u"\u02c7", "dotaccent": u"\u02d9", "hungarumlaut": u"\u02dd",
+    "ogonek": u"\u02db", "ring": u"\u02da", "nbspace": u"\u00a0",
+    "sfthyphen": u"\u00ad", "Ydieresis": u"\u0178",
+    }
@@ -35,13 +35,29 @@ __author__ = "Mathieu Fenniak"
 __author_email__ = "biziqe@mathieu.fenniak.net"
 
 import re
+import sys
+import time
 from utils import readNonWhitespace, RC4_encrypt
 import filters
 import utils
 import decimal
 import codecs
 
-def readObject(stream, pdf):
+# Encrypts a string or stream being written.  The encryption is recorded in
+# stats, the PdfStats of the PdfFileWriter writing it, if it has any.
+def _encryptRC4(key, data, stats=None):
+    if stats == None:
+        return RC4_encrypt(key, data)
+    start = time.time()
+    data = RC4_encrypt(key, data)
+    stats.add("encrypt/RC4", len(data), time.time() - start)
+    return data
+
+##
+# Reads an object.
+# @param decodeStrings If false, strings are read as ByteStringObjects, and are
+# only decoded if they are used as text.  Content streams are read that way.
+def readObject(stream, pdf, decodeStrings=True):
     tok = stream.read(1)
     stream.seek(-1, 1) # reset to start
     if tok == 't' or tok == 'f':
@@ -49,13 +65,13 @@ def readObject(stream, pdf):
         return BooleanObject.readFromStream(stream)
     elif tok == '(':
         # string object
-        return readStringFromStream(stream)
+        return readStringFromStream(stream, decodeStrings)
     elif tok == '/':
         # name object
         return NameObject.readFromStream(stream)
     elif tok == '[':
         # array object
-        return ArrayObject.readFromStream(stream, pdf)
+        return ArrayObject.readFromStream(stream, pdf, decodeStrings)
     elif tok == 'n':
         # null object
         return NullObject.readFromStream(stream)
@@ -66,14 +82,14 @@ def readObject(stream, pdf):
         if peek == '<<':
             return DictionaryObject.readFromStream(stream, pdf)
         else:
-            return readHexStringFromStream(stream)
+            return readHexStringFromStream(stream, decodeStrings)
     elif tok == '%':
         # comment
         while tok not in ('\r', '\n'):
             tok = stream.read(1)
         tok = readNonWhitespace(stream)
         stream.seek(-1, 1)
-        return readObject(stream, pdf)
+        return readObject(stream, pdf, decodeStrings)
     else:
         # number object OR indirect reference
         if tok == '+' or tok == '-':
@@ -86,14 +102,21 @@ def readObject(stream, pdf):
         else:
             return NumberObject.readFromStream(stream)
 
+# The generic objects have no instance dictionary, except for arrays,
+# dictionaries and streams, since a parsed document holds a great many of
+# them.
 class PdfObject(object):
+    __slots__ = ()
+
     def getObject(self):
         """Resolves indirect references."""
         return self
 
 
 class NullObject(PdfObject):
-    def writeToStream(self, stream, encryption_key):
+    __slots__ = ()
+
+    def writeToStream(self, stream, encryption_key, stats=None):
         stream.write("null")
 
     def readFromStream(stream):
@@ -105,10 +128,12 @@ class NullObject(PdfObject):
 
 
 class BooleanObject(PdfObject):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
-    def writeToStream(self, stream, encryption_key):
+    def writeToStream(self, stream, encryption_key, stats=None):
         if self.value:
             stream.write("true")
         else:
@@ -126,14 +151,14 @@ class BooleanObject(PdfObject):
 
 
 class ArrayObject(list, PdfObject):
-    def writeToStream(self, stream, encryption_key):
+    def writeToStream(self, stream, encryption_key, stats=None):
         stream.write("[")
         for data in self:
             stream.write(" ")
-            data.writeToStream(stream, encryption_key)
+            data.writeToStream(stream, encryption_key, stats)
         stream.write(" ]")
 
-    def readFromStream(stream, pdf):
+    def readFromStream(stream, pdf, decodeStrings=True):
         arr = ArrayObject()
         tmp = stream.read(1)
         if tmp != "[":
@@ -150,12 +175,14 @@ class ArrayObject(list, PdfObject):
                 break
             stream.seek(-1, 1)
             # read and append obj
-            arr.append(readObject(stream, pdf))
+            arr.append(readObject(stream, pdf, decodeStrings))
         return arr
     readFromStream = staticmethod(readFromStream)
 
 
 class IndirectObject(PdfObject):
+    __slots__ = ("idnum", "generation", "pdf")
+
     def __init__(self, idnum, generation, pdf):
         self.idnum = idnum
         self.generation = generation
@@ -179,7 +206,7 @@ class IndirectObject(PdfObject):
     def __ne__(self, other):
         return not self.__eq__(other)
 
-    def writeToStream(self, stream, encryption_key):
+    def writeToStream(self, stream, encryption_key, stats=None):
         stream.write("%s %s R" % (self.idnum, self.generation))
 
     def readFromStream(stream, pdf):
@@ -198,28 +225,130 @@ class IndirectObject(PdfObject):
         r = stream.read(1)
         if r != "R":
             raise utils.PdfReadError("error reading indirect object reference")
-        return IndirectObject(int(idnum), int(generation), pdf)
+        return IndirectObject._shared(int(idnum), int(generation), pdf)
     readFromStream = staticmethod(readFromStream)
 
+    # Returns the IndirectObject for a reference of a document.  Documents
+    # with a _sharedReferences dictionary (PdfFileReader) use a single
+    # instance for all the references to an object; others get a new one,
+    # since PdfFileWriter renumbers its references in place.
+    def _shared(idnum, generation, pdf):
+        shared = getattr(pdf, "_sharedReferences", None)
+        if shared == None:
+            return IndirectObject(idnum, generation, pdf)
+        refs = shared.get(generation)
+        if refs == None:
+            refs = shared[generation] = {}
+        ref = refs.get(idnum)
+        if ref == None:
+            ref = refs[idnum] = IndirectObject(idnum, generation, pdf)
+        return ref
+    _shared = staticmethod(_shared)
+
+
+##
+# A real number, stored as a Python float.  It is written out in the shortest
+# form that reads back as the same number where Python provides one (2.7 and
+# later), without an exponent, which PDF doesn't allow.
+class FloatObject(float, PdfObject):
+    __slots__ = ()
+
+    def __new__(cls, value="0", context=None):
+        return float.__new__(cls, value)
+
+    def __repr__(self):
+        if not _isFinite(self):
+            return float.__repr__(self)
+        return _formatReal(self)
+
+    def writeToStream(self, stream, encryption_key, stats=None):
+        _checkFinite(self)
+        stream.write(_formatReal(self))
+
+
+##
+# A real number stored as a decimal.Decimal, which keeps all the digits of the
+# number as it was written, at the cost of much slower arithmetic.  Real
+# numbers are only read as DecimalObjects after a call to {@link #setRealType
+# setRealType}.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class DecimalObject(decimal.Decimal, PdfObject):
+    __slots__ = ()
 
-class FloatObject(decimal.Decimal, PdfObject):
     def __new__(cls, value="0", context=None):
         return decimal.Decimal.__new__(cls, str(value), context)
+
     def __repr__(self):
+        if not _isFinite(self):
+            return str(self)
         if self == self.to_integral():
             return str(self.quantize(decimal.Decimal(1)))
-        else:
-            # XXX: this adds useless extraneous zeros.
-            return "%.5f" % self
-    def writeToStream(self, stream, encryption_key):
+        # str() would use an exponent for small numbers.
+        sign, digits, exp = self.as_tuple()
+        digits = "".join(map(str, digits)).rjust(1 - exp, "0")
+        return "-" * sign + digits[:exp] + "." + digits[exp:]
+
+    def writeToStream(self, stream, encryption_key, stats=None):
+        _checkFinite(self)
         stream.write(repr(self))
 
 
+def _isFinite(value):
+    try:
+        value = float(value)
+    except ValueError:
+        # a signaling NaN decimal
+        return False
+    return value - value == 0
+
+# PDF has no infinities or NaNs; writing one would raise an obscure error, or
+# produce a file that can't be read.
+def _checkFinite(value):
+    if not _isFinite(value):
+        raise utils.PdfWriteError("cannot write the real number %s: PDF "
+                "real numbers must be finite" % value)
+
+
+_shortFloatRepr = getattr(sys, "float_repr_style", None) == "short"
+
+def _formatReal(value):
+    if value == int(value):
+        return "%d" % value
+    if _shortFloatRepr:
+        retval = repr(float(value))
+        if "e" not in retval:
+            return retval
+    # older Pythons' repr gives 17 significant digits, and exponents are
+    # not allowed; PDF consumers don't use more than 10 decimals anyway.
+    retval = ("%.10f" % value).rstrip("0")
+    if retval[-1] == ".":
+        # a number smaller than 1e-10
+        return "0"
+    return retval
+
+
+_realType = FloatObject
+
+##
+# Selects the type of the real numbers read from PDF files and content
+# streams.  This applies to all the documents read afterwards.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param realType {@link #FloatObject FloatObject}, the default, or {@link
+# #DecimalObject DecimalObject} to keep the exact digits of every number.
+def setRealType(realType):
+    global _realType
+    _realType = realType
+
+
 class NumberObject(int, PdfObject):
+    __slots__ = ()
+
     def __init__(self, value):
         int.__init__(value)
 
-    def writeToStream(self, stream, encryption_key):
+    def writeToStream(self, stream, encryption_key, stats=None):
         stream.write(repr(self))
 
     def readFromStream(stream):
@@ -231,7 +360,7 @@ class NumberObject(int, PdfObject):
                 break
             name += tok
         if name.find(".") != -1:
-            return FloatObject(name)
+            return _realType(name)
         else:
             return NumberObject(name)
     readFromStream = staticmethod(readFromStream)
@@ -249,10 +378,9 @@ def createStringObject(string):
             retval.autodetect_utf16 = True
             return retval
         else:
-            # This is probably a big performance hit here, but we need to
-            # convert string objects into the text/unicode-aware version if
-            # possible... and the only way to check if that's possible is
-            # to try.  Some strings are strings, some are just byte arrays.
+            # Some strings are text, some are just byte arrays, and the only
+            # way to tell is to try to decode them.  The codec is table
+            # driven, so this is cheap.
             try:
                 retval = TextStringObject(decode_pdfdocencoding(string))
                 retval.autodetect_pdfdocencoding = True
@@ -263,7 +391,7 @@ def createStringObject(string):
         raise TypeError("createStringObject should have str or unicode arg")
 
 
-def readHexStringFromStream(stream):
+def readHexStringFromStream(stream, decode=True):
     stream.read(1)
     txt = ""
     x = ""
@@ -279,10 +407,12 @@ def readHexStringFromStream(stream):
         x += "0"
     if len(x) == 2:
         txt += chr(int(x, base=16))
+    if not decode:
+        return ByteStringObject(txt)
     return createStringObject(txt)
 
 
-def readStringFromStream(stream):
+def readStringFromStream(stream, decode=True):
     tok = stream.read(1)
     parens = 1
     txt = ""
@@ -338,6 +468,8 @@ def readStringFromStream(stream):
             else:
                 raise utils.PdfReadError("Unexpected escaped string")
         txt += tok
+    if not decode:
+        return ByteStringObject(txt)
     return createStringObject(txt)
 
 
@@ -346,30 +478,68 @@ def readStringFromStream(stream):
 # This occurs quite often, as the PDF spec doesn't provide an alternate way to
 # represent strings -- for example, the encryption data stored in files (like
 # /O) is clearly not text, but is still stored in a "String" object.
+# <p>
+# Strings read from content streams are ByteStringObjects too, since most of
+# them are only ever decoded through their font; see {@link #readObject
+# readObject}.  {@link #createStringObject createStringObject} turns one into
+# a TextStringObject when it is PDFDocEncoding or UTF-16 text.
 class ByteStringObject(str, PdfObject):
+    __slots__ = ()
 
     ##
     # For compatibility with TextStringObject.original_bytes.  This method
     # returns self.
     original_bytes = property(lambda self: self)
 
-    def writeToStream(self, stream, encryption_key):
+    def writeToStream(self, stream, encryption_key, stats=None):
         bytearr = self
         if encryption_key:
-            bytearr = RC4_encrypt(encryption_key, bytearr)
+            bytearr = _encryptRC4(encryption_key, bytearr, stats)
+        else:
+            # a literal string is shorter than a hexadecimal one unless a
+            # third of the bytes need escaping, as binary data does.
+            escapes = len(_literalEscapes.findall(bytearr))
+            if escapes * 3 <= len(bytearr):
+                stream.write("(")
+                stream.write(_literalEscapes.sub(_escapeLiteral, bytearr))
+                stream.write(")")
+                return
         stream.write("<")
         stream.write(bytearr.encode("hex"))
         stream.write(">")
 
 
+_literalEscapes = re.compile(r"[^\x20-\x7e]|[()\\]")
+
+def _escapeLiteral(match):
+    return "\\%03o" % ord(match.group())
+
+
 ##
 # Represents a string object that has been decoded into a real unicode string.
 # If read from a PDF document, this string appeared to match the
 # PDFDocEncoding, or contained a UTF-16BE BOM mark to cause UTF-16 decoding to
 # occur.
 class TextStringObject(unicode, PdfObject):
-    autodetect_pdfdocencoding = False
-    autodetect_utf16 = False
+    # the encoding the string was decoded from, "pdfdocencoding" or "utf16",
+    # when it was autodetected.
+    __slots__ = ("_autodetect",)
+
+    def _getAutodetect(self, encoding):
+        return getattr(self, "_autodetect", None) == encoding
+
+    def _setAutodetect(self, encoding, value):
+        if value:
+            self._autodetect = encoding
+        elif self._getAutodetect(encoding):
+            del self._autodetect
+
+    autodetect_pdfdocencoding = property(
+            lambda self: self._getAutodetect("pdfdocencoding"),
+            lambda self, value: self._setAutodetect("pdfdocencoding", value))
+    autodetect_utf16 = property(
+            lambda self: self._getAutodetect("utf16"),
+            lambda self, value: self._setAutodetect("utf16", value))
 
     ##
     # It is occasionally possible that a text string object gets created where
@@ -391,7 +561,7 @@ class TextStringObject(unicode, PdfObject):
         else:
             raise Exception("no information about original bytes")
 
-    def writeToStream(self, stream, encryption_key):
+    def writeToStream(self, stream, encryption_key, stats=None):
         # Try to write the string out as a PDFDocEncoding encoded string.  It's
         # nicer to look at in the PDF file.  Sadly, we take a performance hit
         # here for trying...
@@ -400,7 +570,7 @@ class TextStringObject(unicode, PdfObject):
         except UnicodeEncodeError:
             bytearr = codecs.BOM_UTF16_BE + self.encode("utf-16be")
         if encryption_key:
-            bytearr = RC4_encrypt(encryption_key, bytearr)
+            bytearr = _encryptRC4(encryption_key, bytearr, stats)
             obj = ByteStringObject(bytearr)
             obj.writeToStream(stream, None)
         else:
@@ -414,12 +584,24 @@ class TextStringObject(unicode, PdfObject):
 
 
 class NameObject(str, PdfObject):
+    __slots__ = ()
     delimiterCharacters = "(", ")", "<", ">", "[", "]", "{", "}", "/", "%"
 
-    def __init__(self, data):
-        str.__init__(data)
-
-    def writeToStream(self, stream, encryption_key):
+    # Names are interned: a document uses the same few names (/Type, /Font,
+    # /Length...) over and over, and they are all the same object.
+    def __new__(cls, data):
+        if cls is not NameObject:
+            return str.__new__(cls, data)
+        name = _names.get(data)
+        if name == None:
+            name = str.__new__(cls, data)
+            # don't let a document with a great many distinct names (or a
+            # malicious one) grow the table without bounds.
+            if len(_names) < _maxNames:
+                _names[name] = name
+        return name
+
+    def writeToStream(self, stream, encryption_key, stats=None):
         stream.write(self)
 
     def readFromStream(stream):
@@ -436,7 +618,16 @@ class NameObject(str, PdfObject):
     readFromStream = staticmethod(readFromStream)
 
 
+_names = {}
+_maxNames = 10000
+
+
 class DictionaryObject(dict, PdfObject):
+    # True if the objects the values of this dictionary resolve to are
+    # remembered in _resolved, by key.  It is set when the dictionary is read
+    # from a PdfFileReader with a resolutionCache.
+    _memoize = False
+    _resolved = None
 
     def __init__(self, *args, **kwargs):
         if len(args) == 0:
@@ -467,8 +658,30 @@ class DictionaryObject(dict, PdfObject):
             raise ValueError("key must be PdfObject")
         if not isinstance(value, PdfObject):
             raise ValueError("value must be PdfObject")
+        if self._resolved:
+            self._resolved.pop(key, None)
         return dict.__setitem__(self, key, value)
 
+    def __delitem__(self, key):
+        if self._resolved:
+            self._resolved.pop(key, None)
+        return dict.__delitem__(self, key)
+
+    def pop(self, *args):
+        if self._resolved:
+            self._resolved.pop(args[0], None)
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        if self._resolved:
+            self._resolved.clear()
+        return dict.popitem(self)
+
+    def clear(self):
+        if self._resolved:
+            self._resolved.clear()
+        return dict.clear(self)
+
     def setdefault(self, key, value=None):
         if not isinstance(key, PdfObject):
             raise ValueError("key must be PdfObject")
@@ -477,7 +690,20 @@ class DictionaryObject(dict, PdfObject):
         return dict.setdefault(self, key, value)
 
     def __getitem__(self, key):
-        return dict.__getitem__(self, key).getObject()
+        if not self._memoize:
+            return dict.__getitem__(self, key).getObject()
+        resolved = self._resolved
+        if resolved != None and resolved.has_key(key):
+            return resolved[key]
+        value = dict.__getitem__(self, key)
+        retval = value.getObject()
+        # if value is an indirect reference, remember what it resolves to.
+        # raw_get still returns the reference.
+        if retval is not value:
+            if resolved == None:
+                resolved = self._resolved = {}
+            resolved[key] = retval
+        return retval
 
     ##
     # Retrieves XMP (Extensible Metadata Platform) data relevant to the
@@ -505,12 +731,12 @@ class DictionaryObject(dict, PdfObject):
     # Stability: Added in v1.12, will exist for all future v1.x releases.
     xmpMetadata = property(lambda self: self.getXmpMetadata(), None, None)
 
-    def writeToStream(self, stream, encryption_key):
+    def writeToStream(self, stream, encryption_key, stats=None):
         stream.write("<<\n")
         for key, value in self.items():
-            key.writeToStream(stream, encryption_key)
+            key.writeToStream(stream, encryption_key, stats)
             stream.write(" ")
-            value.writeToStream(stream, encryption_key)
+            value.writeToStream(stream, encryption_key, stats)
             stream.write("\n")
         stream.write(">>")
 
@@ -574,27 +800,66 @@ class DictionaryObject(dict, PdfObject):
         else:
             stream.seek(pos, 0)
         if data.has_key("__streamdata__"):
-            return StreamObject.initializeFromDictionary(data)
+            retval = StreamObject.initializeFromDictionary(data)
         else:
             retval = DictionaryObject()
             retval.update(data)
-            return retval
+        if getattr(pdf, "resolutionCache", False):
+            retval._memoize = True
+        return retval
     readFromStream = staticmethod(readFromStream)
 
 
 class StreamObject(DictionaryObject):
+    _decryptor = None
+    # the PdfStats of the reader the stream was read from, if it collects
+    # statistics.
+    _stats = None
+
     def __init__(self):
         self._data = None
         self.decodedSelf = None
 
-    def writeToStream(self, stream, encryption_key):
+    # The raw stream data.  If the stream was read from an encrypted file, it
+    # is only decrypted the first time it is accessed, so that streams which
+    # are never read (images, fonts...) never pay for the decryption.
+    def _getRawData(self):
+        if self._decryptor != None:
+            self._rawData = "".join(self._decryptor(self._rawData))
+            self._decryptor = None
+        return self._rawData
+
+    def _setRawData(self, value):
+        self._rawData = value
+        self._decryptor = None
+
+    _data = property(_getRawData, _setRawData)
+
+    ##
+    # Marks the current raw stream data as encrypted.  Decryption is deferred
+    # until the data is first accessed.
+    # @param decryptor A function which takes the encrypted data, and returns
+    # an iterable of decrypted chunks.
+    def setDecryptor(self, decryptor):
+        self._decryptor = decryptor
+
+    ##
+    # Returns an iterable over the raw stream data.  If the data is still
+    # encrypted, it is decrypted chunk by chunk as the iterable is consumed,
+    # and the decrypted data is not kept.
+    def _iterRawData(self):
+        if self._decryptor != None:
+            return self._decryptor(self._rawData)
+        return (self._data,)
+
+    def writeToStream(self, stream, encryption_key, stats=None):
         self[NameObject("/Length")] = NumberObject(len(self._data))
-        DictionaryObject.writeToStream(self, stream, encryption_key)
+        DictionaryObject.writeToStream(self, stream, encryption_key, stats)
         del self["/Length"]
         stream.write("\nstream\n")
         data = self._data
         if encryption_key:
-            data = RC4_encrypt(encryption_key, data)
+            data = _encryptRC4(encryption_key, data, stats)
         stream.write(data)
         stream.write("\nendstream")
 
@@ -666,8 +931,8 @@ class RectangleObject(ArrayObject):
         ArrayObject.__init__(self, [self.ensureIsNumber(x) for x in arr])
 
     def ensureIsNumber(self, value):
-        if not isinstance(value, (NumberObject, FloatObject)):
-            value = FloatObject(value)
+        if not isinstance(value, (NumberObject, FloatObject, DecimalObject)):
+            value = _realType(value)
         return value
 
     def __repr__(self):
@@ -734,24 +999,10 @@ class RectangleObject(ArrayObject):
 
 
 def encode_pdfdocencoding(unicode_string):
-    retval = ''
-    for c in unicode_string:
-        try:
-            retval += chr(_pdfDocEncoding_rev[c])
-        except KeyError:
-            raise UnicodeEncodeError("pdfdocencoding", c, -1, -1,
-                    "does not exist in translation table")
-    return retval
+    return codecs.charmap_encode(unicode_string, "strict", _pdfDocEncodingMap)[0]
 
 def decode_pdfdocencoding(byte_array):
-    retval = u''
-    for b in byte_array:
-        c = _pdfDocEncoding[ord(b)]
-        if c == u'\u0000':
-            raise UnicodeDecodeError("pdfdocencoding", b, -1, -1,
-                    "does not exist in translation table")
-        retval += c
-    return retval
+    return codecs.charmap_decode(byte_array, "strict", _pdfDocDecodingTable)[0]
 
 _pdfDocEncoding = (
   u'\u0000', u'\u0000', u'\u0000', u'\u0000', u'\u0000', u'\u0000', u'\u0000', u'\u0000',
@@ -798,3 +1049,35 @@ for i in xrange(256):
     assert char not in _pdfDocEncoding_rev
     _pdfDocEncoding_rev[char] = i
 
+# The tables of the "pdfdocencoding" codec.  u"\ufffe" marks the bytes that
+# charmap_decode can't decode.
+_pdfDocDecodingTable = u"".join([c.replace(u"\u0000", u"\ufffe") for c in _pdfDocEncoding])
+_pdfDocEncodingMap = {}
+for char, i in _pdfDocEncoding_rev.items():
+    _pdfDocEncodingMap[ord(char)] = i
+
+
+class _PDFDocEncodingCodec(codecs.Codec):
+    def encode(self, input, errors="strict"):
+        return codecs.charmap_encode(input, errors, _pdfDocEncodingMap)
+
+    def decode(self, input, errors="strict"):
+        return codecs.charmap_decode(input, errors, _pdfDocDecodingTable)
+
+class _PDFDocEncodingStreamWriter(_PDFDocEncodingCodec, codecs.StreamWriter):
+    pass
+
+class _PDFDocEncodingStreamReader(_PDFDocEncodingCodec, codecs.StreamReader):
+    pass
+
+# Makes PDFDocEncoding available as the "pdfdocencoding" codec, for example to
+# u"text".encode("pdfdocencoding").
+def _searchCodec(name):
+    if name != "pdfdocencoding":
+        return None
+    codec = _PDFDocEncodingCodec()
+    return (codec.encode, codec.decode, _PDFDocEncodingStreamReader,
+            _PDFDocEncodingStreamWriter)
+
+codecs.register(_searchCodec)
+
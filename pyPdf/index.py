@@ -0,0 +1,206 @@
+"""
+A full-text inverted index over a collection of PDF files, mapping each term
+to the pages it appears on, so that page-level lookups don't need to reopen
+the PDF files.
+"""
+
+import os
+import re
+import zlib
+import marshal
+import warnings
+from pdf import PdfFileReader
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+_FORMAT_VERSION = 1
+
+_wordRe = re.compile(r"\w+", re.UNICODE)
+
+##
+# Splits text into the terms stored in the index: runs of alphanumeric
+# characters, lower-cased.
+# @param text A unicode string.
+# @return A list of unicode strings.
+def tokenize(text):
+    return _wordRe.findall(text.lower())
+
+
+# Extracts the terms of every page of a PDF file.  This runs in the worker
+# processes when extraction is parallel, so it has to be a module level
+# function.  Returns (filename, size, mtime, pages, error), where pages is a
+# list of (pageNumber, terms) pairs.
+def _extractTerms(args):
+    filename, size, mtime = args
+    pages = []
+    try:
+        stream = file(filename, "rb")
+        try:
+            reader = PdfFileReader(stream)
+            if reader.isEncrypted and not reader.decrypt(""):
+                return filename, size, mtime, pages, "file is encrypted"
+            for pageNumber in range(reader.getNumPages()):
+                text = reader.getPage(pageNumber).extractText()
+                terms = dict.fromkeys(tokenize(text)).keys()
+                if terms:
+                    pages.append((pageNumber, terms))
+        finally:
+            stream.close()
+    except Exception, e:
+        return filename, size, mtime, [], str(e) or e.__class__.__name__
+    return filename, size, mtime, pages, None
+
+
+##
+# An inverted index of the text of a collection of PDF files.
+# <p>
+# The index is kept in a single zlib compressed file.  For every document it
+# records the file's size and modification time, so that {@link #TextIndex.update
+# update} only extracts text from files that were added or changed since they
+# were last indexed.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param path The filename of the index.  It is read if it exists, and is
+# written by {@link #TextIndex.save save}.
+class TextIndex(object):
+    def __init__(self, path):
+        self.path = path
+        # filename -> (size, mtime, docId)
+        self.documents = {}
+        # term -> list of (docId, pageNumber)
+        self.postings = {}
+        self._nextId = 0
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        stream = file(self.path, "rb")
+        try:
+            data = marshal.loads(zlib.decompress(stream.read()))
+        finally:
+            stream.close()
+        version, self._nextId, self.documents, self.postings = data
+        if version != _FORMAT_VERSION:
+            raise ValueError, "unsupported index version %r" % version
+
+    ##
+    # Writes the index to its file.  The index is written to a temporary file
+    # first, so a failure leaves the previous index intact.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    def save(self):
+        data = (_FORMAT_VERSION, self._nextId, self.documents, self.postings)
+        tmp = self.path + ".tmp"
+        stream = file(tmp, "wb")
+        try:
+            stream.write(zlib.compress(marshal.dumps(data), 9))
+        finally:
+            stream.close()
+        if os.path.exists(self.path):
+            # os.rename won't replace an existing file on Windows
+            os.remove(self.path)
+        os.rename(tmp, self.path)
+
+    ##
+    # Brings the index up to date with a collection of PDF files.  Files that
+    # are new, or whose size or modification time has changed, are
+    # (re-)indexed; the others are left alone.  Indexed files that are not in
+    # filenames any more are dropped from the index.
+    # <p>
+    # Files that can't be read, or are encrypted with a user password, are
+    # recorded with no text and a warning is issued; they are retried once
+    # they change.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @param filenames The complete list of PDF files to index.
+    # @param processes The number of processes extracting text.  Defaults to
+    # the number of CPUs.  Text is extracted in this process if it is 1, or
+    # if the multiprocessing module is not available.
+    # @return A list of the filenames that were (re-)indexed.
+    def update(self, filenames, processes=None):
+        stale = {}
+        for filename in self.documents.keys():
+            stale[filename] = True
+        work = []
+        for filename in filenames:
+            st = os.stat(filename)
+            stale.pop(filename, None)
+            entry = self.documents.get(filename)
+            if entry != None and entry[0] == st.st_size and entry[1] == st.st_mtime:
+                continue
+            if entry != None:
+                stale[filename] = True
+            work.append((filename, st.st_size, st.st_mtime))
+        self._remove(stale.keys())
+        updated = []
+        for filename, size, mtime, pages, error in self._extract(work, processes):
+            if error != None:
+                warnings.warn("could not index %s: %s" % (filename, error))
+            docId = self._nextId
+            self._nextId += 1
+            self.documents[filename] = (size, mtime, docId)
+            for pageNumber, terms in pages:
+                for term in terms:
+                    self.postings.setdefault(term, []).append((docId, pageNumber))
+            updated.append(filename)
+        return updated
+
+    def _extract(self, work, processes):
+        if processes == None and multiprocessing != None:
+            processes = multiprocessing.cpu_count()
+        if processes == 1 or multiprocessing == None or len(work) < 2:
+            return map(_extractTerms, work)
+        pool = multiprocessing.Pool(processes)
+        try:
+            return list(pool.imap_unordered(_extractTerms, work))
+        finally:
+            pool.close()
+            pool.join()
+
+    # Drops documents and their postings, in a single pass over the postings.
+    def _remove(self, filenames):
+        if not filenames:
+            return
+        docIds = {}
+        for filename in filenames:
+            docIds[self.documents.pop(filename)[2]] = True
+        for term, postings in self.postings.items():
+            postings = [p for p in postings if not docIds.has_key(p[0])]
+            if postings:
+                self.postings[term] = postings
+            else:
+                del self.postings[term]
+
+    ##
+    # Finds the pages that contain all the terms of a query.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @param query A string; it is split into terms by {@link #tokenize
+    # tokenize}.
+    # @return A sorted list of (filename, pageNumber) pairs.  Page numbers
+    # start at 0, as for {@link #PdfFileReader.getPage getPage}.
+    def search(self, query):
+        if isinstance(query, str):
+            query = unicode(query)
+        pages = None
+        for term in tokenize(query):
+            found = dict.fromkeys(self.postings.get(term, ()))
+            if pages == None:
+                pages = found
+            else:
+                for p in pages.keys():
+                    if not found.has_key(p):
+                        del pages[p]
+            if not pages:
+                return []
+        if not pages:
+            return []
+        filenames = {}
+        for filename, (size, mtime, docId) in self.documents.items():
+            filenames[docId] = filename
+        retval = [(filenames[docId], pageNumber) for docId, pageNumber in pages.keys()]
+        retval.sort()
+        return retval
@@ -0,0 +1,380 @@
+"""
+Writing of linearized ("Fast Web View") PDF files, as described in appendix F
+of the PDF Reference.  A linearized file starts with everything needed to
+display its first page, so a viewer reading it over a network can show the
+first page after fetching the head of the file.
+"""
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+import time
+from generic import *
+from utils import PyPdfError
+
+##
+# Writes the objects of a PdfFileWriter out as a linearized PDF file.  This is
+# used by {@link #PdfFileWriter.write PdfFileWriter.write}, once the indirect
+# references to other documents have been resolved.
+# <p>
+# The file is laid out as the PDF Reference prescribes: the linearization
+# parameter dictionary, the first page cross-reference section, the catalog,
+# the primary hint stream and the first page's objects come first, followed by
+# the objects of the other pages, page by page, the objects shared by several
+# pages, any other objects, and the main cross-reference section.
+# <p>
+# The page tree must be flat, as PdfFileWriter builds it: the pages of a
+# linearized file are found through the hint tables rather than the page
+# tree, and its page objects must not inherit attributes from their parents.
+# A PyPdfError is raised for a nested page tree.
+def writeLinearized(writer, stream):
+    objects = writer._objects
+    pageRefs = list(writer.getObject(writer._pages)["/Kids"])
+    if not pageRefs:
+        raise PyPdfError("a document without pages can't be linearized")
+    for ref in pageRefs:
+        if ref.getObject().get("/Type") != "/Page":
+            raise PyPdfError("a nested page tree can't be linearized")
+    pageNums = [ref.idnum for ref in pageRefs]
+    isPage = {}
+    for idnum in pageNums:
+        isPage[idnum] = True
+
+    docLevel = [writer._root.idnum]
+    encryptNum = None
+    if hasattr(writer, "_encrypt"):
+        encryptNum = writer._encrypt.idnum
+        docLevel.append(encryptNum)
+    placed = {}
+    for idnum in docLevel:
+        placed[idnum] = True
+
+    # the objects used by every page, in the order they are reached from it.
+    pageObjects = []
+    users = {}
+    for idnum in pageNums:
+        used = _reachable(writer, idnum, isPage, placed)
+        pageObjects.append(used)
+        for i in used:
+            users[i] = users.get(i, 0) + 1
+
+    firstPage = pageObjects[0]
+    for i in firstPage:
+        placed[i] = True
+    groups = []
+    shared = []
+    for used in pageObjects[1:]:
+        group = []
+        for i in used:
+            if placed.has_key(i):
+                continue
+            if users[i] == 1:
+                placed[i] = True
+                group.append(i)
+        groups.append(group)
+    for used in pageObjects[1:]:
+        for i in used:
+            if not placed.has_key(i):
+                placed[i] = True
+                shared.append(i)
+    other = [i for i in range(1, len(objects) + 1) if not placed.has_key(i)]
+
+    # Objects of the main cross-reference section are numbered from 1, in
+    # file order; the first page section's objects are numbered after them.
+    main = []
+    for group in groups:
+        main.extend(group)
+    main.extend(shared)
+    main.extend(other)
+    newNum = {}
+    for i in main:
+        newNum[i] = len(newNum) + 1
+    firstSectionStart = len(main) + 1
+    linNum = firstSectionStart
+    for i in docLevel:
+        newNum[i] = len(newNum) + 2
+    hintNum = len(newNum) + 2
+    for i in firstPage:
+        newNum[i] = len(newNum) + 3
+    size = len(newNum) + 3
+
+    # Renumber all the references to this writer's objects while writing.
+    refs = [(ref, ref.idnum) for ref in _collectReferences(writer)]
+    for ref, idnum in refs:
+        ref.idnum = newNum[idnum]
+    try:
+        data = {}
+        stats = writer.stats
+        for i in newNum.keys():
+            num = newNum[i]
+            key = None
+            if encryptNum != None and i != encryptNum:
+                key = writer._getObjectKey(num, 0)
+            if stats != None:
+                start = time.time()
+            data[i] = _serialize(objects[i - 1], num, key, stats)
+            if stats != None:
+                stats.add("writeObject", len(data[i]), time.time() - start)
+
+        trailer = DictionaryObject()
+        trailer[NameObject("/Size")] = NumberObject(size)
+        trailer[NameObject("/Root")] = writer._root
+        trailer[NameObject("/Info")] = writer._info
+        if hasattr(writer, "_ID"):
+            trailer[NameObject("/ID")] = writer._ID
+        if encryptNum != None:
+            trailer[NameObject("/Encrypt")] = writer._encrypt
+        trailerData = StringIO()
+        trailer.writeToStream(trailerData, None)
+        trailerData = trailerData.getvalue()[:-2]
+        firstPageNum = newNum[pageNums[0]]
+    finally:
+        for ref, idnum in refs:
+            ref.idnum = idnum
+
+    header = writer._header + "\n"
+    linTemplate = ("%d 0 obj\n<< /Linearized 1 /L %%10d /H [ %%10d %%10d ] "
+            "/O %d /E %%10d /N %d /T %%10d >>\nendobj\n") % (
+            linNum, firstPageNum, len(pageNums))
+    linLength = len(linTemplate % (0, 0, 0, 0, 0))
+    firstSectionCount = size - firstSectionStart
+    def firstXref(offsets, prev):
+        retval = ["xref\n%d %d\n" % (firstSectionStart, firstSectionCount)]
+        for offset in offsets:
+            retval.append("%010d %05d n \n" % (offset, 0))
+        retval.append("trailer\n%s/Prev %10d\n>>\nstartxref\n0\n%%%%EOF\n" % (
+            trailerData, prev))
+        return "".join(retval)
+    firstXrefLength = len(firstXref([0] * firstSectionCount, 0))
+
+    # Offsets of the objects, as if the hint stream was absent; this is how
+    # the hint tables give them.
+    offsets = {}
+    pos = len(header) + linLength + firstXrefLength
+    for i in docLevel:
+        offsets[i] = pos
+        pos += len(data[i])
+    hintPosition = pos
+    for i in firstPage + main:
+        offsets[i] = pos
+        pos += len(data[i])
+
+    hintData, sharedTableOffset = _hintTables(pageObjects, firstPage, groups,
+            shared, offsets, data, newNum)
+    hint = DecodedStreamObject()
+    hint.setData(hintData)
+    hint = hint.flateEncode()
+    hint[NameObject("/S")] = NumberObject(sharedTableOffset)
+    key = None
+    if encryptNum != None:
+        key = writer._getObjectKey(hintNum, 0)
+    hint = _serialize(hint, hintNum, key, writer.stats)
+    hintLength = len(hint)
+
+    for i in firstPage + main:
+        offsets[i] += hintLength
+    endOfFirstPage = hintPosition + hintLength
+    for i in firstPage:
+        endOfFirstPage += len(data[i])
+    mainXrefPosition = endOfFirstPage
+    for i in main:
+        mainXrefPosition += len(data[i])
+    mainXrefHead = "xref\n0 %d" % firstSectionStart
+    mainXref = [mainXrefHead, "\n0000000000 65535 f \n"]
+    for i in main:
+        mainXref.append("%010d %05d n \n" % (offsets[i], 0))
+    mainXref.append("trailer\n<< /Size %d >>\nstartxref\n%d\n%%%%EOF\n" % (
+        firstSectionStart, len(header) + linLength))
+    mainXref = "".join(mainXref)
+    fileLength = mainXrefPosition + len(mainXref)
+
+    stream.write(header)
+    stream.write(linTemplate % (fileLength, hintPosition, hintLength,
+        endOfFirstPage, mainXrefPosition + len(mainXrefHead)))
+    firstOffsets = [len(header)]
+    for i in docLevel:
+        firstOffsets.append(offsets[i])
+    firstOffsets.append(hintPosition)
+    for i in firstPage:
+        firstOffsets.append(offsets[i])
+    stream.write(firstXref(firstOffsets, mainXrefPosition))
+    for i in docLevel:
+        stream.write(data[i])
+    stream.write(hint)
+    for i in firstPage + main:
+        stream.write(data[i])
+    stream.write(mainXref)
+
+
+def _serialize(obj, num, key, stats):
+    out = StringIO()
+    out.write("%d 0 obj\n" % num)
+    obj.writeToStream(out, key, stats)
+    out.write("\nendobj\n")
+    return out.getvalue()
+
+
+# Finds the objects used by a page: the page object, then everything reached
+# from it, except the page tree (through /Parent) and the other pages.
+def _reachable(writer, idnum, isPage, skip):
+    retval = [idnum]
+    seen = {idnum: True}
+    stack = [writer._objects[idnum - 1]]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is not writer or seen.has_key(obj.idnum) or \
+                    isPage.has_key(obj.idnum) or skip.has_key(obj.idnum):
+                continue
+            seen[obj.idnum] = True
+            retval.append(obj.idnum)
+            obj = writer._objects[obj.idnum - 1]
+        if isinstance(obj, DictionaryObject):
+            for key, value in obj.items():
+                if key != "/Parent":
+                    stack.append(value)
+        elif isinstance(obj, ArrayObject):
+            stack.extend(obj)
+    return retval
+
+
+# Returns every IndirectObject instance referring to one of the writer's
+# objects.
+def _collectReferences(writer):
+    refs = {}
+    stack = list(writer._objects)
+    stack.extend([writer._root, writer._info, writer._pages])
+    if hasattr(writer, "_encrypt"):
+        stack.append(writer._encrypt)
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.pdf is writer:
+                refs[id(obj)] = obj
+        elif isinstance(obj, DictionaryObject):
+            stack.extend(obj.values())
+        elif isinstance(obj, ArrayObject):
+            stack.extend(obj)
+    return refs.values()
+
+
+# Builds the page offset and shared object hint tables.  Returns the hint
+# stream's data, and the offset of the shared object hint table in it.
+def _hintTables(pageObjects, firstPage, groups, shared, offsets, data, newNum):
+    sharedIds = {}
+    for i in firstPage + shared:
+        sharedIds[i] = len(sharedIds)
+    pages = [firstPage] + groups
+    counts = [len(group) for group in pages]
+    lengths = []
+    for group in pages:
+        length = 0
+        for i in group:
+            length += len(data[i])
+        lengths.append(length)
+    sharedRefs = [[]]
+    for used in pageObjects[1:]:
+        sharedRefs.append([sharedIds[i] for i in used if sharedIds.has_key(i)])
+
+    # page offset hint table, see table F.3 and F.4.
+    leastCount = min(counts)
+    countBits = _bitLength(max(counts) - leastCount)
+    leastLength = min(lengths)
+    lengthBits = _bitLength(max(lengths) - leastLength)
+    sharedCountBits = _bitLength(max([len(r) for r in sharedRefs]))
+    sharedIdBits = _bitLength(len(sharedIds) - 1)
+    w = _BitWriter()
+    w.write(leastCount, 32)
+    w.write(offsets[firstPage[0]], 32)
+    w.write(countBits, 16)
+    w.write(leastLength, 32)
+    w.write(lengthBits, 16)
+    # content stream offsets and lengths are not used by viewers; they are
+    # given as the whole page.
+    w.write(0, 32)
+    w.write(0, 16)
+    w.write(leastLength, 32)
+    w.write(lengthBits, 16)
+    w.write(sharedCountBits, 16)
+    w.write(sharedIdBits, 16)
+    w.write(0, 16)
+    w.write(1, 16)
+    for count in counts:
+        w.write(count - leastCount, countBits)
+    w.flush()
+    for length in lengths:
+        w.write(length - leastLength, lengthBits)
+    w.flush()
+    for refs in sharedRefs:
+        w.write(len(refs), sharedCountBits)
+    w.flush()
+    for refs in sharedRefs:
+        for ref in refs:
+            w.write(ref, sharedIdBits)
+    w.flush()
+    # numerators of the fractional positions take no bits, and the content
+    # stream offsets are all 0.
+    for length in lengths:
+        w.write(length - leastLength, lengthBits)
+    w.flush()
+    sharedTableOffset = len(w.getvalue())
+
+    # shared object hint table, see tables F.5 and F.6.  Every object is a
+    # group of its own.
+    groupLengths = [len(data[i]) for i in firstPage + shared]
+    leastGroupLength = min(groupLengths)
+    groupLengthBits = _bitLength(max(groupLengths) - leastGroupLength)
+    if shared:
+        w.write(newNum[shared[0]], 32)
+        w.write(offsets[shared[0]], 32)
+    else:
+        w.write(0, 32)
+        w.write(0, 32)
+    w.write(len(firstPage), 32)
+    w.write(len(firstPage) + len(shared), 32)
+    w.write(0, 16)
+    w.write(leastGroupLength, 32)
+    w.write(groupLengthBits, 16)
+    for length in groupLengths:
+        w.write(length - leastGroupLength, groupLengthBits)
+    w.flush()
+    for length in groupLengths:
+        # no MD5 signatures
+        w.write(0, 1)
+    w.flush()
+    return w.getvalue(), sharedTableOffset
+
+
+def _bitLength(n):
+    bits = 0
+    while n:
+        bits += 1
+        n >>= 1
+    return bits
+
+
+# Packs numbers into a string, most significant bit first.
+class _BitWriter(object):
+    def __init__(self):
+        self.bytes = []
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value, bits):
+        for shift in range(bits - 1, -1, -1):
+            self.value = (self.value << 1) | ((value >> shift) & 1)
+            self.bits += 1
+            if self.bits == 8:
+                self.bytes.append(chr(self.value))
+                self.value = 0
+                self.bits = 0
+
+    # pads the current byte with zero bits.
+    def flush(self):
+        if self.bits:
+            self.write(0, 8 - self.bits)
+
+    def getvalue(self):
+        return "".join(self.bytes)
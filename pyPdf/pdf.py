@@ -40,8 +40,12 @@ It may be a solid base for future PDF file work in Python.
 __author__ = "Mathieu Fenniak"
 __author_email__ = "biziqe@mathieu.fenniak.net"
 
+import bisect
+import codecs
 import math
+import re
 import struct
+import time
 from sys import version_info
 try:
     from cStringIO import StringIO
@@ -49,6 +53,9 @@ except ImportError:
     from StringIO import StringIO
 
 import filters
+import fonts
+from linearize import writeLinearized
+from stats import _StatsStream
 import utils
 import warnings
 from generic import *
@@ -65,8 +72,12 @@ else:
 ##
 # This class supports writing PDF files out, given pages produced by another
 # class (typically {@link #PdfFileReader PdfFileReader}).
+#
+# @param stats A {@link #PdfStats PdfStats} object recording the objects
+#              written, or None.  Added in v1.13.
 class PdfFileWriter(object):
-    def __init__(self):
+    def __init__(self, stats=None):
+        self.stats = stats
         self._header = "%PDF-1.3"
         self._objects = []  # array of indirect objects
 
@@ -186,6 +197,31 @@ class PdfFileWriter(object):
         self.insertPage(page, index)
         return page
 
+    ##
+    # Converts a page into a form XObject that is stored once in this PDF
+    # file, and can then be drawn on any number of pages with {@link
+    # #PageObject.mergeFormXObject PageObject.mergeFormXObject}.
+    # @param page The page to convert, an instance of {@link #PageObject
+    #             PageObject}.
+    # @return An indirect reference to the form XObject.
+    def addFormXObject(self, page):
+        return self._addObject(page.createFormXObject())
+
+    ##
+    # Stamps a page (for example, a watermark) on top of every page of this
+    # PDF file.  Unlike calling {@link #PageObject.mergePage mergePage} on
+    # every page, the stamp's content and resources are stored only once, as
+    # a form XObject; each page only grows by a reference to it and a short
+    # content stream drawing it.
+    # @param page The page to stamp, an instance of {@link #PageObject
+    #             PageObject}.
+    # @param ctm  A 6 elements tuple containing the operands of a
+    #             transformation matrix to apply to the stamp, or None.
+    def stampPages(self, page, ctm=None):
+        xobject = self.addFormXObject(page)
+        for i in range(self.getNumPages()):
+            self.getPage(i).mergeFormXObject(xobject, ctm)
+
     ##
     # Encrypt this PDF file with the PDF Standard encryption handler.
     # @param user_pwd The "user password", which allows for opening and reading
@@ -230,6 +266,7 @@ class PdfFileWriter(object):
         encrypt[NameObject("/P")] = NumberObject(P)
         self._encrypt = self._addObject(encrypt)
         self._encrypt_key = key
+        self._objectKeys = {}
 
     ##
     # Writes the collection of pages added to this object out as a PDF file.
@@ -237,9 +274,10 @@ class PdfFileWriter(object):
     # Stability: Added in v1.0, will exist for all v1.x releases.
     # @param stream An object to write the file to.  The object must support
     # the write method, and the tell method, similar to a file object.
-    def write(self, stream):
-        import struct
-
+    # @param linearize If true, the file is linearized ("Fast Web View"), so
+    # that its first page can be displayed as soon as the head of the file is
+    # read.  Added in v1.13.
+    def write(self, stream, linearize=False):
         externalReferenceMap = {}
 
         # PDF objects sometimes have circular references to their /Page objects
@@ -264,24 +302,29 @@ class PdfFileWriter(object):
         self._sweepIndirectReferences(externalReferenceMap, self._root)
         del self.stack
 
+        if linearize:
+            writeLinearized(self, stream)
+            return
+
         # Begin writing:
+        stats = self.stats
         object_positions = []
         stream.write(self._header + "\n")
         for i in range(len(self._objects)):
             idnum = (i + 1)
             obj = self._objects[i]
+            if stats != None:
+                start = time.time()
             object_positions.append(stream.tell())
             stream.write(str(idnum) + " 0 obj\n")
             key = None
             if hasattr(self, "_encrypt") and idnum != self._encrypt.idnum:
-                pack1 = struct.pack("<i", i + 1)[:3]
-                pack2 = struct.pack("<i", 0)[:2]
-                key = self._encrypt_key + pack1 + pack2
-                assert len(key) == (len(self._encrypt_key) + 5)
-                md5_hash = md5(key).digest()
-                key = md5_hash[:min(16, len(self._encrypt_key) + 5)]
-            obj.writeToStream(stream, key)
+                key = self._getObjectKey(idnum, 0)
+            obj.writeToStream(stream, key, stats)
             stream.write("\nendobj\n")
+            if stats != None:
+                stats.add("writeObject", stream.tell() - object_positions[-1],
+                        time.time() - start)
 
         # xref table
         xref_location = stream.tell()
@@ -308,6 +351,13 @@ class PdfFileWriter(object):
         # eof
         stream.write("\nstartxref\n%s\n%%%%EOF\n" % (xref_location))
 
+    def _getObjectKey(self, idnum, generation):
+        key = self._objectKeys.get((idnum, generation))
+        if key == None:
+            key = _objectKey(self._encrypt_key, idnum, generation)
+            self._objectKeys[(idnum, generation)] = key
+        return key
+
     def _sweepIndirectReferences(self, externMap, data):
         if isinstance(data, DictionaryObject):
             for key, value in data.items():
@@ -367,10 +417,38 @@ class PdfFileWriter(object):
 #
 # @param stream An object that supports the standard read and seek methods
 #               similar to a file object.
+# @param stats A {@link #PdfStats PdfStats} object recording the reads, the
+#              objects parsed, and the streams decoded and decrypted, or None.
+#              Added in v1.13.
+# @param resolutionCache If true, the dictionaries of the document remember
+#              the objects their indirect references resolve to, so that code
+#              looking up the same keys over and over (walking the page tree,
+#              merging resources) only resolves each reference once.  This
+#              costs a little memory for each dictionary whose references
+#              are looked up.  Dictionaries created by the caller don't
+#              remember anything.  Added in v1.13.
 class PdfFileReader(object):
-    def __init__(self, stream):
+    def __init__(self, stream, stats=None, resolutionCache=False):
         self.flattenedPages = None
+        self.resolutionCache = resolutionCache
+        self._firstPage = None
+        self._pageNumbers = None
+        self._nameTrees = {}
+        self._namedDestinations = None
+        self._outlines = None
+        self._outlineEntries = {}
         self.resolvedObjects = {}
+        # the IndirectObject instances, by generation and object number,
+        # shared by all the references to an object.
+        self._sharedReferences = {}
+        self._objectKeys = {}
+        self.stats = stats
+        if stats != None:
+            stream = _StatsStream(stream, stats)
+            # replace getObject for this reader only, so that readers without
+            # statistics don't pay for them.
+            self.getObject = self._getObjectWithStats
+            self._getObjectDepth = 0
         self.read(stream)
         self.stream = stream
         self._override_encryption = False
@@ -408,11 +486,9 @@ class PdfFileReader(object):
     # instance that can be used to access XMP metadata from the document.
     # Can also return None if no metadata was found on the document root.
     def getXmpMetadata(self):
-        try:
-            self._override_encryption = True
-            return self.trailer["/Root"].getXmpMetadata()
-        finally:
-            self._override_encryption = False
+        # the metadata stream is decrypted unless the /Encrypt dictionary
+        # says that it isn't encrypted; see _getStreamCryptMethod.
+        return self.trailer["/Root"].getXmpMetadata()
 
     ##
     # Read-only property that accesses the {@link #PdfFileReader.getXmpData
@@ -428,6 +504,8 @@ class PdfFileReader(object):
     # @return Returns an integer.
     def getNumPages(self):
         if self.flattenedPages == None:
+            if self._linearized != None and self._linearized.has_key("/N"):
+                return int(self._linearized["/N"])
             self._flatten()
         return len(self.flattenedPages)
 
@@ -447,9 +525,58 @@ class PdfFileReader(object):
         ## ensure that we're not trying to access an encrypted PDF
         #assert not self.trailer.has_key("/Encrypt")
         if self.flattenedPages == None:
+            if pageNumber == 0 and self._linearized != None:
+                page = self._getLinearizedFirstPage()
+                if page != None:
+                    return page
             self._flatten()
         return self.flattenedPages[pageNumber]
 
+    ##
+    # Retrieves the number of a page of this PDF file.  The numbers of all the
+    # pages are found the first time this is called, so that looking up the
+    # pages of many outline entries or destinations takes linear time.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @param page A {@link #PageObject PageObject} returned by {@link
+    #             #PdfFileReader.getPage getPage}, or an indirect reference to
+    #             a page object, as found in destinations.
+    # @return Returns the page number, counting from 0, or None if page is
+    #         not a page of this file.
+    def getPageNumber(self, page):
+        if isinstance(page, PageObject):
+            if page.pdf is not self:
+                return None
+            page = page.indirectRef
+        if not isinstance(page, IndirectObject) or page.pdf is not self:
+            return None
+        if self._pageNumbers == None:
+            if self.flattenedPages == None:
+                self._flatten()
+            numbers = {}
+            for i in xrange(len(self.flattenedPages)):
+                ref = self.flattenedPages[i].indirectRef
+                if ref != None:
+                    numbers.setdefault(ref.generation, {})[ref.idnum] = i
+            self._pageNumbers = numbers
+        return self._pageNumbers.get(page.generation, {}).get(page.idnum)
+
+    # Returns the first page of a linearized file, found through the
+    # linearization parameters, without reading the page tree.  Linearized
+    # files are not supposed to have page objects inheriting attributes; if
+    # this one does, None is returned so that the page tree is read instead.
+    def _getLinearizedFirstPage(self):
+        if self._firstPage == None:
+            if not self._linearized.has_key("/O"):
+                return None
+            ref = IndirectObject(self._linearized["/O"], 0, self)
+            page = ref.getObject()
+            if not page.has_key("/Resources") or not page.has_key("/MediaBox"):
+                return None
+            self._firstPage = PageObject(self, ref)
+            self._firstPage.update(page)
+        return self._firstPage
+
     ##
     # Read-only property that accesses the 
     # {@link #PdfFileReader.getNamedDestinations 
@@ -460,45 +587,86 @@ class PdfFileReader(object):
                                   self.getNamedDestinations(), None, None)
 
     ##
-    # Retrieves the named destinations present in the document.
+    # Retrieves the named destinations present in the document.  The name tree
+    # is only read the first time; use {@link
+    # #PdfFileReader.getNamedDestination getNamedDestination} to look up a few
+    # names without reading all of it.
     # <p>
     # Stability: Added in v1.10, will exist for all future v1.x releases.
     # @return Returns a dict which maps names to {@link #Destination
     # destinations}.
     def getNamedDestinations(self, tree=None, retval=None):
         if retval == None:
-            retval = {}
+            if self._namedDestinations == None:
+                self._namedDestinations = self._buildNamedDestinations(
+                        self._getDestinationsTree())
+            return dict(self._namedDestinations)
+        if tree != None:
+            retval.update(self._buildNamedDestinations(NameTree(tree)))
+        return retval
+
+    ##
+    # Retrieves a single named destination.  Only the nodes of the name tree
+    # leading to the name are read.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @param name The name of the destination, a string.
+    # @return Returns a {@link #Destination Destination}, or None if the name
+    # isn't defined.
+    def getNamedDestination(self, name):
+        tree = self._getDestinationsTree()
+        if tree == None:
+            return None
+        value = tree.get(name)
+        if value == None:
+            return None
+        if not isinstance(name, PdfObject):
+            name = createStringObject(name)
+        return self._buildNamedDestination(name, value)
+
+    ##
+    # Retrieves one of the name trees of the document's name dictionary.  The
+    # tree objects are kept, so that the nodes they read are only read once.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @param name The key of the tree in the name dictionary, for example
+    # "/Dests" or "/EmbeddedFiles".
+    # @return Returns a {@link #NameTree NameTree}, or None if the document
+    # doesn't have this tree.
+    def getNameTree(self, name):
+        if not self._nameTrees.has_key(name):
+            tree = None
             catalog = self.trailer["/Root"]
-            
-            # get the name tree
-            if catalog.has_key("/Dests"):
-                tree = catalog["/Dests"]
-            elif catalog.has_key("/Names"):
-                names = catalog['/Names']
-                if names.has_key("/Dests"):
-                    tree = names['/Dests']
-        
+            if catalog.has_key("/Names"):
+                names = catalog["/Names"]
+                if names.has_key(name):
+                    tree = NameTree(names[name])
+            self._nameTrees[name] = tree
+        return self._nameTrees[name]
+
+    def _getDestinationsTree(self):
+        catalog = self.trailer["/Root"]
+        if catalog.has_key("/Dests"):
+            if not self._nameTrees.has_key(None):
+                self._nameTrees[None] = NameTree(catalog["/Dests"])
+            return self._nameTrees[None]
+        return self.getNameTree("/Dests")
+
+    def _buildNamedDestinations(self, tree):
+        retval = {}
         if tree == None:
             return retval
-
-        if tree.has_key("/Kids"):
-            # recurse down the tree
-            for kid in tree["/Kids"]:
-                self.getNamedDestinations(kid.getObject(), retval)
-
-        if tree.has_key("/Names"):
-            names = tree["/Names"]
-            for i in range(0, len(names), 2):
-                key = names[i].getObject()
-                val = names[i+1].getObject()
-                if isinstance(val, DictionaryObject) and val.has_key('/D'):
-                    val = val['/D']
-                dest = self._buildDestination(key, val)
-                if dest != None:
-                    retval[key] = dest
-
+        for key, value in tree.items():
+            dest = self._buildNamedDestination(key, value)
+            if dest != None:
+                retval[key] = dest
         return retval
 
+    def _buildNamedDestination(self, title, value):
+        if isinstance(value, DictionaryObject) and value.has_key('/D'):
+            value = value['/D']
+        return self._buildDestination(title, value)
+
     ##
     # Read-only property that accesses the {@link #PdfFileReader.getOutlines
     # getOutlines} function.
@@ -507,48 +675,100 @@ class PdfFileReader(object):
     outlines = property(lambda self: self.getOutlines(), None, None)
 
     ##
-    # Retrieves the document outline present in the document.
+    # Retrieves the document outline present in the document.  It is only
+    # read the first time; later calls return new lists of the same
+    # destinations.
     # <p>
     # Stability: Added in v1.10, will exist for all future v1.x releases.
     # @return Returns a nested list of {@link #Destination destinations}.
     def getOutlines(self, node=None, outlines=None):
         if outlines == None:
-            outlines = []
-            catalog = self.trailer["/Root"]
-            
-            # get the outline dictionary and named destinations
-            if catalog.has_key("/Outlines"):
-                lines = catalog["/Outlines"]
-                if lines.has_key("/First"):
-                    node = lines["/First"]
-            self._namedDests = self.getNamedDestinations()
-            
-        if node == None:
-          return outlines
-          
-        # see if there are any more outlines
-        while 1:
-            outline = self._buildOutline(node)
-            if outline:
-                outlines.append(outline)
-
-            # check for sub-outlines
-            if node.has_key("/First"):
-                subOutlines = []
-                self.getOutlines(node["/First"], subOutlines)
-                if subOutlines:
-                    outlines.append(subOutlines)
-
-            if not node.has_key("/Next"):
-                break
-            node = node["/Next"]
-
+            if self._outlines == None:
+                self._outlines = []
+                self._buildOutlines(self._getFirstOutline(), self._outlines)
+            return _copyOutlines(self._outlines)
+        if node != None:
+            self._buildOutlines(node, outlines)
         return outlines
 
+    ##
+    # Iterates over the entries of the document outline, in the order they
+    # are shown in.  The entries are only read when the iteration reaches
+    # them, and are kept for the next iterations.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @param maxDepth The depth of the deepest entries produced, or None for
+    # all of them.  With 0, only the top level entries are read.
+    # @return A generator of (depth, parent, destination) tuples.  The depth
+    # of top level entries is 0, and their parent is None; the parent of other
+    # entries is the {@link #Destination Destination} of the entry they are
+    # nested in.
+    def iterOutlines(self, maxDepth=None):
+        for depth, parent, outline in self._walkOutlines(self._getFirstOutline(), maxDepth):
+            if outline != None:
+                yield depth, parent, outline
+
+    def _getFirstOutline(self):
+        catalog = self.trailer["/Root"]
+        if catalog.has_key("/Outlines"):
+            lines = catalog["/Outlines"]
+            if lines.has_key("/First"):
+                return lines["/First"]
+        return None
+
+    # Walks the outline entries from node and its siblings, depth first,
+    # without recursion.  Entries that aren't destinations are produced with
+    # None, for their children to be placed.
+    def _walkOutlines(self, node, maxDepth=None):
+        if node == None:
+            return
+        seen = {}
+        stack = [(node, 0, None)]
+        while stack:
+            node, depth, parent = stack.pop()
+            node = node.getObject()
+            if seen.has_key(id(node)):
+                # a broken file, with a loop in the outline.
+                continue
+            seen[id(node)] = True
+            outline = self._getOutline(node)
+            yield depth, parent, outline
+            if node.has_key("/Next"):
+                stack.append((node["/Next"], depth, parent))
+            if node.has_key("/First") and (maxDepth == None or depth < maxDepth):
+                if outline != None:
+                    parent = outline
+                stack.append((node["/First"], depth + 1, parent))
+
+    # The destination of an outline entry, built once.
+    def _getOutline(self, node):
+        entry = self._outlineEntries.get(id(node))
+        if entry == None:
+            # the node is kept, so that its id isn't reused.
+            entry = (node, self._buildOutline(node))
+            self._outlineEntries[id(node)] = entry
+        return entry[1]
+
+    # Builds the nested lists of getOutlines.
+    def _buildOutlines(self, node, outlines):
+        # the list of every depth, down to the current entry.
+        lists = [outlines]
+        for depth, parent, outline in self._walkOutlines(node):
+            del lists[depth + 1:]
+            if outline == None:
+                continue
+            while len(lists) <= depth:
+                sublist = []
+                lists[-1].append(sublist)
+                lists.append(sublist)
+            lists[depth].append(outline)
+
     def _buildDestination(self, title, array):
         page, typ = array[0:2]
         array = array[2:]
-        return Destination(title, page, typ, *array)
+        dest = Destination(title, page, typ, *array)
+        dest.pdf = self
+        return dest
           
     def _buildOutline(self, node):
         dest, title, outline = None, None, None
@@ -568,9 +788,14 @@ class PdfFileReader(object):
         if dest:
             if isinstance(dest, ArrayObject):
                 outline = self._buildDestination(title, dest)
-            elif isinstance(dest, unicode) and self._namedDests.has_key(dest):
-                outline = self._namedDests[dest]
-                outline[NameObject("/Title")] = title
+            elif isinstance(dest, basestring):
+                tree = self._getDestinationsTree()
+                value = None
+                if tree != None:
+                    value = tree.get(dest)
+                if value == None:
+                    raise utils.PdfReadError("Unexpected destination %r" % dest)
+                outline = self._buildNamedDestination(title, value)
             else:
                 raise utils.PdfReadError("Unexpected destination %r" % dest)
         return outline
@@ -584,6 +809,36 @@ class PdfFileReader(object):
     pages = property(lambda self: ConvertFunctionsToVirtualList(self.getNumPages, self.getPage),
             None, None)
 
+    ##
+    # Iterates over the text of the document, page by page, as {@link
+    # #PageObject.iterText PageObject.iterText} returns it.  Pages are only
+    # read when the iteration reaches them.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @return A generator of (page number, unicode string) tuples.
+    def iterText(self):
+        for pageNumber in xrange(self.getNumPages()):
+            for text in self.getPage(pageNumber).iterText():
+                yield pageNumber, text
+
+    ##
+    # Iterates over the image XObjects of the document, page by page.  An
+    # image shared by several pages is only produced for the first of them.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @return A generator of (page number, {@link #ImageXObject ImageXObject})
+    # tuples.
+    def iterImages(self):
+        seen = {}
+        for pageNumber in xrange(self.getNumPages()):
+            for image in self.getPage(pageNumber).iterImages():
+                if image.indirectRef != None:
+                    key = (image.indirectRef.idnum, image.indirectRef.generation)
+                    if seen.has_key(key):
+                        continue
+                    seen[key] = True
+                yield pageNumber, image
+
     def _flatten(self, pages=None, inherit=None, indirectRef=None):
         inheritablePageAttributes = (
             NameObject("/Resources"), NameObject("/MediaBox"),
@@ -611,14 +866,25 @@ class PdfFileReader(object):
                 # parent's value:
                 if not pages.has_key(attr):
                     pages[attr] = value
-            pageObj = PageObject(self, indirectRef)
-            pageObj.update(pages)
+            pageObj = self._firstPage
+            if not self.flattenedPages and pageObj != None:
+                # keep the page already returned by the linearized file's
+                # first page shortcut.
+                pageObj.update(pages)
+            else:
+                pageObj = PageObject(self, indirectRef)
+                pageObj.update(pages)
             self.flattenedPages.append(pageObj)
 
     def getObject(self, indirectReference):
         retval = self.resolvedObjects.get(indirectReference.generation, {}).get(indirectReference.idnum, None)
         if retval != None:
             return retval
+        if self._pendingXref != None and not (
+                self.xref.get(indirectReference.generation, {}).has_key(indirectReference.idnum) or
+                (indirectReference.generation == 0 and
+                 self.xref_objStm.has_key(indirectReference.idnum))):
+            self._loadPendingXref()
         if indirectReference.generation == 0 and \
            self.xref_objStm.has_key(indirectReference.idnum):
             # indirect reference to object in object stream
@@ -654,31 +920,114 @@ class PdfFileReader(object):
             if not hasattr(self, '_decryption_key'):
                 raise Exception, "file has not been decrypted"
             # otherwise, decrypt here...
-            import struct
-            pack1 = struct.pack("<i", indirectReference.idnum)[:3]
-            pack2 = struct.pack("<i", indirectReference.generation)[:2]
-            key = self._decryption_key + pack1 + pack2
-            assert len(key) == (len(self._decryption_key) + 5)
-            md5_hash = md5(key).digest()
-            key = md5_hash[:min(16, len(self._decryption_key) + 5)]
-            retval = self._decryptObject(retval, key)
+            retval = self._decryptObject(retval, indirectReference.idnum,
+                    indirectReference.generation)
 
         self.cacheIndirectObject(generation, idnum, retval)
         return retval
 
-    def _decryptObject(self, obj, key):
+    # getObject, for readers collecting statistics.
+    def _getObjectWithStats(self, indirectReference):
+        stats = self.stats
+        if self.resolvedObjects.get(indirectReference.generation, {}).has_key(indirectReference.idnum):
+            stats.add("cacheHit")
+            return PdfFileReader.getObject(self, indirectReference)
+        stats.add("cacheMiss")
+        start = time.time()
+        self._getObjectDepth += 1
+        try:
+            retval = PdfFileReader.getObject(self, indirectReference)
+        finally:
+            self._getObjectDepth -= 1
+        if isinstance(retval, StreamObject):
+            retval._stats = stats
+        if self._getObjectDepth:
+            # the time is counted by the outermost call.
+            stats.add("getObject")
+        else:
+            stats.add("getObject", 0, time.time() - start)
+        return retval
+
+    def _decryptObject(self, obj, idnum, generation):
         if isinstance(obj, ByteStringObject) or isinstance(obj, TextStringObject):
-            obj = createStringObject(utils.RC4_encrypt(key, obj.original_bytes))
-        elif isinstance(obj, StreamObject):
-            obj._data = utils.RC4_encrypt(key, obj._data)
+            method = self._stringCryptMethod
+            if method != None:
+                decryptor = self._getDecryptor(method, idnum, generation)
+                obj = createStringObject("".join(decryptor(obj.original_bytes)))
         elif isinstance(obj, DictionaryObject):
+            if isinstance(obj, StreamObject):
+                method = self._getStreamCryptMethod(obj)
+                if method != None:
+                    # stream data is only decrypted when it is first accessed
+                    obj.setDecryptor(self._getDecryptor(method, idnum, generation))
             for dictkey, value in obj.items():
-                obj[dictkey] = self._decryptObject(value, key)
+                obj[dictkey] = self._decryptObject(value, idnum, generation)
         elif isinstance(obj, ArrayObject):
             for i in range(len(obj)):
-                obj[i] = self._decryptObject(obj[i], key)
+                obj[i] = self._decryptObject(obj[i], idnum, generation)
         return obj
 
+    # Returns the crypt filter method (/V2, /AESV2 or /AESV3) used for the
+    # data of the given stream, or None if the stream is not encrypted.
+    def _getStreamCryptMethod(self, stream):
+        if stream.get("/Type") == "/XRef":
+            return None
+        filters = stream.get("/Filter", ArrayObject())
+        if not isinstance(filters, ArrayObject):
+            filters = [filters]
+        if len(filters) and filters[0] == "/Crypt":
+            # the stream selects its own crypt filter
+            parms = stream.get("/DecodeParms", DictionaryObject()).getObject()
+            if isinstance(parms, ArrayObject):
+                parms = parms[0].getObject()
+            return self._getCryptMethod(parms.get("/Name", "/Identity"))
+        if stream.get("/Type") == "/Metadata" and not self._encryptMetadata:
+            return None
+        return self._streamCryptMethod
+
+    # Looks up the method of the named crypt filter of the /Encrypt dictionary.
+    # Returns None for the /Identity filter, which leaves data unchanged.
+    def _getCryptMethod(self, name):
+        encrypt = self.trailer['/Encrypt'].getObject()
+        if encrypt['/V'] < 4:
+            return "/V2"
+        if name == "/Identity":
+            return None
+        filters = encrypt.get("/CF", DictionaryObject()).getObject()
+        if not filters.has_key(name):
+            raise utils.PdfReadError("crypt filter %s not found" % name)
+        method = filters[name].get("/CFM", "/None")
+        if method == "/None":
+            return None
+        if method not in ("/V2", "/AESV2", "/AESV3"):
+            raise NotImplementedError("unsupported crypt filter method %s" % method)
+        return method
+
+    def _getObjectKey(self, idnum, generation, method="/V2"):
+        if method == "/AESV3":
+            # AES-256 uses the file encryption key as-is for every object
+            return self._decryption_key
+        key = self._objectKeys.get((idnum, generation, method))
+        if key == None:
+            key = _objectKey(self._decryption_key, idnum, generation,
+                    method == "/AESV2")
+            self._objectKeys[(idnum, generation, method)] = key
+        return key
+
+    # Returns a function that decrypts data of the given object with the given
+    # crypt filter method, returning an iterable of decrypted chunks.
+    def _getDecryptor(self, method, idnum, generation):
+        key = self._getObjectKey(idnum, generation, method)
+        if method == "/V2":
+            decryptor = lambda data: (utils.RC4_encrypt(key, data),)
+            event = "decrypt/RC4"
+        else:
+            decryptor = lambda data: utils.AES_decryptChunks(key, data)
+            event = "decrypt/AES"
+        if self.stats != None:
+            decryptor = self.stats._wrapChunks(event, decryptor)
+        return decryptor
+
     def readObjectHeader(self, stream):
         # Should never be necessary to read out whitespace, since the
         # cross-reference table should put us in the right spot to read the
@@ -698,6 +1047,14 @@ class PdfFileReader(object):
         self.resolvedObjects[generation][idnum] = obj
 
     def read(self, stream):
+        self.xref = {}
+        self.xref_objStm = {}
+        self.trailer = DictionaryObject()
+        self._linearized = None
+        self._pendingXref = None
+        if self._readLinearized(stream):
+            return
+
         # start at the end:
         stream.seek(-1, 2)
         line = ''
@@ -713,10 +1070,12 @@ class PdfFileReader(object):
         if line[:9] != "startxref":
             raise utils.PdfReadError, "startxref not found"
 
-        # read all cross reference tables and their trailers
-        self.xref = {}
-        self.xref_objStm = {}
-        self.trailer = DictionaryObject()
+        self._readXref(stream, startxref)
+
+    # Reads the cross-reference sections and their trailers, starting with the
+    # one at startxref.  If followPrev is false, only one section is read and
+    # the offset of the previous section, or None, is returned.
+    def _readXref(self, stream, startxref, followPrev=True):
         while 1:
             # load the xref table
             stream.seek(startxref, 0)
@@ -778,6 +1137,8 @@ class PdfFileReader(object):
                         self.trailer[key] = value
                 if newTrailer.has_key("/Prev"):
                     startxref = newTrailer["/Prev"]
+                    if not followPrev:
+                        return startxref
                 else:
                     break
             elif x.isdigit():
@@ -786,6 +1147,7 @@ class PdfFileReader(object):
                 idnum, generation = self.readObjectHeader(stream)
                 xrefstream = readObject(stream, self)
                 assert xrefstream["/Type"] == "/XRef"
+                xrefstream._stats = self.stats
                 self.cacheIndirectObject(generation, idnum, xrefstream)
                 streamData = StringIO(xrefstream.getData())
                 idx_pairs = xrefstream.get("/Index", [0, xrefstream.get("/Size")])
@@ -830,6 +1192,8 @@ class PdfFileReader(object):
                         self.trailer[NameObject(key)] = xrefstream.raw_get(key)
                 if xrefstream.has_key("/Prev"):
                     startxref = xrefstream["/Prev"]
+                    if not followPrev:
+                        return startxref
                 else:
                     break
             else:
@@ -847,6 +1211,55 @@ class PdfFileReader(object):
                     assert False
                     break
 
+    # Checks for a linearized file whose linearization parameters are still
+    # valid (the file hasn't been updated since it was linearized).  For such
+    # a file, only the first page cross-reference section, which follows the
+    # linearization parameter dictionary, is read; the main section is read
+    # when an object that isn't in the first section is needed.
+    def _readLinearized(self, stream):
+        stream.seek(0, 0)
+        head = stream.read(1024)
+        m = _linearizedHeadRe.match(head)
+        if m == None:
+            return False
+        try:
+            stream.seek(m.start(1), 0)
+            self.readObjectHeader(stream)
+            linearized = readObject(stream, self)
+            if not isinstance(linearized, DictionaryObject) or \
+                    not linearized.has_key("/Linearized"):
+                return False
+            position = stream.tell()
+            stream.seek(0, 2)
+            if linearized.get("/L") != stream.tell():
+                return False
+            stream.seek(position, 0)
+            readNonWhitespace(stream)
+            stream.seek(-1, 1)
+            if stream.read(6) != "endobj":
+                return False
+            readNonWhitespace(stream)
+            stream.seek(-1, 1)
+            self._pendingXref = self._readXref(stream, stream.tell(), False)
+            if not self.trailer.has_key("/Root"):
+                raise utils.PdfReadError, "first page trailer has no /Root"
+        except (utils.PdfReadError, ValueError, AssertionError):
+            self.xref = {}
+            self.xref_objStm = {}
+            self.trailer = DictionaryObject()
+            self._pendingXref = None
+            return False
+        self._linearized = linearized
+        return True
+
+    # Reads the main cross-reference section of a linearized file, if it
+    # hasn't been read yet.
+    def _loadPendingXref(self):
+        startxref = self._pendingXref
+        if startxref != None:
+            self._pendingXref = None
+            self._readXref(self.stream, startxref)
+
     def _pairs(self, array):
         i = 0
         while True:
@@ -899,20 +1312,32 @@ class PdfFileReader(object):
         encrypt = self.trailer['/Encrypt'].getObject()
         if encrypt['/Filter'] != '/Standard':
             raise NotImplementedError, "only Standard PDF encryption handler is available"
-        if not (encrypt['/V'] in (1, 2)):
-            raise NotImplementedError, "only algorithm code 1 and 2 are supported"
+        if not (encrypt['/V'] in (1, 2, 4, 5)):
+            raise NotImplementedError, "only algorithm code 1, 2, 4 and 5 are supported"
+        if encrypt['/V'] == 5:
+            retval, key = self._authenticateAES256(password)
+        else:
+            retval, key = self._authenticate(password)
+        if retval:
+            self._decryption_key = key
+            self._encryptMetadata = encrypt.get("/EncryptMetadata",
+                    BooleanObject(True)).getObject().value
+            self._stringCryptMethod = self._getCryptMethod(
+                    encrypt.get("/StrF", NameObject("/Identity")))
+            self._streamCryptMethod = self._getCryptMethod(
+                    encrypt.get("/StmF", NameObject("/Identity")))
+        return retval
+
+    def _authenticate(self, password):
+        encrypt = self.trailer['/Encrypt'].getObject()
         user_password, key = self._authenticateUserPassword(password)
         if user_password:
-            self._decryption_key = key
-            return 1
+            return 1, key
         else:
             rev = encrypt['/R'].getObject()
-            if rev == 2:
-                keylen = 5
-            else:
-                keylen = encrypt['/Length'].getObject() / 8
+            keylen = self._getKeyLength()
             key = _alg33_1(password, rev, keylen)
-            real_O = encrypt["/O"].getObject()
+            real_O = encrypt["/O"].getObject().original_bytes
             if rev == 2:
                 userpass = utils.RC4_encrypt(key, real_O)
             else:
@@ -925,9 +1350,42 @@ class PdfFileReader(object):
                 userpass = val
             owner_password, key = self._authenticateUserPassword(userpass)
             if owner_password:
-                self._decryption_key = key
-                return 2
-        return 0
+                return 2, key
+        return 0, None
+
+    # Authenticates a password against the AES-256 (/V 5) security handler,
+    # following algorithms 2.A and 2.B of ISO 32000-2 (revision 6), or the
+    # plain SHA-256 variant of Adobe extension level 3 (revision 5).
+    def _authenticateAES256(self, password):
+        encrypt = self.trailer['/Encrypt'].getObject()
+        rev = encrypt['/R'].getObject()
+        if isinstance(password, unicode):
+            password = password.encode("utf-8")
+        password = password[:127]
+        O = encrypt['/O'].getObject().original_bytes[:48]
+        U = encrypt['/U'].getObject().original_bytes[:48]
+        # hash, validation salt and key salt of the user and owner passwords
+        if _alg2B(password, U[32:40], "", rev) == U[:32]:
+            key = _alg2B(password, U[40:48], "", rev)
+            UE = encrypt['/UE'].getObject().original_bytes[:32]
+            return 1, utils.AES_CBC_decrypt(key, "\x00" * 16, UE)
+        if _alg2B(password, O[32:40], U, rev) == O[:32]:
+            key = _alg2B(password, O[40:48], U, rev)
+            OE = encrypt['/OE'].getObject().original_bytes[:32]
+            return 2, utils.AES_CBC_decrypt(key, "\x00" * 16, OE)
+        return 0, None
+
+    # Length of the file encryption key, in bytes.
+    def _getKeyLength(self):
+        encrypt = self.trailer['/Encrypt'].getObject()
+        if encrypt['/R'] == 2:
+            return 5
+        if encrypt.has_key("/Length"):
+            return encrypt["/Length"] / 8
+        if encrypt['/V'] == 4:
+            # AESV2 requires 128 bit keys, /Length is often omitted
+            return 16
+        return 5
 
     def _authenticateUserPassword(self, password):
         encrypt = self.trailer['/Encrypt'].getObject()
@@ -935,15 +1393,16 @@ class PdfFileReader(object):
         owner_entry = encrypt['/O'].getObject().original_bytes
         p_entry = encrypt['/P'].getObject()
         id_entry = self.trailer['/ID'].getObject()
-        id1_entry = id_entry[0].getObject()
+        id1_entry = id_entry[0].getObject().original_bytes
+        real_U = encrypt['/U'].getObject().original_bytes
         if rev == 2:
             U, key = _alg34(password, owner_entry, p_entry, id1_entry)
         elif rev >= 3:
-            U, key = _alg35(password, rev,
-                    encrypt["/Length"].getObject() / 8, owner_entry,
+            U, key = _alg35(password, rev, self._getKeyLength(), owner_entry,
                     p_entry, id1_entry,
-                    encrypt.get("/EncryptMetadata", BooleanObject(False)).getObject())
-        real_U = encrypt['/U'].getObject().original_bytes
+                    encrypt.get("/EncryptMetadata", BooleanObject(True)).getObject().value)
+            # only the first 16 bytes are significant, the rest is padding
+            U, real_U = U[:16], real_U[:16]
         return U == real_U, key
 
     def getIsEncrypted(self):
@@ -1000,6 +1459,8 @@ class PageObject(DictionaryObject):
         self.pdf = pdf
         # Stores the original indirect reference to this object in its source PDF
         self.indirectRef = indirectRef
+        if getattr(pdf, "resolutionCache", False):
+            self._memoize = True
 
     ##
     # Returns a new blank page.
@@ -1075,6 +1536,8 @@ class PageObject(DictionaryObject):
             return stream
         stream = ContentStream(stream, pdf)
         for operands,operator in stream.operations:
+            if operator == "INLINE IMAGE":
+                continue
             for i in range(len(operands)):
                 op = operands[i]
                 if isinstance(op, NameObject):
@@ -1082,26 +1545,25 @@ class PageObject(DictionaryObject):
         return stream
     _contentStreamRename = staticmethod(_contentStreamRename)
 
-    def _pushPopGS(contents, pdf):
-        # adds a graphics state "push" and "pop" to the beginning and end
-        # of a content stream.  This isolates it from changes such as 
-        # transformation matricies.
-        stream = ContentStream(contents, pdf)
-        stream.operations.insert(0, [[], "q"])
-        stream.operations.append([[], "Q"])
+    def _createContentStream(data):
+        stream = DecodedStreamObject()
+        stream.setData(data)
         return stream
-    _pushPopGS = staticmethod(_pushPopGS)
-
-    def _addTransformationMatrix(contents, pdf, ctm):
-        # adds transformation matrix at the beginning of the given
-        # contents stream.
-        a, b, c, d, e, f = ctm
-        contents = ContentStream(contents, pdf)
-        contents.operations.insert(0, [[FloatObject(a), FloatObject(b),
-            FloatObject(c), FloatObject(d), FloatObject(e),
-            FloatObject(f)], " cm"])
-        return contents
-    _addTransformationMatrix = staticmethod(_addTransformationMatrix)
+    _createContentStream = staticmethod(_createContentStream)
+
+    def _transformationMatrixOperator(ctm):
+        return " ".join([repr(FloatObject(x)) for x in ctm]) + " cm\n"
+    _transformationMatrixOperator = staticmethod(_transformationMatrixOperator)
+
+    # Returns the content streams of this page as a list of stream objects or
+    # indirect references to them, without reading any stream data.
+    def _getContentStreams(self):
+        if not self.has_key("/Contents"):
+            return []
+        contents = self.raw_get("/Contents")
+        if isinstance(contents.getObject(), ArrayObject):
+            return list(contents.getObject())
+        return [contents]
 
     ##
     # Returns the /Contents object, or None if it doesn't exist.
@@ -1134,12 +1596,20 @@ class PageObject(DictionaryObject):
     #
     # @param page2 An instance of {@link #PageObject PageObject} to be merged
     #              into this one.
+    # <p>
+    # The content streams of both pages are not parsed or copied: the new
+    # /Contents array references them, between small streams saving and
+    # restoring the graphics state.  page2's content is only parsed if some of
+    # its resources have to be renamed.
+    #
     # @param page2transformation A fuction which applies a transformation to
     #                            the content stream of page2. Takes: page2
     #                            contents stream. Must return: new contents
     #                            stream. If omitted, the content stream will
     #                            not be modified.
-    def _mergePage(self, page2, page2transformation=None):
+    # @param ctm A 6 elements tuple containing the operands of a
+    #            transformation matrix to apply to page2's content, or None.
+    def _mergePage(self, page2, page2transformation=None, ctm=None):
         # First we work on merging the resource dictionaries.  This allows us
         # to find out what symbols in the content streams we might need to
         # rename.
@@ -1163,24 +1633,104 @@ class PageObject(DictionaryObject):
         )
 
         newContentArray = ArrayObject()
-
-        originalContent = self.getContents()
-        if originalContent is not None:
-            newContentArray.append(PageObject._pushPopGS(
-                  originalContent, self.pdf))
-
-        page2Content = page2.getContents()
-        if page2Content is not None:
-            if page2transformation is not None:
-                page2Content = page2transformation(page2Content)
-            page2Content = PageObject._contentStreamRename(
-                page2Content, rename, self.pdf)
-            page2Content = PageObject._pushPopGS(page2Content, self.pdf)
-            newContentArray.append(page2Content)
-
-        self[NameObject('/Contents')] = ContentStream(newContentArray, self.pdf)
+        # graphics state "push" and "pop" operators isolate each page's
+        # content from changes such as transformation matrices.
+        pop = ""
+
+        originalContent = self._getContentStreams()
+        if originalContent:
+            newContentArray.append(PageObject._createContentStream("q\n"))
+            newContentArray.extend(originalContent)
+            pop = "\nQ\n"
+
+        page2Content = page2._getContentStreams()
+        if page2Content:
+            if page2transformation is not None or rename:
+                page2Content = ContentStream(ArrayObject(page2Content), self.pdf)
+                if page2transformation is not None:
+                    page2Content = page2transformation(page2Content)
+                page2Content = [PageObject._contentStreamRename(
+                    page2Content, rename, self.pdf)]
+            push = pop + "q\n"
+            if ctm is not None:
+                push += PageObject._transformationMatrixOperator(ctm)
+            newContentArray.append(PageObject._createContentStream(push))
+            newContentArray.extend(page2Content)
+            pop = "\nQ\n"
+
+        if pop:
+            newContentArray.append(PageObject._createContentStream(pop))
+            self[NameObject('/Contents')] = newContentArray
         self[NameObject('/Resources')] = newResources
 
+    ##
+    # Returns a form XObject with the content and resources of this page,
+    # which can be drawn on other pages with {@link #PageObject.mergeFormXObject
+    # mergeFormXObject}.  If the page has a single content stream, its data is
+    # reused without being decoded.
+    # @return A StreamObject instance.
+    def createFormXObject(self):
+        contents = [c.getObject() for c in self._getContentStreams()]
+        if len(contents) == 1:
+            if isinstance(contents[0], EncodedStreamObject):
+                xobject = EncodedStreamObject()
+            else:
+                xobject = DecodedStreamObject()
+            for key in ("/Filter", "/DecodeParms"):
+                if contents[0].has_key(key):
+                    xobject[NameObject(key)] = contents[0].raw_get(key)
+            xobject._data = contents[0]._data
+        else:
+            xobject = DecodedStreamObject()
+            xobject.setData("\n".join([c.getData() for c in contents]))
+        xobject[NameObject("/Type")] = NameObject("/XObject")
+        xobject[NameObject("/Subtype")] = NameObject("/Form")
+        xobject[NameObject("/BBox")] = self.mediaBox
+        if self.has_key("/Resources"):
+            xobject[NameObject("/Resources")] = self.raw_get("/Resources")
+        return xobject
+
+    ##
+    # Draws a form XObject, such as one returned by {@link
+    # #PdfFileWriter.addFormXObject PdfFileWriter.addFormXObject}, on top of
+    # this page.  The XObject is added to the page's resources, and a short
+    # content stream drawing it is appended to the page's content; the
+    # existing content streams are not parsed or copied.
+    # @param xobject A form XObject, usually an indirect reference to one so
+    #                that it is shared by all the pages it is drawn on.
+    # @param ctm A 6 elements tuple containing the operands of a
+    #            transformation matrix to apply to the XObject, or None.
+    def mergeFormXObject(self, xobject, ctm=None):
+        # copy the resource dictionaries, which may be shared with other pages
+        resources = DictionaryObject()
+        if self.has_key("/Resources"):
+            resources.update(self["/Resources"])
+        xobjects = DictionaryObject()
+        if resources.has_key("/XObject"):
+            xobjects.update(resources["/XObject"])
+        # find a name that is not already used by another XObject
+        name = NameObject("/Fx")
+        i = 0
+        while xobjects.has_key(name) and xobjects.raw_get(name) != xobject:
+            i += 1
+            name = NameObject("/Fx%d" % i)
+        xobjects[name] = xobject
+        resources[NameObject("/XObject")] = xobjects
+        self[NameObject("/Resources")] = resources
+
+        draw = "q\n"
+        if ctm is not None:
+            draw += PageObject._transformationMatrixOperator(ctm)
+        draw += "%s Do\nQ\n" % name
+        newContentArray = ArrayObject()
+        originalContent = self._getContentStreams()
+        if originalContent:
+            newContentArray.append(PageObject._createContentStream("q\n"))
+            newContentArray.extend(originalContent)
+            draw = "\nQ\n" + draw
+        newContentArray.append(PageObject._createContentStream(draw))
+        self[NameObject('/Contents')] = newContentArray
+
     ##
     # This is similar to mergePage, but a transformation matrix is
     # applied to the merged stream.
@@ -1189,8 +1739,7 @@ class PageObject(DictionaryObject):
     # @param ctm   A 6 elements tuple containing the operands of the
     #              transformation matrix
     def mergeTransformedPage(self, page2, ctm):
-        self._mergePage(page2, lambda page2Content:
-            PageObject._addTransformationMatrix(page2Content, page2.pdf, ctm))
+        self._mergePage(page2, ctm=ctm)
 
     ##
     # This is similar to mergePage, but the stream to be merged is scaled
@@ -1305,11 +1854,13 @@ class PageObject(DictionaryObject):
     # @param ctm   A 6 elements tuple containing the operands of the
     #              transformation matrix
     def addTransformation(self, ctm):
-        originalContent = self.getContents()
-        if originalContent is not None:
-            newContent = PageObject._addTransformationMatrix(
-                originalContent, self.pdf, ctm)
-            newContent = PageObject._pushPopGS(newContent, self.pdf)
+        originalContent = self._getContentStreams()
+        if originalContent:
+            newContent = ArrayObject()
+            newContent.append(PageObject._createContentStream(
+                "q\n" + PageObject._transformationMatrixOperator(ctm)))
+            newContent.extend(originalContent)
+            newContent.append(PageObject._createContentStream("\nQ\n"))
             self[NameObject('/Contents')] = newContent
 
     ##
@@ -1375,35 +1926,167 @@ class PageObject(DictionaryObject):
     # be overhauled to provide more ordered text in the future.
     # @return a unicode string object
     def extractText(self):
-        text = u""
-        content = self["/Contents"].getObject()
+        return u"".join(self.iterText())
+
+    ##
+    # Iterates over the text of this page, as {@link #PageObject.extractText
+    # extractText} would return it, one text run at a time.  Text runs are
+    # produced while the content stream is parsed, so the iteration can be
+    # stopped early without parsing the rest of the page.
+    # <p>
+    # Strings are decoded through the /ToUnicode CMap or the /Encoding of the
+    # current font.  Each font is only prepared once per document, see {@link
+    # #fonts.getFont fonts.getFont}.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @return A generator of unicode strings.
+    def iterText(self):
+        content = self.getContents()
+        if content is None:
+            return
         if not isinstance(content, ContentStream):
             content = ContentStream(content, self.pdf)
-        # Note: we check all strings are TextStringObjects.  ByteStringObjects
-        # are strings where the byte->string encoding was unknown, so adding
-        # them to the text here would be gibberish.
-        for operands,operator in content.operations:
-            if operator == "Tj":
-                _text = operands[0]
-                if isinstance(_text, TextStringObject):
-                    text += _text
+        fontResources = DictionaryObject()
+        if self.has_key("/Resources"):
+            fontResources = self["/Resources"].get("/Font", fontResources).getObject()
+        font = None
+        for operands,operator in content.iterOperations():
+            if operator == "Tf":
+                font = None
+                if fontResources.has_key(operands[0]):
+                    font = fonts.getFont(fontResources.raw_get(operands[0]))
+            elif operator == "Tj":
+                _text = _decodeText(operands[0], font)
+                if _text:
+                    yield _text
             elif operator == "T*":
-                text += "\n"
+                yield u"\n"
             elif operator == "'":
-                text += "\n"
-                _text = operands[0]
-                if isinstance(_text, TextStringObject):
-                    text += operands[0]
+                yield u"\n"
+                _text = _decodeText(operands[0], font)
+                if _text:
+                    yield _text
             elif operator == '"':
-                _text = operands[2]
-                if isinstance(_text, TextStringObject):
-                    text += "\n"
-                    text += _text
+                _text = _decodeText(operands[2], font)
+                if _text:
+                    yield u"\n"
+                    yield _text
             elif operator == "TJ":
                 for i in operands[0]:
-                    if isinstance(i, TextStringObject):
-                        text += i
-        return text
+                    _text = _decodeText(i, font)
+                    if _text:
+                        yield _text
+
+    ##
+    # Iterates over the text of this page together with its position.  This
+    # follows the text and graphics state of the content stream (the
+    # current transformation matrix, the text matrix, the font and font size,
+    # character and word spacing, horizontal scaling, leading and rise) to
+    # place every text run on the page.
+    # <p>
+    # Each item is a (text, x, y, fontSize, width) tuple.  x and y are the
+    # origin of the text run's first glyph in default user space, fontSize is
+    # the font size scaled into default user space, and width is the advance
+    # of the whole run in default user space, computed from the font's glyph
+    # widths.  Each string of a TJ array is a separate text run.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @return A generator of (text, x, y, fontSize, width) tuples.
+    def iterTextPositions(self):
+        content = self.getContents()
+        if content is None:
+            return
+        if not isinstance(content, ContentStream):
+            content = ContentStream(content, self.pdf)
+        fontResources = DictionaryObject()
+        if self.has_key("/Resources"):
+            fontResources = self["/Resources"].get("/Font", fontResources).getObject()
+        identity = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+        multiply = utils.affineMultiply
+        ctm = identity
+        stack = []
+        tm = tlm = identity
+        font = None
+        fontSize = 0.0
+        charSpace = wordSpace = leading = rise = 0.0
+        scale = 1.0
+        for operands,operator in content.iterOperations():
+            if operator == "TJ":
+                strings = operands[0]
+            elif operator == "Tj":
+                strings = operands
+            elif operator == "'" or operator == '"':
+                if operator == '"':
+                    wordSpace = float(operands[0])
+                    charSpace = float(operands[1])
+                    operands = operands[2:]
+                tm = tlm = multiply((1.0, 0.0, 0.0, 1.0, 0.0, -leading), tlm)
+                strings = operands
+            else:
+                if operator == "cm":
+                    ctm = multiply(tuple([float(x) for x in operands]), ctm)
+                elif operator == "q":
+                    # the text state parameters are part of the graphics
+                    # state; the text matrix isn't.
+                    stack.append((ctm, font, fontSize, charSpace, wordSpace,
+                            scale, leading, rise))
+                elif operator == "Q":
+                    if stack:
+                        (ctm, font, fontSize, charSpace, wordSpace, scale,
+                                leading, rise) = stack.pop()
+                elif operator == "BT":
+                    tm = tlm = identity
+                elif operator == "Tm":
+                    tm = tlm = tuple([float(x) for x in operands])
+                elif operator == "Td" or operator == "TD":
+                    tx, ty = float(operands[0]), float(operands[1])
+                    if operator == "TD":
+                        leading = -ty
+                    tm = tlm = multiply((1.0, 0.0, 0.0, 1.0, tx, ty), tlm)
+                elif operator == "T*":
+                    tm = tlm = multiply((1.0, 0.0, 0.0, 1.0, 0.0, -leading), tlm)
+                elif operator == "Tf":
+                    font = None
+                    if fontResources.has_key(operands[0]):
+                        font = fonts.getFont(fontResources.raw_get(operands[0]))
+                    fontSize = float(operands[1])
+                elif operator == "Tc":
+                    charSpace = float(operands[0])
+                elif operator == "Tw":
+                    wordSpace = float(operands[0])
+                elif operator == "Tz":
+                    scale = float(operands[0]) / 100
+                elif operator == "TL":
+                    leading = float(operands[0])
+                elif operator == "Ts":
+                    rise = float(operands[0])
+                continue
+            # The text space -> user space matrix only changes between text
+            # showing operators, so it is computed once per operator rather
+            # than per glyph.
+            m = multiply(tm, ctm)
+            for string in strings:
+                if not isinstance(string, (TextStringObject, ByteStringObject)):
+                    # a TJ adjustment, in thousandths of text space units
+                    tx = -float(string) / 1000 * fontSize * scale
+                    tm = multiply((1.0, 0.0, 0.0, 1.0, tx, 0.0), tm)
+                    m = multiply(tm, ctm)
+                    continue
+                data = string.original_bytes
+                if font != None:
+                    glyphWidth, codes, spaces = font.measure(data)
+                else:
+                    glyphWidth, codes, spaces = 500.0 * len(data), len(data), data.count(" ")
+                tx = (glyphWidth / 1000 * fontSize + codes * charSpace +
+                        spaces * wordSpace) * scale
+                _text = _decodeText(string, font)
+                if _text:
+                    a, b, c, d, e, f = m
+                    yield (_text, rise * c + e, rise * d + f,
+                            fontSize * math.sqrt(c * c + d * d),
+                            tx * math.sqrt(a * a + b * b))
+                tm = multiply((1.0, 0.0, 0.0, 1.0, tx, 0.0), tm)
+                m = multiply(tm, ctm)
 
     ##
     # A rectangle (RectangleObject), expressed in default user space units,
@@ -1446,26 +2129,97 @@ class PageObject(DictionaryObject):
     # Stability: Added in v1.4, will exist for all future v1.x releases.
     artBox = createRectangleAccessor("/ArtBox", ("/CropBox", "/MediaBox"))
 
+    ##
+    # Iterates over the image XObjects used by this page, including those used
+    # by form XObjects drawn on the page.  The images' data isn't read or
+    # decoded until it is asked for.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @return A generator of {@link #ImageXObject ImageXObject} objects.
+    def iterImages(self):
+        seen = {}
+        resources = [self.get("/Resources")]
+        while resources:
+            res = resources.pop(0)
+            if res == None:
+                continue
+            xobjects = res.getObject().get("/XObject")
+            if xobjects == None:
+                continue
+            xobjects = xobjects.getObject()
+            for name in xobjects.keys():
+                ref = xobjects.raw_get(name)
+                if isinstance(ref, IndirectObject):
+                    key = (ref.idnum, ref.generation)
+                    if seen.has_key(key):
+                        continue
+                    seen[key] = True
+                else:
+                    ref = None
+                xobject = xobjects[name]
+                subtype = xobject.get("/Subtype")
+                if subtype == "/Image":
+                    yield ImageXObject(name, xobject, ref)
+                elif subtype == "/Form":
+                    resources.append(xobject.get("/Resources"))
+
+
+# Decodes a string operand of a text showing operator, shown with the given
+# fonts.Font (or None if the font is unknown).
+def _decodeText(string, font):
+    if not isinstance(string, (TextStringObject, ByteStringObject)):
+        return None
+    if font != None:
+        return font.decode(string.original_bytes)
+    # Without a font, we only keep strings that decode as text.  Others are
+    # strings where the byte->string encoding was unknown, so adding them to
+    # the text here would be gibberish.
+    string = createStringObject(string.original_bytes)
+    if isinstance(string, TextStringObject):
+        return string
+    return None
+
 
 class ContentStream(DecodedStreamObject):
     def __init__(self, stream, pdf):
         self.pdf = pdf
-        self.operations = []
+        self._operations = None
         # stream may be a StreamObject or an ArrayObject containing
         # multiple StreamObjects to be cat'd together.
         stream = stream.getObject()
         if isinstance(stream, ArrayObject):
-            data = ""
-            for s in stream:
-                data += s.getObject().getData()
-            stream = StringIO(data)
+            self._content = "".join([s.getObject().getData() for s in stream])
         else:
-            stream = StringIO(stream.getData())
-        self.__parseContentStream(stream)
+            self._content = stream.getData()
 
-    def __parseContentStream(self, stream):
-        # file("f:\\tmp.txt", "w").write(stream.read())
-        stream.seek(0, 0)
+    ##
+    # The list of (operands, operator) pairs of this content stream.  The
+    # content is only parsed when this list is first accessed; until then,
+    # the original content stream data is written out unchanged.
+    def _getOperations(self):
+        if self._operations == None:
+            self._operations = list(self.__parseContentStream(self._content))
+            self._content = None
+        return self._operations
+
+    def _setOperations(self, value):
+        self._operations = value
+        self._content = None
+
+    operations = property(_getOperations, _setOperations)
+
+    ##
+    # Iterates over the (operands, operator) pairs of this content stream.  If
+    # the operations have not been parsed yet, they are parsed as the
+    # iteration proceeds, and are not kept.
+    def iterOperations(self):
+        if self._operations != None:
+            return iter(self._operations)
+        return self.__parseContentStream(self._content)
+
+    # generator that parses the operations of a content stream.
+    def __parseContentStream(self, content):
+        stream = StringIO(content)
         operands = []
         while True:
             peek = readNonWhitespace(stream)
@@ -1486,10 +2240,10 @@ class ContentStream(DecodedStreamObject):
                     # begin inline image - a completely different parsing
                     # mechanism is required, of course... thanks buddy...
                     assert operands == []
-                    ii = self._readInlineImage(stream)
-                    self.operations.append((ii, "INLINE IMAGE"))
+                    ii = self._readInlineImage(stream, content)
+                    yield ii, "INLINE IMAGE"
                 else:
-                    self.operations.append((operands, operator))
+                    yield operands, operator
                     operands = []
             elif peek == '%':
                 # If we encounter a comment in the content stream, we have to
@@ -1500,9 +2254,9 @@ class ContentStream(DecodedStreamObject):
                 while peek not in ('\r', '\n'):
                     peek = stream.read(1)
             else:
-                operands.append(readObject(stream, None))
+                operands.append(readObject(stream, None, False))
 
-    def _readInlineImage(self, stream):
+    def _readInlineImage(self, stream, content):
         # begin reading just after the "BI" - begin image
         # first read the dictionary of settings.
         settings = DictionaryObject()
@@ -1520,23 +2274,39 @@ class ContentStream(DecodedStreamObject):
         # left at beginning of ID
         tmp = stream.read(3)
         assert tmp[:2] == "ID"
-        data = ""
-        while True:
-            tok = stream.read(1)
-            if tok == "E":
-                next = stream.read(1)
-                if next == "I":
+        start = stream.tell()
+        end = -1
+        # PDF 2.0 gives the length of the image data; if it's there and is
+        # followed by EI, we don't have to look for the end of the data.
+        length = settings.get("/L", settings.get("/Length"))
+        if isinstance(length, NumberObject) and length >= 0:
+            end = start + length
+            while end < len(content) and content[end].isspace():
+                end += 1
+            if content[end:end+2] != "EI":
+                end = -1
+        if end == -1:
+            # Look for an EI preceded by whitespace, and followed by
+            # whitespace, a delimiter or the end of the content, as a bare
+            # "EI" can appear inside the image data.
+            end = content.find("EI", start)
+            while end != -1:
+                after = content[end+2:end+3]
+                if (end == start or content[end-1].isspace()) and \
+                        (after == "" or after.isspace() or
+                         after in NameObject.delimiterCharacters):
                     break
-                else:
-                    stream.seek(-1, 1)
-                    data += tok
-            else:
-                data += tok
-        x = readNonWhitespace(stream)
-        stream.seek(-1, 1)
-        return {"settings": settings, "data": data}
+                end = content.find("EI", end + 1)
+            if end == -1:
+                raise utils.PdfReadError("Unterminated inline image")
+        stream.seek(end + 2)
+        return {"settings": settings, "data": content[start:end]}
 
     def _getData(self):
+        if self._content != None:
+            # the operations have never been accessed, and so can't have been
+            # modified.
+            return self._content
         newdata = StringIO()
         for operands,operator in self.operations:
             if operator == "INLINE IMAGE":
@@ -1556,7 +2326,8 @@ class ContentStream(DecodedStreamObject):
         return newdata.getvalue()
 
     def _setData(self, value):
-        self.__parseContentStream(StringIO(value))
+        self._content = value
+        self._operations = None
 
     _data = property(_getData, _setData)
 
@@ -1625,11 +2396,302 @@ class DocumentInformation(DictionaryObject):
     producer_raw = property(lambda self: self.get("/Producer"))
 
 
+##
+# An image XObject, as produced by {@link #PageObject.iterImages
+# PageObject.iterImages}.
+# <p>
+# Images compressed with a filter that pyPdf can't decode (JPEG, JPEG 2000,
+# CCITT fax and JBIG2) can be read in their encoded form with {@link
+# #ImageXObject.getRawData getRawData} or {@link #ImageXObject.writeRawData
+# writeRawData}, which is a valid file of the corresponding format for JPEG
+# and JPEG 2000 images.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class ImageXObject(object):
+    def __init__(self, name, stream, indirectRef=None):
+        ##
+        # The name of the image in the /XObject resources that use it.
+        self.name = name
+        ##
+        # The image's stream object.
+        self.stream = stream
+        ##
+        # The IndirectObject referring to the image, or None.
+        self.indirectRef = indirectRef
+
+    def _getEntry(self, key):
+        value = self.stream.get(key)
+        if value != None:
+            value = value.getObject()
+        return value
+
+    ##
+    # Read-only property accessing the width of the image, in samples.
+    width = property(lambda self: self._getEntry("/Width"))
+
+    ##
+    # Read-only property accessing the height of the image, in samples.
+    height = property(lambda self: self._getEntry("/Height"))
+
+    ##
+    # Read-only property accessing the number of bits per colour component, or
+    # None (for example for JPEG 2000 images).
+    bitsPerComponent = property(lambda self: self._getEntry("/BitsPerComponent"))
+
+    ##
+    # Read-only property accessing the colour space of the image: a name such
+    # as /DeviceRGB, an array for other colour spaces, or None for image masks
+    # and JPEG 2000 images that carry their own colour space.
+    colorSpace = property(lambda self: self._getEntry("/ColorSpace"))
+
+    ##
+    # Read-only property accessing the list of the names of the filters
+    # applied to the image data, in decoding order.
+    filterNames = property(lambda self: list(filters.getFilters(self.stream)))
+
+    def _getRawFilter(self):
+        chain = self.filterNames
+        if chain and chain[-1] in _rawImageFilters:
+            return chain[-1]
+        return None
+
+    ##
+    # Read-only property accessing the last filter of the image, if it is one
+    # of /DCTDecode, /JPXDecode, /CCITTFaxDecode or /JBIG2Decode, and None
+    # otherwise.  Images with such a filter can be read with {@link
+    # #ImageXObject.getRawData getRawData}.
+    rawFilter = property(_getRawFilter)
+
+    ##
+    # Read-only property accessing the usual filename extension of the raw
+    # image data, such as ".jpg", or None if there is no raw filter.
+    extension = property(lambda self: _rawImageFilters.get(self.rawFilter))
+
+    ##
+    # Returns the decoded image samples.  This raises NotImplementedError for
+    # the filters pyPdf can't decode.
+    def getData(self):
+        return self.stream.getData()
+
+    ##
+    # Iterates over the image data, encoded with the image's {@link
+    # #ImageXObject.rawFilter raw filter}.  Any filter that comes before it in
+    # the chain, and the document's encryption, are removed.  The data of
+    # encrypted documents is produced in chunks as it is decrypted.
+    # @return An iterator of strings.
+    def iterRawData(self):
+        if self.rawFilter == None:
+            raise NotImplementedError("image has no raw filter")
+        chain = self.filterNames[:-1]
+        if chain:
+            return iter((filters.decodeStreamData(self.stream, chain),))
+        return iter(self.stream._iterRawData())
+
+    ##
+    # Returns the image data, encoded with the image's {@link
+    # #ImageXObject.rawFilter raw filter}.
+    # @return A string.
+    def getRawData(self):
+        return "".join(self.iterRawData())
+
+    ##
+    # Writes the image data, encoded with the image's {@link
+    # #ImageXObject.rawFilter raw filter}, to a file-like object without
+    # keeping it all in memory.
+    # @param stream The file-like object to write to.
+    # @return The number of bytes written.
+    def writeRawData(self, stream):
+        size = 0
+        for chunk in self.iterRawData():
+            stream.write(chunk)
+            size += len(chunk)
+        return size
+
+
+# filters of image data that is written out as is, and their usual filename
+# extensions.
+_rawImageFilters = {
+    "/DCTDecode": ".jpg",
+    "/JPXDecode": ".jp2",
+    "/CCITTFaxDecode": ".ccitt",
+    "/JBIG2Decode": ".jbig2",
+    }
+
+
+# Copies the nested lists returned by PdfFileReader.getOutlines, so that the
+# reader's own lists can't be changed by its callers.
+def _copyOutlines(outlines):
+    retval = list(outlines)
+    stack = [retval]
+    while stack:
+        lines = stack.pop()
+        for i in xrange(len(lines)):
+            if isinstance(lines[i], list):
+                lines[i] = list(lines[i])
+                stack.append(lines[i])
+    return retval
+
+
+# The bytes a name tree key is sorted by.
+def _nameTreeKey(name):
+    if isinstance(name, str):
+        return name
+    try:
+        return name.original_bytes
+    except Exception:
+        pass
+    try:
+        return encode_pdfdocencoding(name)
+    except UnicodeEncodeError:
+        return codecs.BOM_UTF16_BE + name.encode("utf-16be")
+
+
+##
+# A name tree (section 3.8.5 of the PDF 1.6 reference), mapping strings to
+# objects.  Looking up a name only reads the nodes leading to it: the kids of
+# every node are searched by their /Limits, and the names of the leaf by
+# bisection.  Iterating over the tree reads all of it once, and keeps the
+# result.
+# <p>
+# Lookups rely on the names being sorted, as the reference requires.  If a
+# node has kids without /Limits, lookups fall back to reading the whole tree.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param root The root node of the tree, a dictionary.
+class NameTree(object):
+    def __init__(self, root):
+        self.root = root.getObject()
+        self._items = None
+        self._values = None
+        # the keys of the /Limits of the nodes, and of the names of the
+        # leaves, by node id.  The nodes are kept, so that their ids aren't
+        # reused.
+        self._limits = {}
+        self._leaves = {}
+
+    ##
+    # Looks up a name.
+    # @param name The name, a string.
+    # @param default The value returned if the name isn't in the tree.
+    # @return The object the name maps to, with indirect references resolved.
+    def get(self, name, default=None):
+        key = _nameTreeKey(name)
+        if self._values != None:
+            return self._values.get(key, default)
+        node = self.root
+        seen = {}
+        while not node.has_key("/Names"):
+            if not node.has_key("/Kids") or seen.has_key(id(node)):
+                return default
+            seen[id(node)] = True
+            kids = node["/Kids"]
+            lo, hi = 0, len(kids)
+            node = None
+            while lo < hi:
+                mid = (lo + hi) // 2
+                kid = kids[mid].getObject()
+                limits = self._getLimits(kid)
+                if limits == None:
+                    return self._getValues().get(key, default)
+                if key < limits[0]:
+                    hi = mid
+                elif key > limits[1]:
+                    lo = mid + 1
+                else:
+                    node = kid
+                    break
+            if node == None:
+                return default
+        keys = self._getLeafKeys(node)
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return node["/Names"][2 * i + 1].getObject()
+        return default
+
+    def _getLimits(self, node):
+        entry = self._limits.get(id(node))
+        if entry == None:
+            limits = node.get("/Limits")
+            if limits == None or len(limits) < 2:
+                entry = (node, None)
+            else:
+                entry = (node, (_nameTreeKey(limits[0]), _nameTreeKey(limits[1])))
+            self._limits[id(node)] = entry
+        return entry[1]
+
+    def _getLeafKeys(self, node):
+        entry = self._leaves.get(id(node))
+        if entry == None:
+            names = node["/Names"]
+            keys = [_nameTreeKey(names[i].getObject())
+                    for i in xrange(0, len(names) - 1, 2)]
+            entry = (node, keys)
+            self._leaves[id(node)] = entry
+        return entry[1]
+
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value == None:
+            raise KeyError, name
+        return value
+
+    def has_key(self, name):
+        return self.get(name) != None
+
+    __contains__ = has_key
+
+    ##
+    # Reads the whole tree, the first time it is called.
+    # @return A list of (name, object) tuples, in the order of the tree.
+    def items(self):
+        if self._items == None:
+            items = []
+            seen = {}
+            stack = [self.root]
+            while stack:
+                node = stack.pop()
+                if seen.has_key(id(node)):
+                    continue
+                seen[id(node)] = True
+                if node.has_key("/Names"):
+                    names = node["/Names"]
+                    for i in xrange(0, len(names) - 1, 2):
+                        items.append((names[i].getObject(), names[i+1].getObject()))
+                if node.has_key("/Kids"):
+                    kids = [kid.getObject() for kid in node["/Kids"]]
+                    kids.reverse()
+                    stack.extend(kids)
+            self._items = items
+        return list(self._items)
+
+    ##
+    # @return The names of the tree, in order.
+    def keys(self):
+        return [name for name, value in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+    def _getValues(self):
+        if self._values == None:
+            values = {}
+            for name, value in self.items():
+                values.setdefault(_nameTreeKey(name), value)
+            self._values = values
+        return self._values
+
+
 ##
 # A class representing a destination within a PDF file.
 # See section 8.2.1 of the PDF 1.6 reference.
 # Stability: Added in v1.10, will exist for all v1.x releases.
 class Destination(DictionaryObject):
+    # the PdfFileReader the destination was read from.
+    pdf = None
+
     def __init__(self, title, page, typ, *args):
         DictionaryObject.__init__(self)
         self[NameObject("/Title")] = title
@@ -1662,6 +2724,25 @@ class Destination(DictionaryObject):
     # @return An integer.
     page = property(lambda self: self.get("/Page"))
 
+    def _getPageNumber(self):
+        page = self.get("/Page")
+        if isinstance(page, NumberObject):
+            # destinations in other documents give page numbers.
+            return int(page)
+        if self.pdf == None:
+            return None
+        return self.pdf.getPageNumber(page)
+
+    ##
+    # Read-only property accessing the number of the destination page, as
+    # found by {@link #PdfFileReader.getPageNumber
+    # PdfFileReader.getPageNumber}.
+    # <p>
+    # Stability: Added in v1.13, will exist for all future v1.x releases.
+    # @return An integer, counting from 0, or None if the page is not in the
+    # document.
+    pageNumber = property(_getPageNumber)
+
     ##
     # Read-only property accessing the destination type.
     # @return A string.
@@ -1692,6 +2773,9 @@ class Destination(DictionaryObject):
     # @return A number, or None if not available.
     bottom = property(lambda self: self.get("/Bottom", None))
 
+# a file that starts with a linearization parameter dictionary.
+_linearizedHeadRe = re.compile(r"%PDF-[0-9.]+\s*(?:%[^\r\n]*[\r\n]+\s*)*(\d+\s+\d+\s+obj)")
+
 def convertToInt(d, size):
     if size > 8:
         raise utils.PdfReadError("invalid size in convertToInt")
@@ -1699,6 +2783,27 @@ def convertToInt(d, size):
     d = d[-8:]
     return struct.unpack(">q", d)[0]
 
+# Implementation of algorithm 3.1 of the PDF standard security handler,
+# section 3.5.1 of the PDF 1.6 reference, steps 1 - 3: computes the key used to
+# encrypt the strings and streams of the object idnum / generation.
+def _objectKey(key, idnum, generation, aes=False):
+    # 1. Obtain the object number and generation number from the object
+    # identifier.
+    # 2. Extend the encryption key by 5 bytes by appending the low-order 3
+    # bytes of the object number and the low-order 2 bytes of the generation
+    # number, low-order byte first.  (AES only) Extend the key further by
+    # adding the 4 bytes "sAlT".
+    n = len(key)
+    key = key + struct.pack("<i", idnum)[:3] + struct.pack("<i", generation)[:2]
+    if aes:
+        key += "sAlT"
+    # 3. Initialize the MD5 hash function and pass the result of step 2 as
+    # input to this function.  Use the first (n + 5) bytes, up to a maximum of
+    # 16, of the output from the MD5 hash as the key for the RC4 or AES
+    # function.
+    md5_hash = md5(key).digest()
+    return md5_hash[:min(16, n + 5)]
+
 # ref: pdf1.8 spec section 3.5.2 algorithm 3.2
 _encryption_padding = '\x28\xbf\x4e\x5e\x4e\x75\x8a\x41\x64\x00\x4e\x56' + \
         '\xff\xfa\x01\x08\x2e\x2e\x00\xb6\xd0\x68\x3e\x80\x2f\x0c' + \
@@ -1722,14 +2827,14 @@ def _alg32(password, rev, keylen, owner_entry, p_entry, id1_entry, metadata_encr
     m.update(owner_entry)
     # 4. Treat the value of the /P entry as an unsigned 4-byte integer and pass
     # these bytes to the MD5 hash function, low-order byte first.
-    p_entry = struct.pack('<i', p_entry)
+    p_entry = struct.pack('<I', p_entry & 0xFFFFFFFF)
     m.update(p_entry)
     # 5. Pass the first element of the file's file identifier array to the MD5
     # hash function.
     m.update(id1_entry)
-    # 6. (Revision 3 or greater) If document metadata is not being encrypted,
+    # 6. (Revision 4 or greater) If document metadata is not being encrypted,
     # pass 4 bytes with the value 0xFFFFFFFF to the MD5 hash function.
-    if rev >= 3 and not metadata_encrypt:
+    if rev >= 4 and not metadata_encrypt:
         m.update("\xff\xff\xff\xff")
     # 7. Finish the hash.
     md5_hash = m.digest()
@@ -1815,7 +2920,8 @@ def _alg34(password, owner_entry, p_entry, id1_entry):
 def _alg35(password, rev, keylen, owner_entry, p_entry, id1_entry, metadata_encrypt):
     # 1. Create an encryption key based on the user password string, as
     # described in Algorithm 3.2.
-    key = _alg32(password, rev, keylen, owner_entry, p_entry, id1_entry)
+    key = _alg32(password, rev, keylen, owner_entry, p_entry, id1_entry,
+            metadata_encrypt)
     # 2. Initialize the MD5 hash function and pass the 32-byte padding string
     # shown in step 1 of Algorithm 3.2 as input to this function. 
     m = md5()
@@ -1848,6 +2954,35 @@ def _alg35(password, rev, keylen, owner_entry, p_entry, id1_entry, metadata_encr
     # people's implementations)
     return val + ('\x00' * 16), key
 
+# Implementation of algorithm 2.B of ISO 32000-2, computing the hash of a
+# password for the AES-256 security handler.  Revision 5 files use a single
+# SHA-256 round.
+def _alg2B(password, salt, udata, rev):
+    import hashlib
+    K = hashlib.sha256(password + salt + udata).digest()
+    if rev < 6:
+        return K
+    i = 0
+    while True:
+        # a) Make a new string, K1, consisting of 64 repetitions of the
+        # sequence: input password, K, the 48-byte user key.
+        K1 = (password + K + udata) * 64
+        # b) Encrypt K1 with the AES-128 (CBC, no padding) algorithm, using the
+        # first 16 bytes of K as the key and the second 16 bytes of K as the
+        # initialization vector.
+        E = utils.AES_CBC_encrypt(K[:16], K[16:32], K1)
+        # c) Taking the first 16 bytes of E as an unsigned big-endian integer,
+        # compute the remainder, modulo 3, and use it to select the next hash
+        # function: SHA-256, SHA-384 or SHA-512.
+        h = sum([ord(c) for c in E[:16]]) % 3
+        K = (hashlib.sha256, hashlib.sha384, hashlib.sha512)[h](E).digest()
+        # d) Repeat for at least 64 rounds, until the last byte of E is not
+        # greater than the round number - 32.
+        i += 1
+        if i >= 64 and ord(E[-1]) <= i - 32:
+            break
+    return K[:32]
+
 #if __name__ == "__main__":
 #    output = PdfFileWriter()
 #
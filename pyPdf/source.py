@@ -0,0 +1,260 @@
+"""
+Byte sources: random access to the bytes of a PDF file that may not be
+stored locally, such as a file in a blob store reached through HTTP range
+requests.  A {@link #ByteSourceStream ByteSourceStream} turns a byte source
+into the seekable stream PdfFileReader expects; since PdfFileReader only
+reads the end of the file, the cross-reference tables and the objects that
+are asked for, only those ranges are fetched.
+"""
+
+import urllib2
+from utils import PdfReadError
+
+##
+# The interface of byte sources.  Sources only have to implement read and
+# getSize.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class ByteSource(object):
+    ##
+    # Reads a range of bytes.
+    # @param offset The offset of the first byte.
+    # @param length The number of bytes to read.
+    # @return A string, shorter than length only at the end of the source.
+    def read(self, offset, length):
+        raise NotImplementedError
+
+    ##
+    # @return The size of the source, in bytes.
+    def getSize(self):
+        raise NotImplementedError
+
+
+##
+# A byte source reading from a seekable file-like object.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class FileByteSource(ByteSource):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read(self, offset, length):
+        self.stream.seek(offset)
+        return self.stream.read(length)
+
+    def getSize(self):
+        self.stream.seek(0, 2)
+        return self.stream.tell()
+
+
+##
+# A byte source reading from an HTTP server that supports range requests.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param url The URL of the PDF file.
+# @param headers Extra HTTP headers to send with every request, for example
+# for authentication.
+class HTTPByteSource(ByteSource):
+    def __init__(self, url, headers=None):
+        self.url = url
+        self.headers = headers or {}
+        self._size = None
+        ##
+        # The number of requests made so far.
+        self.requests = 0
+        ##
+        # The number of bytes received so far.
+        self.bytesRead = 0
+
+    def _request(self, first, last):
+        request = urllib2.Request(self.url)
+        for key, value in self.headers.items():
+            request.add_header(key, value)
+        request.add_header("Range", "bytes=%d-%d" % (first, last))
+        response = urllib2.urlopen(request)
+        try:
+            data = response.read()
+            contentRange = response.info().getheader("Content-Range")
+            status = response.code
+        finally:
+            response.close()
+        self.requests += 1
+        self.bytesRead += len(data)
+        if status == 206 and contentRange:
+            # "bytes first-last/size"
+            size = contentRange.split("/")[-1].strip()
+            if size != "*":
+                self._size = int(size)
+        elif status == 200:
+            # the server ignored the range, and sent the whole file.
+            self._size = len(data)
+            data = data[first:last+1]
+        else:
+            raise PdfReadError("unexpected HTTP response %s" % status)
+        return data
+
+    def read(self, offset, length):
+        if length <= 0:
+            return ""
+        return self._request(offset, offset + length - 1)
+
+    def getSize(self):
+        if self._size == None:
+            self._request(0, 0)
+            if self._size == None:
+                raise PdfReadError("server did not report the file size")
+        return self._size
+
+
+##
+# A byte source caching the blocks read from another source.  Reads are
+# rounded out to whole blocks, and missing blocks that are next to each other
+# are fetched with a single read of the underlying source.  A read whose last
+# block is missing also fetches the missing readahead blocks after it.  The
+# least recently used blocks are dropped when the cache is full.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param source The underlying {@link #ByteSource ByteSource}.
+# @param blockSize The size of the cached blocks, in bytes.
+# @param maxBlocks The maximum number of blocks kept.
+# @param readahead The number of blocks read past the end of every read that
+# misses the cache.
+class CachedByteSource(ByteSource):
+    def __init__(self, source, blockSize=16384, maxBlocks=256, readahead=1):
+        self.source = source
+        self.blockSize = blockSize
+        self.maxBlocks = max(maxBlocks, readahead + 1)
+        self.readahead = readahead
+        self._size = None
+        self._blocks = {}
+        # block numbers, least recently used first.
+        self._lru = []
+
+    def getSize(self):
+        if self._size == None:
+            self._size = self.source.getSize()
+        return self._size
+
+    def read(self, offset, length):
+        size = self.getSize()
+        end = min(offset + length, size)
+        if offset >= end:
+            return ""
+        bs = self.blockSize
+        first = offset // bs
+        last = (end - 1) // bs
+        blocks = self._blocks
+        chunks = []
+        block = first
+        while block <= last:
+            data = blocks.get(block)
+            if data != None:
+                self._touch(block)
+                chunks.append(data)
+                block += 1
+                continue
+            # fetch the run of missing blocks starting here.  If it runs to
+            # the end of the read, the missing readahead blocks after it are
+            # fetched along with it.
+            stop = block
+            while stop < last and not blocks.has_key(stop + 1):
+                stop += 1
+            if stop == last:
+                limit = min(last + self.readahead, (size - 1) // bs)
+                while stop < limit and not blocks.has_key(stop + 1):
+                    stop += 1
+            data = self.source.read(block * bs, (stop - block + 1) * bs)
+            for i in range(block, stop + 1):
+                chunk = data[(i - block) * bs:(i - block + 1) * bs]
+                self._store(i, chunk)
+                if i <= last:
+                    chunks.append(chunk)
+            block = stop + 1
+        data = "".join(chunks)
+        start = offset - first * bs
+        return data[start:start + end - offset]
+
+    def _touch(self, block):
+        lru = self._lru
+        if lru and lru[-1] == block:
+            return
+        lru.remove(block)
+        lru.append(block)
+
+    def _store(self, block, data):
+        if self._blocks.has_key(block):
+            self._lru.remove(block)
+        self._blocks[block] = data
+        self._lru.append(block)
+        while len(self._lru) > self.maxBlocks:
+            del self._blocks[self._lru.pop(0)]
+
+
+##
+# A seekable, read-only file-like object over a byte source, which can be
+# given to PdfFileReader.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param source A {@link #ByteSource ByteSource}.  Since PdfFileReader makes
+# many small reads, it should normally be a {@link #CachedByteSource
+# CachedByteSource}.
+class ByteSourceStream(object):
+    def __init__(self, source):
+        self.source = source
+        self.position = 0
+        # the last chunk read from the source, so that the many single byte
+        # reads made by the parser don't each go through the source.
+        self._chunk = ""
+        self._chunkOffset = 0
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.source.getSize() - self.position
+        pos = self.position
+        start = pos - self._chunkOffset
+        if start >= 0 and start + size <= len(self._chunk):
+            self.position = pos + size
+            return self._chunk[start:start + size]
+        blockSize = getattr(self.source, "blockSize", 4096)
+        if size < blockSize:
+            # read the blocks around the position, and keep them for the next
+            # reads, which are often just before (the parser reads the end of
+            # the file backwards) or just after this one.
+            chunkOffset = pos - pos % blockSize
+            blocks = (pos + size - chunkOffset + blockSize - 1) // blockSize
+            self._chunk = self.source.read(chunkOffset, blocks * blockSize)
+            self._chunkOffset = chunkOffset
+            data = self._chunk[pos - chunkOffset:pos - chunkOffset + size]
+        else:
+            data = self.source.read(pos, size)
+        self.position = pos + len(data)
+        return data
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.source.getSize()
+        if offset < 0:
+            raise IOError, "negative seek position"
+        self.position = offset
+
+    def tell(self):
+        return self.position
+
+
+##
+# Opens a PDF file served over HTTP for reading, fetching only the byte
+# ranges PdfFileReader needs.
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+# @param url The URL of the PDF file.  The server must support range
+# requests.
+# @param blockSize The size of the cached blocks, in bytes.
+# @param maxBlocks The maximum number of blocks kept.
+# @param readahead The number of blocks read past every cache miss.
+# @return A PdfFileReader.
+def openURL(url, blockSize=16384, maxBlocks=256, readahead=1):
+    from pdf import PdfFileReader
+    source = CachedByteSource(HTTPByteSource(url), blockSize, maxBlocks, readahead)
+    return PdfFileReader(ByteSourceStream(source))
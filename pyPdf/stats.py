@@ -0,0 +1,139 @@
+"""
+Instrumentation of PdfFileReader and PdfFileWriter, to find out where the
+time goes when a file is slow: in reading the file, parsing objects,
+decompressing or decrypting streams, or writing.  Statistics are only
+collected when a {@link #PdfStats PdfStats} object is given to the reader or
+writer; otherwise the instrumentation costs nothing.
+"""
+
+import time
+
+##
+# Counters and cumulative times of the operations of a reader or writer.
+# <p>
+# Every operation is recorded as an event with a name, a size in bytes and an
+# elapsed time.  The events are:
+# <ul>
+# <li>"getObject": an object that wasn't cached was read and parsed.  The time
+# of a call includes the nested calls it made (for example to read an object
+# stream), which are not counted again.</li>
+# <li>"cacheHit" and "cacheMiss": a call to getObject found, or didn't find,
+# the object already parsed.</li>
+# <li>"read" and "seek": calls to the file's read and seek methods.  The size
+# of a read is the number of bytes returned.</li>
+# <li>"decode/FlateDecode", "decode/ASCIIHexDecode"...: a filter was applied
+# to stream data.  The size is the number of bytes output by the filter.  If
+# the stream is encrypted, the time of the first filter includes the
+# decryption of its input.</li>
+# <li>"decrypt/RC4" and "decrypt/AES": a string or a chunk of stream data was
+# decrypted.  The size is the number of bytes decrypted.</li>
+# <li>"encrypt/RC4": a string or stream was encrypted while writing.  The
+# size is the number of bytes encrypted.</li>
+# <li>"writeObject": an object was written.  The size is the number of bytes
+# written, and the time includes its encryption.</li>
+# </ul>
+# <p>
+# Stability: Added in v1.13, will exist for all future v1.x releases.
+class PdfStats(object):
+    def __init__(self):
+        self._callbacks = []
+        self.reset()
+
+    ##
+    # Clears the statistics.  Callbacks are kept.
+    def reset(self):
+        ##
+        # The number of times each event happened, by event name.
+        self.counts = {}
+        ##
+        # The total size of each event, in bytes, by event name.
+        self.sizes = {}
+        ##
+        # The cumulative time spent in each event, in seconds, by event name.
+        self.times = {}
+
+    ##
+    # Adds a function called after every recorded event.
+    # @param callback A function, called as callback(event, size, elapsed).
+    # @param events The names of the events to call the function for, or None
+    # for all of them.
+    def addCallback(self, callback, events=None):
+        self._callbacks.append((callback, events))
+
+    ##
+    # Removes a function added with {@link #PdfStats.addCallback addCallback}.
+    def removeCallback(self, callback):
+        self._callbacks = [c for c in self._callbacks if c[0] != callback]
+
+    ##
+    # Records an event.
+    # @param event The event name.
+    # @param size The size of the event, in bytes.
+    # @param elapsed The time the event took, in seconds.
+    def add(self, event, size=0, elapsed=0.0):
+        self.counts[event] = self.counts.get(event, 0) + 1
+        if size:
+            self.sizes[event] = self.sizes.get(event, 0) + size
+        if elapsed:
+            self.times[event] = self.times.get(event, 0.0) + elapsed
+        for callback, events in self._callbacks:
+            if events == None or event in events:
+                callback(event, size, elapsed)
+
+    ##
+    # Returns the statistics of an event.
+    # @return A (count, size, time) tuple.
+    def get(self, event):
+        return (self.counts.get(event, 0), self.sizes.get(event, 0),
+                self.times.get(event, 0.0))
+
+    ##
+    # Formats the statistics as a table, one event per line, the slowest
+    # first.
+    def report(self):
+        events = self.counts.keys()
+        events.sort(lambda a, b: cmp(self.times.get(b, 0.0), self.times.get(a, 0.0)) or cmp(a, b))
+        lines = ["%-24s %10s %14s %10s" % ("event", "count", "bytes", "seconds")]
+        for event in events:
+            count, size, elapsed = self.get(event)
+            lines.append("%-24s %10d %14d %10.4f" % (event, count, size, elapsed))
+        return "\n".join(lines)
+
+    # Wraps a function returning an iterable of chunks (a decryptor, see
+    # StreamObject.setDecryptor) to record every chunk as an event.  The
+    # chunks are still produced as they are consumed.
+    def _wrapChunks(self, event, fn):
+        def wrapper(data):
+            start = time.time()
+            chunks = iter(fn(data))
+            while 1:
+                try:
+                    chunk = chunks.next()
+                except StopIteration:
+                    return
+                self.add(event, len(chunk), time.time() - start)
+                yield chunk
+                start = time.time()
+        return wrapper
+
+
+# Wraps the stream of a PdfFileReader to record its reads and seeks.
+class _StatsStream(object):
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.stats = stats
+
+    def read(self, *args):
+        start = time.time()
+        data = self.stream.read(*args)
+        self.stats.add("read", len(data), time.time() - start)
+        return data
+
+    def seek(self, *args):
+        start = time.time()
+        retval = self.stream.seek(*args)
+        self.stats.add("seek", 0, time.time() - start)
+        return retval
+
+    def tell(self):
+        return self.stream.tell()
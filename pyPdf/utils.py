@@ -34,6 +34,8 @@ Utility functions for PDF library.
 __author__ = "Mathieu Fenniak"
 __author_email__ = "biziqe@mathieu.fenniak.net"
 
+import struct
+
 #ENABLE_PSYCO = False
 #if ENABLE_PSYCO:
 #    try:
@@ -83,21 +85,242 @@ class ConvertFunctionsToVirtualList(object):
             raise IndexError, "sequence index out of range"
         return self.getFunction(index)
 
+# PyCrypto's ARC4 is used when it is available, since it runs at C speed.  The
+# pure-Python implementation below is always available as a fallback.
+try:
+    from Crypto.Cipher import ARC4 as _ARC4
+except ImportError:
+    _ARC4 = None
+
 def RC4_encrypt(key, plaintext):
-    S = [i for i in range(256)]
+    if _ARC4 is not None:
+        return _ARC4.new(key).encrypt(plaintext)
+    return _RC4_encrypt(key, plaintext)
+
+def _RC4_encrypt(key, plaintext):
+    S = range(256)
     j = 0
-    for i in range(256):
-        j = (j + S[i] + ord(key[i % len(key)])) % 256
+    keylen = len(key)
+    key = bytearray(key)
+    for i in xrange(256):
+        j = (j + S[i] + key[i % keylen]) & 0xFF
         S[i], S[j] = S[j], S[i]
     i, j = 0, 0
-    retval = ""
-    for x in range(len(plaintext)):
-        i = (i + 1) % 256
-        j = (j + S[i]) % 256
-        S[i], S[j] = S[j], S[i]
-        t = S[(S[i] + S[j]) % 256]
-        retval += chr(ord(plaintext[x]) ^ t)
-    return retval
+    retval = bytearray(plaintext)
+    for x in xrange(len(retval)):
+        i = (i + 1) & 0xFF
+        si = S[i]
+        j = (j + si) & 0xFF
+        sj = S[j]
+        S[i] = sj
+        S[j] = si
+        retval[x] ^= S[(si + sj) & 0xFF]
+    return str(retval)
+
+# AES is needed for the AESV2 and AESV3 crypt filters (PDF 1.6+).  As with RC4,
+# PyCrypto is used when available, and a pure-Python implementation otherwise.
+try:
+    from Crypto.Cipher import AES as _AESBackend
+except ImportError:
+    _AESBackend = None
+
+def _aesTables():
+    # Generates the AES S-boxes and the combined SubBytes / MixColumns lookup
+    # tables ("T-tables") used to process one 32-bit column at a time.
+    def mul(a, b):
+        p = 0
+        while b:
+            if b & 1:
+                p ^= a
+            a <<= 1
+            if a & 0x100:
+                a ^= 0x11B
+            b >>= 1
+        return p
+    sbox = [0] * 256
+    inv_sbox = [0] * 256
+    for x in range(256):
+        # multiplicative inverse in GF(2^8), followed by the affine transform
+        inv = 0
+        if x:
+            for y in range(1, 256):
+                if mul(x, y) == 1:
+                    inv = y
+                    break
+        s = inv
+        for i in range(1, 5):
+            s ^= ((inv << i) | (inv >> (8 - i))) & 0xFF
+        s ^= 0x63
+        sbox[x] = s
+        inv_sbox[s] = x
+    Te0 = [(mul(s, 2) << 24) | (s << 16) | (s << 8) | mul(s, 3) for s in sbox]
+    Td0 = [(mul(s, 14) << 24) | (mul(s, 9) << 16) | (mul(s, 13) << 8) | mul(s, 11)
+           for s in inv_sbox]
+    def ror(table, n):
+        return [((t >> n) | (t << (32 - n))) & 0xFFFFFFFF for t in table]
+    return (sbox, inv_sbox, Te0, ror(Te0, 8), ror(Te0, 16), ror(Te0, 24),
+            Td0, ror(Td0, 8), ror(Td0, 16), ror(Td0, 24))
+
+_aes = None
+
+##
+# Pure-Python AES block cipher (FIPS-197), for 128, 192 and 256 bit keys.
+class _AESCipher(object):
+    def __init__(self, key):
+        global _aes
+        if _aes == None:
+            _aes = _aesTables()
+        sbox, inv_sbox, Te0, Te1, Te2, Te3, Td0, Td1, Td2, Td3 = _aes
+        nk = len(key) / 4
+        if len(key) not in (16, 24, 32):
+            raise ValueError("invalid AES key size %d" % len(key))
+        self.rounds = nr = nk + 6
+        w = list(struct.unpack(">%dI" % nk, key))
+        rcon = 1
+        for i in xrange(nk, 4 * (nr + 1)):
+            t = w[i - 1]
+            if i % nk == 0:
+                t = ((sbox[(t >> 16) & 0xFF] << 24) | (sbox[(t >> 8) & 0xFF] << 16) |
+                     (sbox[t & 0xFF] << 8) | sbox[t >> 24]) ^ (rcon << 24)
+                rcon = rcon << 1
+                if rcon & 0x100:
+                    rcon ^= 0x11B
+            elif nk > 6 and i % nk == 4:
+                t = ((sbox[t >> 24] << 24) | (sbox[(t >> 16) & 0xFF] << 16) |
+                     (sbox[(t >> 8) & 0xFF] << 8) | sbox[t & 0xFF])
+            w.append(w[i - nk] ^ t)
+        self.ek = [w[4*r:4*r+4] for r in xrange(nr + 1)]
+        # round keys for the equivalent inverse cipher
+        self.dk = [self.ek[nr]]
+        for r in xrange(nr - 1, 0, -1):
+            self.dk.append([Td0[sbox[t >> 24]] ^ Td1[sbox[(t >> 16) & 0xFF]] ^
+                            Td2[sbox[(t >> 8) & 0xFF]] ^ Td3[sbox[t & 0xFF]]
+                            for t in self.ek[r]])
+        self.dk.append(self.ek[0])
+
+    def encryptBlock(self, s0, s1, s2, s3):
+        sbox, inv_sbox, Te0, Te1, Te2, Te3 = _aes[:6]
+        ek = self.ek
+        k = ek[0]
+        s0 ^= k[0]; s1 ^= k[1]; s2 ^= k[2]; s3 ^= k[3]
+        for r in xrange(1, self.rounds):
+            k = ek[r]
+            s0, s1, s2, s3 = (
+                Te0[s0 >> 24] ^ Te1[(s1 >> 16) & 0xFF] ^ Te2[(s2 >> 8) & 0xFF] ^ Te3[s3 & 0xFF] ^ k[0],
+                Te0[s1 >> 24] ^ Te1[(s2 >> 16) & 0xFF] ^ Te2[(s3 >> 8) & 0xFF] ^ Te3[s0 & 0xFF] ^ k[1],
+                Te0[s2 >> 24] ^ Te1[(s3 >> 16) & 0xFF] ^ Te2[(s0 >> 8) & 0xFF] ^ Te3[s1 & 0xFF] ^ k[2],
+                Te0[s3 >> 24] ^ Te1[(s0 >> 16) & 0xFF] ^ Te2[(s1 >> 8) & 0xFF] ^ Te3[s2 & 0xFF] ^ k[3])
+        k = ek[self.rounds]
+        return (
+            ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16) | (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ k[0],
+            ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16) | (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ k[1],
+            ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16) | (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ k[2],
+            ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16) | (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ k[3])
+
+    def decryptBlock(self, s0, s1, s2, s3):
+        inv_sbox = _aes[1]
+        Td0, Td1, Td2, Td3 = _aes[6:]
+        dk = self.dk
+        k = dk[0]
+        s0 ^= k[0]; s1 ^= k[1]; s2 ^= k[2]; s3 ^= k[3]
+        for r in xrange(1, self.rounds):
+            k = dk[r]
+            s0, s1, s2, s3 = (
+                Td0[s0 >> 24] ^ Td1[(s3 >> 16) & 0xFF] ^ Td2[(s2 >> 8) & 0xFF] ^ Td3[s1 & 0xFF] ^ k[0],
+                Td0[s1 >> 24] ^ Td1[(s0 >> 16) & 0xFF] ^ Td2[(s3 >> 8) & 0xFF] ^ Td3[s2 & 0xFF] ^ k[1],
+                Td0[s2 >> 24] ^ Td1[(s1 >> 16) & 0xFF] ^ Td2[(s0 >> 8) & 0xFF] ^ Td3[s3 & 0xFF] ^ k[2],
+                Td0[s3 >> 24] ^ Td1[(s2 >> 16) & 0xFF] ^ Td2[(s1 >> 8) & 0xFF] ^ Td3[s0 & 0xFF] ^ k[3])
+        k = dk[self.rounds]
+        return (
+            ((inv_sbox[s0 >> 24] << 24) | (inv_sbox[(s3 >> 16) & 0xFF] << 16) | (inv_sbox[(s2 >> 8) & 0xFF] << 8) | inv_sbox[s1 & 0xFF]) ^ k[0],
+            ((inv_sbox[s1 >> 24] << 24) | (inv_sbox[(s0 >> 16) & 0xFF] << 16) | (inv_sbox[(s3 >> 8) & 0xFF] << 8) | inv_sbox[s2 & 0xFF]) ^ k[1],
+            ((inv_sbox[s2 >> 24] << 24) | (inv_sbox[(s1 >> 16) & 0xFF] << 16) | (inv_sbox[(s0 >> 8) & 0xFF] << 8) | inv_sbox[s3 & 0xFF]) ^ k[2],
+            ((inv_sbox[s3 >> 24] << 24) | (inv_sbox[(s2 >> 16) & 0xFF] << 16) | (inv_sbox[(s1 >> 8) & 0xFF] << 8) | inv_sbox[s0 & 0xFF]) ^ k[3])
+
+    def cbcEncrypt(self, iv, data):
+        c0, c1, c2, c3 = struct.unpack(">4I", iv)
+        words = struct.unpack(">%dI" % (len(data) / 4), data)
+        out = []
+        encryptBlock = self.encryptBlock
+        for x in xrange(0, len(words), 4):
+            c0, c1, c2, c3 = encryptBlock(words[x] ^ c0, words[x+1] ^ c1,
+                    words[x+2] ^ c2, words[x+3] ^ c3)
+            out.extend((c0, c1, c2, c3))
+        return struct.pack(">%dI" % len(out), *out)
+
+    def cbcDecrypt(self, iv, data):
+        p0, p1, p2, p3 = struct.unpack(">4I", iv)
+        words = struct.unpack(">%dI" % (len(data) / 4), data)
+        out = []
+        decryptBlock = self.decryptBlock
+        for x in xrange(0, len(words), 4):
+            c0, c1, c2, c3 = words[x:x+4]
+            d0, d1, d2, d3 = decryptBlock(c0, c1, c2, c3)
+            out.extend((d0 ^ p0, d1 ^ p1, d2 ^ p2, d3 ^ p3))
+            p0, p1, p2, p3 = c0, c1, c2, c3
+        return struct.pack(">%dI" % len(out), *out)
+
+##
+# Encrypts data with AES in CBC mode, without any padding.  The length of the
+# data must be a multiple of 16 bytes.
+def AES_CBC_encrypt(key, iv, data):
+    if _AESBackend is not None:
+        return _AESBackend.new(key, _AESBackend.MODE_CBC, iv).encrypt(data)
+    return _AESCipher(key).cbcEncrypt(iv, data)
+
+##
+# Decrypts data with AES in CBC mode, without removing any padding.  The
+# length of the data must be a multiple of 16 bytes.
+def AES_CBC_decrypt(key, iv, data):
+    if _AESBackend is not None:
+        return _AESBackend.new(key, _AESBackend.MODE_CBC, iv).decrypt(data)
+    return _AESCipher(key).cbcDecrypt(iv, data)
+
+##
+# Decrypts string or stream data encrypted by the AESV2 or AESV3 crypt
+# filters: a 16 byte initialization vector, followed by the AES-CBC encrypted
+# data padded as described in PKCS#5.  The plaintext is yielded in chunks of
+# about chunkSize bytes, so that it can be consumed (for example, inflated)
+# without building a full decrypted copy of a large stream.
+def AES_decryptChunks(key, data, chunkSize=65536):
+    iv = data[:16]
+    length = len(data) - ((len(data) - 16) % 16)
+    if length <= 16:
+        return
+    chunkSize -= chunkSize % 16
+    if _AESBackend is not None:
+        cipher = _AESBackend.new(key, _AESBackend.MODE_CBC, iv)
+        decrypt = cipher.decrypt
+    else:
+        cipher = _AESCipher(key)
+        def decrypt(chunk):
+            return cipher.cbcDecrypt(iv, chunk)
+    for start in xrange(16, length, chunkSize):
+        end = min(start + chunkSize, length)
+        chunk = decrypt(data[start:end])
+        iv = data[end-16:end]
+        if end == length:
+            # strip the PKCS#5 padding from the last block
+            pad = ord(chunk[-1])
+            if 1 <= pad <= 16 and chunk[-pad:] == chunk[-1] * pad:
+                chunk = chunk[:-pad]
+        yield chunk
+
+##
+# Decrypts string or stream data encrypted by the AESV2 or AESV3 crypt filters.
+# See AES_decryptChunks.
+def AES_decrypt(key, data):
+    return "".join(AES_decryptChunks(key, data))
+
+# Multiplies two transformation matrices given by their six operands
+# (a, b, c, d, e, f), as used by the "cm" and "Tm" operators.  This is much
+# cheaper than matrixMultiply on full 3x3 matrices.
+def affineMultiply(m, n):
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (a * A + b * C, a * B + b * D,
+            c * A + d * C, c * B + d * D,
+            e * A + f * C + E, e * B + f * D + F)
 
 def matrixMultiply(a, b):
     return [[sum([float(i)*float(j)
@@ -111,6 +334,9 @@ class PyPdfError(Exception):
 class PdfReadError(PyPdfError):
     pass
 
+class PdfWriteError(PyPdfError):
+    pass
+
 class PageSizeNotDefinedError(PyPdfError):
     pass
 
@@ -120,3 +346,5 @@ if __name__ == "__main__":
     print repr(out)
     pt = RC4_encrypt("Key", out)
     print repr(pt)
+    assert out == "\xbb\xf3\x16\xe8\xd9\x40\xaf\x0a\xd3"
+    assert _RC4_encrypt("Key", "Plaintext") == out
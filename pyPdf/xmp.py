@@ -59,8 +59,8 @@ class XmpInformation(PdfObject):
         self.rdfRoot = docRoot.getElementsByTagNameNS(RDF_NAMESPACE, "RDF")[0]
         self.cache = {}
 
-    def writeToStream(self, stream, encryption_key):
-        self.stream.writeToStream(stream, encryption_key)
+    def writeToStream(self, stream, encryption_key, stats=None):
+        self.stream.writeToStream(stream, encryption_key, stats)
 
     def getElement(self, aboutUri, namespace, name):
         for desc in self.rdfRoot.getElementsByTagNameNS(RDF_NAMESPACE, "Description"):
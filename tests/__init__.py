@@ -0,0 +1,5 @@
+"""
+Tests for pyPdf, run from the top directory with:
+
+    python -m unittest discover tests
+"""
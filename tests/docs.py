@@ -0,0 +1,63 @@
+"""
+Small PDF files built byte by byte, for the tests.
+"""
+
+import zlib
+
+
+##
+# Builds a PDF file.
+# @param objects The objects, numbered from 1: PDF source strings, or
+# (dictionary entries, stream data) tuples for streams.
+# @param trailer Extra entries of the trailer, as PDF source.
+# @return The file's data.
+def build(objects, trailer=""):
+    out = ["%PDF-1.4\n"]
+    pos = len(out[0])
+    offsets = []
+    for i in range(len(objects)):
+        obj = objects[i]
+        if isinstance(obj, tuple):
+            entries, data = obj
+            obj = "<< %s /Length %d >>\nstream\n%s\nendstream" % (
+                    entries, len(data), data)
+        data = "%d 0 obj\n%s\nendobj\n" % (i + 1, obj)
+        offsets.append(pos)
+        out.append(data)
+        pos += len(data)
+    out.append("xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.append("%010d 00000 n \n" % offset)
+    out.append("trailer\n<< /Size %d /Root 1 0 R %s >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1, trailer, pos))
+    return "".join(out)
+
+
+##
+# Builds a document with one page per content stream, all using the
+# Helvetica font as /F1.
+# @param contents The content streams of the pages.
+# @param compress If true, the content streams are flate compressed.
+def pages(contents, compress=False, mediaBox="[0 0 612 792]"):
+    n = len(contents)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Count %d /Kids [%s] >>" % (
+                n, " ".join(["%d 0 R" % (4 + 2 * i) for i in range(n)])),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        ]
+    for i in range(n):
+        objects.append("<< /Type /Page /Parent 2 0 R /MediaBox %s "
+                "/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (
+                mediaBox, 5 + 2 * i))
+        if compress:
+            objects.append(("/Filter /FlateDecode", zlib.compress(contents[i])))
+        else:
+            objects.append(("", contents[i]))
+    return build(objects)
+
+
+##
+# The content stream of a page showing a line of text.
+def text(s, x=72, y=700):
+    return "BT /F1 12 Tf %d %d Td (%s) Tj ET" % (x, y, s)
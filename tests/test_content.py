@@ -0,0 +1,55 @@
+import unittest
+
+from pyPdf import utils
+from pyPdf.pdf import ContentStream
+from pyPdf.generic import DecodedStreamObject
+
+
+def _operations(content):
+    stream = DecodedStreamObject()
+    stream.setData(content)
+    return ContentStream(stream, None).operations
+
+
+class InlineImageTest(unittest.TestCase):
+    def image(self, content):
+        operations = _operations(content)
+        self.assertEqual([operator for operands, operator in operations],
+                ["q", "INLINE IMAGE", "Q"])
+        return operations[1][0]
+
+    def testImage(self):
+        image = self.image("q BI /W 2 /H 1 /BPC 8 /CS /G ID \x01\x02 EI Q")
+        self.assertEqual(image["settings"]["/W"], 2)
+        self.assertEqual(image["settings"]["/CS"], "/G")
+        self.assertEqual(image["data"], "\x01\x02 ")
+
+    def testEIInData(self):
+        # "EI" inside the data that isn't preceded by whitespace, or isn't
+        # followed by whitespace or a delimiter, doesn't end the image.
+        data = "\x01EI \x02 EI\x03\x04EI"
+        image = self.image("q BI /W 11 /H 1 /BPC 8 /CS /G ID %s EI Q" % data)
+        self.assertEqual(image["data"], data + " ")
+
+    def testLength(self):
+        # with /L, even a whitespace delimited EI can be in the data
+        data = "\x01 EI \x02"
+        image = self.image("q BI /W 6 /H 1 /BPC 8 /CS /G /L 6 ID %s EI Q" % data)
+        self.assertEqual(image["data"], data + " ")
+        image = self.image("q BI /W 6 /H 1 /BPC 8 /CS /G /Length 6 ID %s\nEI Q" % data)
+        self.assertEqual(image["data"], data + "\n")
+
+    def testWrongLength(self):
+        # a length that isn't followed by EI is ignored
+        image = self.image("q BI /W 2 /H 1 /BPC 8 /CS /G /L 1 ID \x01\x02 EI Q")
+        self.assertEqual(image["data"], "\x01\x02 ")
+
+    def testUnterminated(self):
+        self.assertRaises(utils.PdfReadError, _operations,
+                "q BI /W 2 /H 1 /BPC 8 /CS /G ID \x01\x02EI Q")
+        self.assertRaises(utils.PdfReadError, _operations,
+                "q BI /W 2 /H 1 /BPC 8 /CS /G ID \x01\x02")
+
+
+if __name__ == "__main__":
+    unittest.main()
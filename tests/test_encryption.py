@@ -0,0 +1,74 @@
+import os
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+# The fixtures were written by qpdf: two pages reading "Hello AES 0" and
+# "Hello AES 1", the title "Secret title", and an XMP metadata stream, with
+# the user password "user" and the owner password "owner".
+def _read(name):
+    f = file(os.path.join(DATA, name), "rb")
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+class AESTest(unittest.TestCase):
+    def _check(self, name, password, expected):
+        reader = PdfFileReader(StringIO(_read(name)))
+        self.failUnless(reader.isEncrypted)
+        self.assertEqual(reader.decrypt(password), expected)
+        self.assertEqual(reader.getNumPages(), 2)
+        self.assertEqual(reader.getPage(1).extractText(), u"Hello AES 1")
+        self.assertEqual(reader.getDocumentInfo().title, u"Secret title")
+        self.assertEqual(reader.getXmpMetadata().dc_format, u"application/pdf")
+
+    def testAESV2User(self):
+        self._check("aesv2.pdf", "user", 1)
+
+    def testAESV2Owner(self):
+        self._check("aesv2.pdf", "owner", 2)
+
+    def testAESV2ClearMetadataUser(self):
+        self._check("aesv2-clear-metadata.pdf", "user", 1)
+
+    def testAESV2ClearMetadataOwner(self):
+        self._check("aesv2-clear-metadata.pdf", "owner", 2)
+
+    def testAESV3User(self):
+        self._check("aesv3.pdf", "user", 1)
+
+    def testAESV3Owner(self):
+        self._check("aesv3.pdf", "owner", 2)
+
+    def testWrongPassword(self):
+        for name in ("aesv2.pdf", "aesv3.pdf"):
+            reader = PdfFileReader(StringIO(_read(name)))
+            self.assertEqual(reader.decrypt("wrong"), 0)
+
+    def testUnsupportedCryptFilter(self):
+        # same length, so that the cross-reference table stays right.
+        data = _read("aesv2.pdf").replace("/CFM /AESV2", "/CFM /FOOV2")
+        def read():
+            reader = PdfFileReader(StringIO(data))
+            reader.decrypt("user")
+            reader.getPage(0).extractText()
+        try:
+            read()
+        except NotImplementedError, e:
+            self.failUnless("unsupported crypt filter method /FOOV2" in str(e))
+        else:
+            self.fail("NotImplementedError not raised")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+import os
+import logging
+import tempfile
+import threading
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileWriter
+from pyPdf.executor import PdfExecutor, CancelledError, openReader
+
+
+def _pdfData():
+    writer = PdfFileWriter()
+    writer.addBlankPage(100, 100)
+    writer.addBlankPage(100, 100)
+    out = StringIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class ExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = PdfExecutor(workers=1)
+        self.log = _Records()
+        logging.getLogger("pyPdf").addHandler(self.log)
+
+    def tearDown(self):
+        logging.getLogger("pyPdf").removeHandler(self.log)
+        self.executor.shutdown()
+
+    # submits work that blocks the worker until the returned event is set.
+    def _block(self):
+        started = threading.Event()
+        release = threading.Event()
+        def wait():
+            started.set()
+            release.wait(5)
+            return "released"
+        future = self.executor.submit(wait)
+        started.wait(5)
+        return future, release
+
+    def testRaisingCallbackKeepsWorker(self):
+        blocker, release = self._block()
+        def fail(future):
+            raise ValueError, "callback failed"
+        calls = []
+        future = self.executor.submit(lambda: 1)
+        future.addDoneCallback(fail)
+        future.addDoneCallback(calls.append)
+        release.set()
+        self.assertEqual(future.result(5), 1)
+        # the worker survived the callback, and runs new work.
+        self.assertEqual(self.executor.submit(lambda: 2).result(5), 2)
+        self.failUnless(self.executor._threads[0].isAlive())
+        self.assertEqual(calls, [future])
+        self.assertEqual(len(self.log.records), 1)
+
+    def testRaisingCallbackOnDoneFuture(self):
+        future = self.executor.submit(lambda: 1)
+        future.result(5)
+        def fail(future):
+            raise ValueError, "callback failed"
+        future.addDoneCallback(fail)
+        self.assertEqual(len(self.log.records), 1)
+
+    def testCancelPending(self):
+        blocker, release = self._block()
+        ran = []
+        future = self.executor.submit(ran.append, 1)
+        self.failUnless(future.cancel())
+        release.set()
+        self.assertRaises(CancelledError, future.result, 5)
+        self.failUnless(future.cancelled())
+        self.assertEqual(ran, [])
+
+    def testCancelRunning(self):
+        future, release = self._block()
+        self.failUnless(future.cancel())
+        release.set()
+        # the work completed, but the future agrees with cancel().
+        self.assertRaises(CancelledError, future.result, 5)
+        self.failUnless(future.cancelled())
+
+    def testCancelDone(self):
+        future = self.executor.submit(lambda: 1)
+        self.assertEqual(future.result(5), 1)
+        self.failIf(future.cancel())
+        self.failIf(future.cancelled())
+        self.assertEqual(future.result(), 1)
+
+
+class OpenReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = PdfExecutor(workers=1)
+        fd, self.filename = tempfile.mkstemp(".pdf")
+        os.write(fd, _pdfData())
+        os.close(fd)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        os.remove(self.filename)
+
+    def testCloseOwnedFile(self):
+        reader = openReader(self.filename, self.executor).result(5)
+        self.assertEqual(reader.getNumPages().result(5), 2)
+        stream = reader._ownedStream
+        self.failIf(stream.closed)
+        reader.close().result(5)
+        self.failUnless(stream.closed)
+
+    def testCallerStreamLeftOpen(self):
+        stream = file(self.filename, "rb")
+        try:
+            reader = openReader(stream, self.executor).result(5)
+            self.assertEqual(reader.getNumPages().result(5), 2)
+            reader.close().result(5)
+            self.failIf(stream.closed)
+        finally:
+            stream.close()
+
+
+class DocumentQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = PdfExecutor(workers=8)
+        fd, self.filename = tempfile.mkstemp(".pdf")
+        os.write(fd, _pdfData())
+        os.close(fd)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        os.remove(self.filename)
+
+    def open(self):
+        return openReader(self.filename, self.executor).result(5)
+
+    def testOrder(self):
+        reader = self.open()
+        for trial in range(50):
+            calls = []
+            futures = [reader.call(lambda r, i: calls.append(i), i)
+                    for i in range(8)]
+            for future in futures:
+                future.result(5)
+            self.assertEqual(calls, range(8))
+        reader.close().result(5)
+
+    def testCloseAfterPendingWork(self):
+        reader = self.open()
+        release = threading.Event()
+        blocker = reader.call(lambda r: release.wait(5))
+        closed = []
+        futures = [reader.call(lambda r: closed.append(r.stream.stream.closed))
+                for i in range(4)]
+        close = reader.close()
+        release.set()
+        close.result(5)
+        self.assertEqual(closed, [False] * 4)
+        self.failUnless(reader._ownedStream == None)
+
+    def testOtherDocumentsNotHeldUp(self):
+        executor = PdfExecutor(workers=2)
+        try:
+            a = openReader(self.filename, executor).result(5)
+            b = openReader(self.filename, executor).result(5)
+            release = threading.Event()
+            blocker = a.call(lambda r: release.wait(5))
+            pending = [a.getNumPages() for i in range(4)]
+            # a's pending work waits for blocker without taking up the second
+            # worker.
+            self.assertEqual(b.getNumPages().result(5), 2)
+            self.failIf(pending[0].done())
+            release.set()
+            self.assertEqual([f.result(5) for f in pending], [2] * 4)
+        finally:
+            executor.shutdown()
+
+    def testCancelQueued(self):
+        reader = self.open()
+        release = threading.Event()
+        blocker = reader.call(lambda r: release.wait(5))
+        ran = []
+        cancelled = reader.call(lambda r: ran.append(1))
+        after = reader.call(lambda r: ran.append(2))
+        self.failUnless(cancelled.cancel())
+        release.set()
+        self.assertRaises(CancelledError, cancelled.result, 5)
+        after.result(5)
+        self.assertEqual(ran, [2])
+
+    def testShutdownRunsQueuedWork(self):
+        executor = PdfExecutor(workers=2)
+        reader = openReader(self.filename, executor).result(5)
+        futures = [reader.getNumPages() for i in range(10)]
+        executor.shutdown()
+        for future in futures:
+            self.failUnless(future.done())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import zlib
+import unittest
+
+from pyPdf import filters
+from pyPdf.filters import FlateDecode
+
+
+class FlateTest(unittest.TestCase):
+    def setUp(self):
+        self.data = "".join(["line %d of the stream\n" % i for i in range(5000)])
+        self.compressed = zlib.compress(self.data)
+
+    def _chunks(self, size):
+        return [self.compressed[i:i+size]
+                for i in range(0, len(self.compressed), size)]
+
+    def testChunksMatchDecompress(self):
+        for size in (1, 7, 1000, len(self.compressed)):
+            self.assertEqual(filters.decompressChunks(self._chunks(size)),
+                    filters.decompress(self.compressed))
+
+    def testDecodeChunks(self):
+        chunks = iter(self._chunks(100))
+        self.assertEqual(FlateDecode.decode(chunks, None), self.data)
+        self.assertEqual(FlateDecode.decode(self.compressed, None), self.data)
+
+    def testNoChunks(self):
+        self.assertEqual(filters.decompressChunks([]), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader
+from pyPdf.generic import FloatObject, DecimalObject, ArrayObject, \
+        DictionaryObject, IndirectObject, NameObject
+from pyPdf.utils import PdfWriteError
+import docs
+
+
+def _write(obj):
+    out = StringIO()
+    obj.writeToStream(out, None)
+    return out.getvalue()
+
+
+class RealNumberTest(unittest.TestCase):
+    def testFinite(self):
+        self.assertEqual(_write(FloatObject("1.5")), "1.5")
+        self.assertEqual(_write(FloatObject("-3")), "-3")
+        self.assertEqual(_write(DecimalObject("0.000012")), "0.000012")
+
+    def testNonFiniteRejected(self):
+        for value in (FloatObject("inf"), FloatObject("-inf"), FloatObject("nan"),
+                DecimalObject("Infinity"), DecimalObject("NaN")):
+            self.assertRaises(PdfWriteError, _write, value)
+            self.assertRaises(PdfWriteError, _write, ArrayObject([value]))
+            # repr still works, for debugging.
+            repr(value)
+
+
+def _reader(resolutionCache):
+    data = docs.build([
+        "<< /Type /Catalog /Pages 2 0 R /A 3 0 R /B 4 0 R /C 5 0 R >>",
+        "<< /Type /Pages /Count 0 /Kids [] >>",
+        "(a)",
+        "(b)",
+        "(c)",
+        ])
+    return PdfFileReader(StringIO(data), resolutionCache=resolutionCache)
+
+
+class ResolutionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.reader = _reader(True)
+        self.root = self.reader.trailer["/Root"]
+
+    def lookUp(self):
+        for key in "/A", "/B", "/C":
+            self.root[NameObject(key)]
+        self.assertEqual(len(self.root._resolved), 3)
+
+    def testRemembered(self):
+        self.assertEqual(self.root["/A"], "a")
+        self.failUnless(self.root._resolved.has_key("/A"))
+        self.failUnless(self.root["/A"] is self.root._resolved["/A"])
+        self.failUnless(isinstance(self.root.raw_get("/A"), IndirectObject))
+        # direct values aren't remembered
+        self.assertEqual(self.root["/Type"], "/Catalog")
+        self.failIf(self.root._resolved.has_key("/Type"))
+
+    def testOff(self):
+        root = _reader(False).trailer["/Root"]
+        self.assertEqual(root["/A"], "a")
+        self.failIf(root._memoize)
+        self.assertEqual(root._resolved, None)
+
+    def testCreatedDictionary(self):
+        d = DictionaryObject()
+        d[NameObject("/A")] = self.root.raw_get("/A")
+        self.assertEqual(d["/A"], "a")
+        self.assertEqual(d._resolved, None)
+
+    def testSetItem(self):
+        self.lookUp()
+        self.root[NameObject("/A")] = self.root.raw_get("/B")
+        self.assertEqual(self.root["/A"], "b")
+
+    def testDelItem(self):
+        self.lookUp()
+        del self.root["/A"]
+        self.assertRaises(KeyError, self.root.__getitem__, "/A")
+        self.assertEqual(self.root["/B"], "b")
+
+    def testPop(self):
+        self.lookUp()
+        self.failUnless(isinstance(self.root.pop("/A"), IndirectObject))
+        self.assertRaises(KeyError, self.root.__getitem__, "/A")
+        self.assertEqual(self.root["/B"], "b")
+
+    def testPopItem(self):
+        self.lookUp()
+        key, value = self.root.popitem()
+        self.assertRaises(KeyError, self.root.__getitem__, key)
+        self.assertEqual(self.root._resolved, {})
+
+    def testClear(self):
+        self.lookUp()
+        self.root.clear()
+        for key in "/A", "/B", "/C":
+            self.assertRaises(KeyError, self.root.__getitem__, key)
+
+    def testPagesAndStreams(self):
+        reader = PdfFileReader(StringIO(docs.pages([docs.text("x")])),
+                resolutionCache=True)
+        page = reader.getPage(0)
+        self.failUnless(page._memoize)
+        self.failUnless(page["/Contents"]._memoize)
+        self.failUnless(page["/Contents"] is page._resolved["/Contents"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import zlib
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader
+import docs
+
+_JPEG = "\xff\xd8\xff\xe0fake JPEG data\xff\xd9"
+
+
+def _imageDocument():
+    return docs.build([
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Count 2 /Kids [3 0 R 4 0 R] >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 100 100] "
+            "/Resources << /XObject << /Im1 5 0 R /Im2 6 0 R /Fm1 7 0 R >> >> "
+            "/Contents 8 0 R >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 100 100] "
+            "/Resources << /XObject << /Im1 5 0 R >> >> /Contents 8 0 R >>",
+        ("/Type /XObject /Subtype /Image /Width 2 /Height 1 /BitsPerComponent 8 "
+            "/ColorSpace /DeviceGray /Filter /FlateDecode", zlib.compress("\x00\xff")),
+        ("/Type /XObject /Subtype /Image /Width 1 /Height 1 /BitsPerComponent 8 "
+            "/ColorSpace /DeviceRGB /Filter [/FlateDecode /DCTDecode]",
+            zlib.compress(_JPEG)),
+        ("/Type /XObject /Subtype /Form /BBox [0 0 1 1] "
+            "/Resources << /XObject << /Im3 9 0 R >> >>", "/Im3 Do"),
+        ("", "q 100 0 0 100 0 0 cm /Im1 Do Q"),
+        ("/Type /XObject /Subtype /Image /Width 1 /Height 1 /BitsPerComponent 8 "
+            "/ColorSpace /DeviceGray /Filter /DCTDecode", _JPEG),
+        ])
+
+
+class ImagesTest(unittest.TestCase):
+    def setUp(self):
+        self.reader = PdfFileReader(StringIO(_imageDocument()))
+
+    def images(self):
+        images = {}
+        for pageNumber, image in self.reader.iterImages():
+            self.failIf(images.has_key(image.name))
+            images[image.name] = pageNumber, image
+        return images
+
+    def testIterImages(self):
+        images = self.images()
+        # the image on the second page was already produced for the first,
+        # and the image of the form XObject is included.
+        names = images.keys()
+        names.sort()
+        self.assertEqual(names, ["/Im1", "/Im2", "/Im3"])
+        for pageNumber, image in images.values():
+            self.assertEqual(pageNumber, 0)
+        self.assertEqual([image.name for image in self.reader.getPage(1).iterImages()],
+                ["/Im1"])
+
+    def testProperties(self):
+        image = self.images()["/Im1"][1]
+        self.assertEqual((image.width, image.height, image.bitsPerComponent),
+                (2, 1, 8))
+        self.assertEqual(image.colorSpace, "/DeviceGray")
+        self.assertEqual(image.indirectRef.idnum, 5)
+        self.assertEqual(image.filterNames, ["/FlateDecode"])
+        self.assertEqual(image.rawFilter, None)
+        self.assertEqual(image.extension, None)
+
+    def testGetData(self):
+        image = self.images()["/Im1"][1]
+        self.assertEqual(image.getData(), "\x00\xff")
+
+    def testNoRawFilter(self):
+        image = self.images()["/Im1"][1]
+        self.assertRaises(NotImplementedError, image.iterRawData)
+        self.assertRaises(NotImplementedError, image.getRawData)
+        self.assertRaises(NotImplementedError, image.writeRawData, StringIO())
+
+    def testRawData(self):
+        images = self.images()
+        for name in "/Im2", "/Im3":
+            image = images[name][1]
+            self.assertEqual(image.filterNames[-1], "/DCTDecode")
+            self.assertEqual(image.rawFilter, "/DCTDecode")
+            self.assertEqual(image.extension, ".jpg")
+            self.assertEqual(image.getRawData(), _JPEG)
+            out = StringIO()
+            self.assertEqual(image.writeRawData(out), len(_JPEG))
+            self.assertEqual(out.getvalue(), _JPEG)
+
+
+if __name__ == "__main__":
+    unittest.main()
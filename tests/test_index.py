@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+from pyPdf.index import TextIndex, tokenize
+import docs
+
+
+class TextIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.indexPath = self.path("index")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def write(self, name, contents, mtime=None):
+        filename = self.path(name)
+        stream = file(filename, "wb")
+        try:
+            stream.write(docs.pages([docs.text(s) for s in contents]))
+        finally:
+            stream.close()
+        if mtime != None:
+            os.utime(filename, (mtime, mtime))
+        return filename
+
+    def testTokenize(self):
+        self.assertEqual(tokenize(u"Hello, World 42!"), [u"hello", u"world", u"42"])
+
+    def testSearch(self):
+        a = self.write("a.pdf", ["red green", "blue"])
+        b = self.write("b.pdf", ["green blue", "red"])
+        index = TextIndex(self.indexPath)
+        updated = index.update([a, b], processes=1)
+        updated.sort()
+        self.assertEqual(updated, [a, b])
+        self.assertEqual(index.search("green"), [(a, 0), (b, 0)])
+        self.assertEqual(index.search("Blue GREEN"), [(b, 0)])
+        self.assertEqual(index.search("red"), [(a, 0), (b, 1)])
+        self.assertEqual(index.search("red blue"), [])
+        self.assertEqual(index.search("yellow"), [])
+        self.assertEqual(index.search(""), [])
+
+    def testSaveAndLoad(self):
+        a = self.write("a.pdf", ["red", "green"])
+        index = TextIndex(self.indexPath)
+        index.update([a], processes=1)
+        index.save()
+        index = TextIndex(self.indexPath)
+        self.assertEqual(index.search("green"), [(a, 1)])
+        self.assertEqual(index.update([a], processes=1), [])
+
+    def testModificationTime(self):
+        a = self.write("a.pdf", ["red"], mtime=1000000000)
+        index = TextIndex(self.indexPath)
+        index.update([a], processes=1)
+        self.assertEqual(index.update([a], processes=1), [])
+        # same size, only the modification time changes
+        self.write("a.pdf", ["tan"], mtime=1000000001)
+        self.assertEqual(index.update([a], processes=1), [a])
+        self.assertEqual(index.search("red"), [])
+        self.assertEqual(index.search("tan"), [(a, 0)])
+
+    def testSize(self):
+        a = self.write("a.pdf", ["red"], mtime=1000000000)
+        index = TextIndex(self.indexPath)
+        index.update([a], processes=1)
+        # same modification time, only the size changes
+        self.write("a.pdf", ["purple"], mtime=1000000000)
+        self.assertEqual(index.update([a], processes=1), [a])
+        self.assertEqual(index.search("red"), [])
+        self.assertEqual(index.search("purple"), [(a, 0)])
+
+    def testRemovedFile(self):
+        a = self.write("a.pdf", ["red"])
+        b = self.write("b.pdf", ["red"])
+        index = TextIndex(self.indexPath)
+        index.update([a, b], processes=1)
+        self.assertEqual(index.update([b], processes=1), [])
+        self.assertEqual(index.search("red"), [(b, 0)])
+        self.failIf(index.documents.has_key(a))
+
+    def testUnreadableFile(self):
+        bad = self.path("bad.pdf")
+        stream = file(bad, "wb")
+        stream.write("not a PDF file")
+        stream.close()
+        index = TextIndex(self.indexPath)
+        caught = []
+        showwarning = warnings.showwarning
+        warnings.showwarning = lambda *args: caught.append(args[0])
+        try:
+            self.assertEqual(index.update([bad], processes=1), [bad])
+        finally:
+            warnings.showwarning = showwarning
+        self.assertEqual(len(caught), 1)
+        self.assertEqual(index.update([bad], processes=1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader, PdfFileWriter
+from pyPdf.generic import ArrayObject, DictionaryObject, NameObject, NumberObject
+from pyPdf.utils import PyPdfError
+import docs
+
+
+def _writer(count):
+    source = PdfFileReader(StringIO(docs.pages(
+            [docs.text("page %d" % i) for i in range(count)])))
+    writer = PdfFileWriter()
+    for page in source.pages:
+        writer.addPage(page)
+    return writer
+
+
+def _linearized(writer):
+    out = StringIO()
+    writer.write(out, linearize=True)
+    return out.getvalue()
+
+
+class LinearizeTest(unittest.TestCase):
+    def testFastPath(self):
+        data = _linearized(_writer(3))
+        reader = PdfFileReader(StringIO(data))
+        self.failIf(reader._linearized == None)
+        self.assertEqual(reader._linearized["/N"], 3)
+        self.assertEqual(reader._linearized["/L"], len(data))
+        self.assertEqual(reader.getNumPages(), 3)
+        first = reader.getPage(0)
+        self.assertEqual(first.extractText(), u"page 0")
+        # neither the page tree nor the main cross-reference section was read
+        self.assertEqual(reader.flattenedPages, None)
+        self.failIf(reader._pendingXref == None)
+
+        # a full read of the same file
+        full = PdfFileReader(StringIO(data))
+        full._flatten()
+        self.assertEqual(len(full.flattenedPages), 3)
+        self.assertEqual(full.getPage(0).indirectRef.idnum, first.indirectRef.idnum)
+        self.assertEqual(full.getPage(0).extractText(), u"page 0")
+        self.assertEqual(full.getPage(2).extractText(), u"page 2")
+
+        # the rest of the fast path reader's file is read on demand
+        self.assertEqual(reader.getPage(2).extractText(), u"page 2")
+        self.failUnless(reader._pendingXref == None)
+        self.failUnless(reader.getPage(0) is first)
+        self.assertEqual(reader.getPage(1).extractText(), u"page 1")
+
+    def testSinglePage(self):
+        reader = PdfFileReader(StringIO(_linearized(_writer(1))))
+        self.failIf(reader._linearized == None)
+        self.assertEqual(reader.getNumPages(), 1)
+        self.assertEqual(reader.getPage(0).extractText(), u"page 0")
+
+    def testLengthMismatch(self):
+        # a file updated after it was linearized is read as usual
+        data = _linearized(_writer(3)) + "\n"
+        reader = PdfFileReader(StringIO(data))
+        self.assertEqual(reader._linearized, None)
+        self.assertEqual(reader.getNumPages(), 3)
+        self.assertEqual(reader.getPage(0).extractText(), u"page 0")
+        self.assertEqual(reader.getPage(2).extractText(), u"page 2")
+
+    def testEncrypted(self):
+        writer = _writer(2)
+        writer.encrypt("user", "owner")
+        reader = PdfFileReader(StringIO(_linearized(writer)))
+        self.failIf(reader._linearized == None)
+        self.failUnless(reader.decrypt("user"))
+        self.assertEqual(reader.getPage(0).extractText(), u"page 0")
+        self.assertEqual(reader.getPage(1).extractText(), u"page 1")
+
+    def testNoPages(self):
+        self.assertRaises(PyPdfError, _linearized, PdfFileWriter())
+
+    def testNestedPageTree(self):
+        writer = _writer(2)
+        pages = writer.getObject(writer._pages)
+        kids = pages["/Kids"]
+        node = DictionaryObject()
+        node[NameObject("/Type")] = NameObject("/Pages")
+        node[NameObject("/Parent")] = writer._pages
+        node[NameObject("/Kids")] = ArrayObject(kids)
+        node[NameObject("/Count")] = NumberObject(len(kids))
+        pages[NameObject("/Kids")] = ArrayObject([writer._addObject(node)])
+        self.assertRaises(PyPdfError, _linearized, writer)
+
+
+if __name__ == "__main__":
+    unittest.main()
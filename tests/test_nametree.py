@@ -0,0 +1,118 @@
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader
+from pyPdf.pdf import NameTree
+import docs
+
+# the leaves of the tree, by object number; every name maps to a destination
+# on the page with a distinct /FitH position.
+_LEAVES = {
+    8: ["a1", "a2", "a3"],
+    9: ["c1", "c5", "c9"],
+    10: ["m1", "m5"],
+    11: ["x1", "y", "z9"],
+    }
+
+
+def _leaf(names, limits=True):
+    entries = " ".join(["(%s) [3 0 R /FitH %d]" % (name, _position(name))
+            for name in names])
+    if not limits:
+        return "<< /Names [%s] >>" % entries
+    return "<< /Limits [(%s) (%s)] /Names [%s] >>" % (names[0], names[-1], entries)
+
+
+def _position(name):
+    return ord(name[0]) * 10 + len(name)
+
+
+# A three level destinations tree: the root, two intermediate nodes (6 and 7)
+# and four leaves.
+def _treeDocument(limits=True):
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R /Names << /Dests 5 0 R >> >>",
+        "<< /Type /Pages /Count 1 /Kids [3 0 R] >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>",
+        ("", ""),
+        "<< /Kids [6 0 R 7 0 R] >>",
+        ]
+    if limits:
+        objects.append("<< /Limits [(a1) (c9)] /Kids [8 0 R 9 0 R] >>")
+        objects.append("<< /Limits [(m1) (z9)] /Kids [10 0 R 11 0 R] >>")
+    else:
+        objects.append("<< /Kids [8 0 R 9 0 R] >>")
+        objects.append("<< /Kids [10 0 R 11 0 R] >>")
+    for num in 8, 9, 10, 11:
+        objects.append(_leaf(_LEAVES[num], limits))
+    return docs.build(objects)
+
+
+class NameTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.reader = PdfFileReader(StringIO(_treeDocument()))
+        self.tree = self.reader.getNameTree("/Dests")
+
+    def read(self):
+        retval = self.reader.resolvedObjects.get(0, {}).keys()
+        retval.sort()
+        return retval
+
+    def testFound(self):
+        for names in _LEAVES.values():
+            for name in names:
+                value = self.tree.get(name)
+                self.assertEqual(value[2], _position(name))
+                self.failUnless(self.tree.has_key(name))
+                self.assertEqual(self.tree[name], value)
+
+    def testMissing(self):
+        # before, between and after the leaves, and inside one
+        for name in "a0", "b", "c99", "d", "m9", "w", "zz", "a2x", "y0", "":
+            self.assertEqual(self.tree.get(name), None)
+            self.assertEqual(self.tree.get(name, 42), 42)
+            self.failIf(self.tree.has_key(name))
+            self.assertRaises(KeyError, self.tree.__getitem__, name)
+
+    def testOnlyPathRead(self):
+        self.tree.get("m5")
+        read = self.read()
+        self.failUnless(7 in read and 10 in read)
+        self.failIf(6 in read or 8 in read or 9 in read)
+        # a name between the intermediate nodes stops at the root's kids
+        self.tree.get("d")
+        read = self.read()
+        self.failUnless(6 in read)
+        self.failIf(8 in read or 9 in read)
+
+    def testItems(self):
+        names = []
+        for num in 8, 9, 10, 11:
+            names.extend(_LEAVES[num])
+        self.assertEqual(self.tree.keys(), names)
+        self.assertEqual(len(self.tree), len(names))
+        # lookups still work once the whole tree is read
+        self.assertEqual(self.tree.get("c5")[2], _position("c5"))
+        self.assertEqual(self.tree.get("d"), None)
+
+    def testNoLimits(self):
+        reader = PdfFileReader(StringIO(_treeDocument(limits=False)))
+        tree = reader.getNameTree("/Dests")
+        self.assertEqual(tree.get("y")[2], _position("y"))
+        self.assertEqual(tree.get("d"), None)
+
+    def testNamedDestination(self):
+        dest = self.reader.getNamedDestination("c9")
+        self.assertEqual(dest.title, "c9")
+        self.assertEqual(dest.typ, "/FitH")
+        self.assertEqual(dest.pageNumber, 0)
+        self.assertEqual(self.reader.getNamedDestination("b"), None)
+        self.assertEqual(len(self.reader.getNamedDestinations()), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader
+
+
+# A document with one page and the outline A (A1 (A11)), U (U1), C, where U
+# is a link to a web page rather than a destination.
+def _outlineDocument():
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R /Outlines 4 0 R >>",
+        "<< /Type /Pages /Count 1 /Kids [3 0 R] >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 10 10] >>",
+        "<< /First 5 0 R /Last 7 0 R >>",
+        "<< /Title (A) /Dest [3 0 R /Fit] /Next 6 0 R /First 8 0 R >>",
+        "<< /Title (U) /A << /S /URI /URI (http://example.com/) >> "
+            "/Next 7 0 R /First 9 0 R >>",
+        "<< /Title (C) /A << /S /GoTo /D [3 0 R /Fit] >> >>",
+        "<< /Title (A1) /Dest [3 0 R /Fit] /First 10 0 R >>",
+        "<< /Title (U1) /Dest [3 0 R /Fit] >>",
+        "<< /Title (A11) /Dest [3 0 R /Fit] >>",
+        ]
+    out = "%PDF-1.4\n"
+    offsets = []
+    for i in range(len(objects)):
+        offsets.append(len(out))
+        out += "%d 0 obj\n%s\nendobj\n" % (i + 1, objects[i])
+    xref = len(out)
+    out += "xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += "%010d 00000 n \n" % offset
+    out += "trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1, xref)
+    return out
+
+
+def _titles(outlines):
+    retval = []
+    for item in outlines:
+        if isinstance(item, list):
+            retval.append(_titles(item))
+        else:
+            retval.append(item.title)
+    return retval
+
+
+class OutlinesTest(unittest.TestCase):
+    def setUp(self):
+        self.reader = PdfFileReader(StringIO(_outlineDocument()))
+
+    def testStructure(self):
+        self.assertEqual(_titles(self.reader.getOutlines()),
+                ["A", ["A1", ["A11"]], ["U1"], "C"])
+
+    def testIterOutlines(self):
+        entries = [(depth, parent and parent.title, outline.title)
+                for depth, parent, outline in self.reader.iterOutlines()]
+        self.assertEqual(entries, [(0, None, "A"), (1, "A", "A1"),
+                (2, "A1", "A11"), (1, None, "U1"), (0, None, "C")])
+        self.assertEqual([outline.title for depth, parent, outline in
+                self.reader.iterOutlines(0)], ["A", "C"])
+
+    def testMutationNotShared(self):
+        outlines = self.reader.getOutlines()
+        outlines.pop()
+        outlines[1].append("junk")
+        del outlines[1][1][:]
+        self.assertEqual(_titles(self.reader.getOutlines()),
+                ["A", ["A1", ["A11"]], ["U1"], "C"])
+        self.assertEqual(len(list(self.reader.iterOutlines())), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
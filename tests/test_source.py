@@ -0,0 +1,172 @@
+import re
+import threading
+import unittest
+import BaseHTTPServer
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileWriter
+from pyPdf.source import HTTPByteSource, CachedByteSource, ByteSourceStream, \
+        FileByteSource, openURL
+
+
+def _pdfData():
+    writer = PdfFileWriter()
+    for i in range(20):
+        writer.addBlankPage(100, 100)
+    out = StringIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        data = server.data
+        match = re.match(r"bytes=(\d+)-(\d+)$", self.headers.getheader("Range") or "")
+        server.ranges.append(match and (int(match.group(1)), int(match.group(2))))
+        if match and server.honourRange:
+            first = int(match.group(1))
+            last = min(int(match.group(2)), len(data) - 1)
+            body = data[first:last+1]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %d-%d/%d" % (first, last, len(data)))
+        else:
+            body = data
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPByteSourceTest(unittest.TestCase):
+    honourRange = True
+
+    def setUp(self):
+        self.data = _pdfData()
+        self.server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.data = self.data
+        self.server.ranges = []
+        self.server.honourRange = self.honourRange
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/file.pdf" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testRead(self):
+        source = HTTPByteSource(self.url)
+        self.assertEqual(source.read(10, 20), self.data[10:30])
+        self.assertEqual(source.getSize(), len(self.data))
+        self.assertEqual(source.read(len(self.data) - 5, 20), self.data[-5:])
+        self.assertEqual(source.read(0, 0), "")
+        self.assertEqual(source.requests, 2)
+        self.assertEqual(self.server.ranges[0], (10, 29))
+
+    def testSizeFirst(self):
+        source = HTTPByteSource(self.url)
+        self.assertEqual(source.getSize(), len(self.data))
+
+    def testOpenURL(self):
+        reader = openURL(self.url, blockSize=512)
+        self.assertEqual(reader.getNumPages(), 20)
+        self.assertEqual(reader.getPage(19).mediaBox.getWidth(), 100)
+
+
+class IgnoredRangeTest(HTTPByteSourceTest):
+    honourRange = False
+
+    def testWholeFileSent(self):
+        source = HTTPByteSource(self.url)
+        self.assertEqual(source.read(10, 20), self.data[10:30])
+        self.assertEqual(source.bytesRead, len(self.data))
+        self.assertEqual(source.getSize(), len(self.data))
+
+
+class _CountingSource(FileByteSource):
+    def __init__(self, data):
+        FileByteSource.__init__(self, StringIO(data))
+        self.reads = []
+
+    def read(self, offset, length):
+        self.reads.append((offset, length))
+        return FileByteSource.read(self, offset, length)
+
+
+class CachedByteSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.data = "".join([chr(i % 256) for i in range(1000)])
+        self.source = _CountingSource(self.data)
+
+    def testBlocksCached(self):
+        cached = CachedByteSource(self.source, blockSize=100, readahead=0)
+        self.assertEqual(cached.read(150, 100), self.data[150:250])
+        self.assertEqual(self.source.reads, [(100, 200)])
+        self.assertEqual(cached.read(120, 50), self.data[120:170])
+        self.assertEqual(len(self.source.reads), 1)
+
+    def testReadahead(self):
+        cached = CachedByteSource(self.source, blockSize=100, readahead=2)
+        cached.read(0, 10)
+        self.assertEqual(self.source.reads, [(0, 300)])
+        self.assertEqual(cached.read(250, 50), self.data[250:300])
+        self.assertEqual(len(self.source.reads), 1)
+
+    def testCachedBlocksInRead(self):
+        cached = CachedByteSource(self.source, blockSize=100, readahead=2)
+        cached.read(100, 10)
+        cached.read(400, 10)
+        self.assertEqual(self.source.reads, [(100, 300), (400, 300)])
+        del self.source.reads[:]
+        # blocks 0 and 7 are missing, the others are cached; only the run of
+        # missing blocks at the end of the read is followed by readahead.
+        self.assertEqual(cached.read(50, 700), self.data[50:750])
+        self.assertEqual(self.source.reads, [(0, 100), (700, 300)])
+
+    def testReadaheadStopsAtCachedBlock(self):
+        cached = CachedByteSource(self.source, blockSize=100, readahead=3)
+        cached.read(300, 10)
+        del self.source.reads[:]
+        cached.read(100, 10)
+        self.assertEqual(self.source.reads, [(100, 200)])
+
+    def testEndOfSource(self):
+        cached = CachedByteSource(self.source, blockSize=300, readahead=5)
+        self.assertEqual(cached.read(950, 100), self.data[950:])
+        self.assertEqual(cached.read(1000, 10), "")
+
+    def testLeastRecentlyUsedDropped(self):
+        cached = CachedByteSource(self.source, blockSize=100, maxBlocks=2, readahead=0)
+        cached.read(0, 10)
+        cached.read(100, 10)
+        cached.read(0, 10)
+        cached.read(200, 10)
+        # block 1 was the least recently used, and was dropped.
+        self.assertEqual(sorted(cached._blocks.keys()), [0, 2])
+        self.assertEqual(len(self.source.reads), 3)
+        cached.read(0, 10)
+        self.assertEqual(len(self.source.reads), 3)
+        self.assertEqual(cached.read(100, 10), self.data[100:110])
+        self.assertEqual(len(self.source.reads), 4)
+
+    def testStream(self):
+        cached = CachedByteSource(self.source, blockSize=64)
+        stream = ByteSourceStream(cached)
+        stream.seek(-10, 2)
+        self.assertEqual(stream.read(), self.data[-10:])
+        stream.seek(5)
+        self.assertEqual(stream.read(3), self.data[5:8])
+        self.assertEqual(stream.tell(), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
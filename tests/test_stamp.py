@@ -0,0 +1,72 @@
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader, PdfFileWriter
+import docs
+
+
+# the data of all the content streams of a page.
+def _content(page):
+    contents = page["/Contents"]
+    if not isinstance(contents, list):
+        contents = [contents]
+    return "".join([c.getObject().getData() for c in contents])
+
+
+class StampTest(unittest.TestCase):
+    def setUp(self):
+        self.document = PdfFileReader(StringIO(docs.pages(
+                [docs.text("Page one"), docs.text("Page two")], compress=True)))
+        self.stamp = PdfFileReader(StringIO(docs.pages(
+                [docs.text("CONFIDENTIAL", 200, 400)],
+                mediaBox="[0 0 500 600]"))).getPage(0)
+
+    def _stampAndReread(self, ctm=None):
+        writer = PdfFileWriter()
+        for i in range(self.document.getNumPages()):
+            writer.addPage(self.document.getPage(i))
+        writer.stampPages(self.stamp, ctm)
+        out = StringIO()
+        writer.write(out)
+        return PdfFileReader(StringIO(out.getvalue()))
+
+    def testStampPages(self):
+        reader = self._stampAndReread()
+        self.assertEqual(reader.getNumPages(), 2)
+        references = []
+        for i in range(2):
+            page = reader.getPage(i)
+            xobjects = page["/Resources"]["/XObject"]
+            self.assertEqual(xobjects.keys(), ["/Fx"])
+            references.append(xobjects.raw_get("/Fx").idnum)
+            form = xobjects["/Fx"]
+            self.assertEqual(form["/Type"], "/XObject")
+            self.assertEqual(form["/Subtype"], "/Form")
+            self.assertEqual(list(form["/BBox"]), [0, 0, 500, 600])
+            self.failUnless("(CONFIDENTIAL) Tj" in form.getData())
+            self.failUnless(form["/Resources"]["/Font"].has_key("/F1"))
+            # the page's own content is kept, and then the form is drawn.
+            content = _content(page)
+            self.failUnless("Page %s" % ("one", "two")[i] in content)
+            self.failUnless(content.rstrip().endswith("/Fx Do\nQ"))
+            self.failUnless(content.index("Tj") < content.index("/Fx Do"))
+        # the stamp is stored once.
+        self.assertEqual(references[0], references[1])
+
+    def testStampTransformed(self):
+        reader = self._stampAndReread((0.5, 0, 0, 0.5, 10, 20))
+        content = _content(reader.getPage(0))
+        self.failUnless("0.5 0 0 0.5 10 20 cm\n/Fx Do" in content)
+
+    def testCreateFormXObjectReusesData(self):
+        form = self.stamp.createFormXObject()
+        self.assertEqual(form._data, self.stamp.getContents()._data)
+        self.assertEqual(form["/BBox"], self.stamp.mediaBox)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader, PdfFileWriter
+from pyPdf.stats import PdfStats
+
+
+def _writer(stats):
+    writer = PdfFileWriter(stats=stats)
+    for i in range(3):
+        writer.addBlankPage(100, 100)
+    return writer
+
+
+class WriterStatsTest(unittest.TestCase):
+    def testEncryptionCounted(self):
+        stats = PdfStats()
+        writer = _writer(stats)
+        writer.encrypt("user")
+        out = StringIO()
+        writer.write(out)
+        count, size, elapsed = stats.get("encrypt/RC4")
+        self.failUnless(count > 0)
+        self.failUnless(size > 0)
+        # the file is still readable.
+        reader = PdfFileReader(StringIO(out.getvalue()))
+        self.assertEqual(reader.decrypt("user"), 1)
+        self.assertEqual(reader.getNumPages(), 3)
+
+    def testLinearizedEncryptionCounted(self):
+        stats = PdfStats()
+        writer = _writer(stats)
+        writer.encrypt("user")
+        out = StringIO()
+        writer.write(out, linearize=True)
+        self.failUnless(stats.get("encrypt/RC4")[0] > 0)
+        reader = PdfFileReader(StringIO(out.getvalue()))
+        self.assertEqual(reader.decrypt("user"), 1)
+        self.assertEqual(reader.getNumPages(), 3)
+
+    def testNotEncrypted(self):
+        stats = PdfStats()
+        _writer(stats).write(StringIO())
+        self.assertEqual(stats.get("encrypt/RC4"), (0, 0, 0.0))
+        self.failUnless(stats.get("writeObject")[0] > 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
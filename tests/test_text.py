@@ -0,0 +1,48 @@
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from StringIO import StringIO
+
+from pyPdf import PdfFileReader
+import docs
+
+
+def _positions(content):
+    reader = PdfFileReader(StringIO(docs.pages([content])))
+    return [tuple([item[0]] + [round(x, 3) for x in item[1:]])
+            for item in reader.getPage(0).iterTextPositions()]
+
+
+class TextPositionsTest(unittest.TestCase):
+    def testSimple(self):
+        # without /Widths every glyph is 500 units wide.
+        self.assertEqual(_positions("BT /F1 10 Tf 100 200 Td (A) Tj ET"),
+                [(u"A", 100, 200, 10, 5)])
+
+    def testCTM(self):
+        self.assertEqual(_positions("2 0 0 2 10 20 cm BT /F1 10 Tf 5 5 Td (A) Tj ET"),
+                [(u"A", 20, 30, 20, 10)])
+
+    def testRestoreTextState(self):
+        # the font size, spacing, scaling, leading and rise set inside q/Q
+        # don't apply after Q.
+        content = ("BT /F1 10 Tf 0 0 Td ET "
+                "q 0.5 0 0 0.5 0 0 cm BT /F1 20 Tf 3 Tc 4 Tw 50 Tz 30 TL 5 Ts "
+                "0 0 Td (A) Tj ET Q "
+                "BT 100 100 Td (A A) Tj T* (A) Tj ET")
+        self.assertEqual(_positions(content), [
+                (u"A", 0, 2.5, 10, 3.25),
+                (u"A A", 100, 100, 10, 15),
+                (u"A", 100, 100, 10, 5),
+                ])
+
+    def testTextStateKeptWithoutQ(self):
+        content = "BT /F1 10 Tf 2 Tc 0 0 Td (A) Tj ET BT 0 50 Td (A) Tj ET"
+        self.assertEqual(_positions(content),
+                [(u"A", 0, 0, 10, 7), (u"A", 0, 50, 10, 7)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from pyPdf import utils
+
+
+# known RC4 test vectors; the last is from RFC 6229.
+VECTORS = [
+    ("Key", "Plaintext", "bbf316e8d940af0ad3"),
+    ("Wiki", "pedia", "1021bf0420"),
+    ("Secret", "Attack at dawn", "45a01f645fc35b383552544b9bf5"),
+    ("\x01\x02\x03\x04\x05", "\x00" * 16, "b2396305f03dc027ccc3524a0a1118a8"),
+    ]
+
+
+class RC4Test(unittest.TestCase):
+    def testPythonVectors(self):
+        for key, plaintext, ciphertext in VECTORS:
+            self.assertEqual(utils._RC4_encrypt(key, plaintext).encode("hex"),
+                    ciphertext)
+            self.assertEqual(utils._RC4_encrypt(key, ciphertext.decode("hex")),
+                    plaintext)
+
+    def testBackendAgrees(self):
+        for key, plaintext, ciphertext in VECTORS:
+            self.assertEqual(utils.RC4_encrypt(key, plaintext).encode("hex"),
+                    ciphertext)
+
+    def testEmpty(self):
+        self.assertEqual(utils._RC4_encrypt("Key", ""), "")
+
+
+if __name__ == "__main__":
+    unittest.main()